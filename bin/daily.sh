@@ -7,6 +7,7 @@ exec &>> var/daily.log  # Redirect both stdout and stderr to log
 echo "START: $(date -u -Iseconds)"
 
 bin/youtube/update_likes.py
+bin/rate_stats.py --rollup
 # Future:
 # bin/youtube/get_playlists.py
 # bin/mastodon/get_bookmarks.py
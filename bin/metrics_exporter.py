@@ -0,0 +1,59 @@
+#!/bin/env python
+
+import argparse
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Expose rate-limiter and pipeline metrics in the OpenMetrics format')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--port', type=int, default=9464,
+                        help='Serve /metrics on this port (default: 9464)')
+    target.add_argument('--textfile', metavar='PATH',
+                        help='Write metrics to PATH for the node_exporter textfile collector')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to serve on')
+    parser.add_argument('--interval', type=float, metavar='SECS',
+                        help='With --textfile, rewrite PATH every SECS instead of once')
+    args = parser.parse_args()
+
+    if args.textfile:
+        while True:
+            metrics.write_textfile(args.textfile)
+            if not args.interval:
+                return
+            time.sleep(args.interval)
+
+    httpd = ThreadingHTTPServer((args.host, args.port), Handler)
+    httpd.daemon_threads = True
+    print(f'Serving metrics on http://{args.host}:{args.port}/metrics')
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,18 @@
 #!/bin/env python
 
+import argparse
+import re
 import sqlite3
 import sys
+from collections import defaultdict
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
+from rate_limiter import RateLimiter
 from rate_limits import BUCKETS
 
 import config
 
-OUTCOME_ABANDONED = 'abandoned'
-
 
 def _format_duration(secs):
     secs = int(max(secs, 0))
@@ -33,14 +35,6 @@ def _format_window(secs):
     return f'{secs}s'
 
 
-def _window_start(now, window_sec, tz_name):
-    if tz_name:
-        tz = ZoneInfo(tz_name)
-        now_local = datetime.fromtimestamp(now, tz=tz)
-        return now_local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
-    return now - window_sec
-
-
 def _next_calendar_reset(now, tz_name):
     tz = ZoneInfo(tz_name)
     now_local = datetime.fromtimestamp(now, tz=tz)
@@ -49,26 +43,20 @@ def _next_calendar_reset(now, tz_name):
     return next_local.timestamp()
 
 
-def _print_bucket(conn, bucket_name, spec, now):
+def _print_bucket(limiter, bucket_name, spec, now):
     tz_name = spec.get('reset_timezone')
     kind = f'calendar, midnight {tz_name}' if tz_name else 'rolling'
     print(f'\n{bucket_name}  ({kind})')
+    if spec.get('adaptive'):
+        print(f'  adaptive: limits at {limiter.adaptive_scale(bucket_name):.0%} of ceiling')
     print(f'  {"window":<7} {"used":>7} {"limit":>7} {"pct":>6}   status')
-    for window_sec, limit in spec['windows']:
-        ws = _window_start(now, window_sec, tz_name)
-        row = conn.execute(
-            'SELECT COALESCE(SUM(cost), 0) AS used, MIN(requested_at) AS oldest '
-            'FROM request_log WHERE bucket = ? AND requested_at >= ? '
-            "AND COALESCE(outcome, '') != ?",
-            (bucket_name, ws, OUTCOME_ABANDONED),
-        ).fetchone()
-        used, oldest = row[0], row[1]
+    for window_sec, limit, used, frees_at in limiter.window_usage(bucket_name):
         pct = (used / limit * 100) if limit else 0
 
         if tz_name:
             status = f'resets in {_format_duration(_next_calendar_reset(now, tz_name) - now)}'
-        elif used >= limit and oldest is not None:
-            status = f'AT CAP — frees in {_format_duration(oldest + window_sec - now)}'
+        elif used >= limit:
+            status = f'AT CAP — frees in {_format_duration(frees_at - now)}'
         else:
             status = 'ok'
         print(f'  {_format_window(window_sec):<7} {used:>7} {limit:>7} {pct:>5.1f}%   {status}')
@@ -104,20 +92,73 @@ def _print_recent(conn):
         print(f'  {ts}  {r[0]:<22} cost={r[1]}  {outcome}')
 
 
+def _parse_since(value):
+    """Timestamp for '30d', '12h', '2w' ago, or an ISO date."""
+    m = re.fullmatch(r'(\d+)([hdw])', value)
+    if m:
+        unit = {'h': 'hours', 'd': 'days', 'w': 'weeks'}[m.group(2)]
+        return (datetime.now() - timedelta(**{unit: int(m.group(1))})).timestamp()
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'not a duration (30d, 12h, 2w) or date: {value}')
+
+
+def _print_history(limiter, since):
+    """Per bucket and day: calls, cost, blocks, errors and latency.
+    Daily percentiles are hourly ones averaged by call count."""
+    days = defaultdict(lambda: [0, 0, 0, 0, 0.0, 0.0, 0])
+    for bucket, hour, outcome, count, cost, p50, p90, _ in limiter.history(since):
+        day = days[bucket, datetime.fromtimestamp(hour).strftime('%Y-%m-%d')]
+        day[0] += count
+        day[1] += cost
+        if outcome == 'blocked':
+            day[2] += count
+        elif outcome.startswith('error:'):
+            day[3] += count
+        if p50 is not None:
+            day[4] += p50 * count
+            day[5] += p90 * count
+            day[6] += count
+    print(f'\nHistory since {datetime.fromtimestamp(since).strftime("%Y-%m-%d %H:%M")}')
+    current = None
+    for (bucket, day), (calls, cost, blocked, errors, p50, p90, timed) in sorted(days.items()):
+        if bucket != current:
+            current = bucket
+            print(f'\n{bucket}')
+            print(f'  {"day":<10} {"calls":>7} {"cost":>7} {"blocked":>8} {"errors":>7} {"p50":>7} {"p90":>7}')
+        latency = f'{p50 / timed:>6.2f}s {p90 / timed:>6.2f}s' if timed else f'{"-":>7} {"-":>7}'
+        print(f'  {day:<10} {calls:>7} {cost:>7} {blocked:>8} {errors:>7} {latency}')
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Show rate limiter usage.')
+    parser.add_argument('--since', type=_parse_since, metavar='WHEN',
+                        help='Also show daily history since WHEN (30d, 12h, 2w or a date)')
+    parser.add_argument('--rollup', action='store_true',
+                        help='Fold old request_log rows into hourly aggregates and exit')
+    args = parser.parse_args()
+
     db_path = config.DATA_DIR / 'rate_limits.sqlite'
     if not db_path.exists():
         print(f'No rate-limit database at {db_path}', file=sys.stderr)
         sys.exit(1)
 
     conn = sqlite3.connect(db_path)
+    limiter = RateLimiter.get()
     now = datetime.now().timestamp()
 
+    if args.rollup:
+        limiter.rollup()
+        return
+
     for bucket_name, spec in BUCKETS.items():
-        _print_bucket(conn, bucket_name, spec, now)
+        _print_bucket(limiter, bucket_name, spec, now)
 
     _print_outcomes(conn, now)
     _print_recent(conn)
+    if args.since is not None:
+        _print_history(limiter, args.since)
 
 
 if __name__ == '__main__':
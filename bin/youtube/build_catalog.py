@@ -0,0 +1,11 @@
+#!/bin/env python
+import argparse
+
+from youtube import Catalog
+
+parser = argparse.ArgumentParser(description='Rebuild the video and handle catalog from the stored video.json and channel.json files.')
+parser.parse_args()
+
+print('Rebuilding video catalog')
+count = Catalog.get().rebuild()
+print(f'Catalogued {count} videos')
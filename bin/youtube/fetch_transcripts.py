@@ -4,6 +4,9 @@ import argparse
 
 from youtube_transcript_api._errors import IpBlocked, RequestBlocked
 
+from rate_limiter import set_default_priority
+from rate_limits import PRIORITY_BULK
+
 from analysis import YTTranscriptFormatter
 from youtube import iterate_videos
 
@@ -61,6 +64,7 @@ if __name__ == '__main__':
     parser.add_argument('--limit', type=int, default=None,
                         help='Stop after N videos where work was actually done (cached videos do not count)')
     args = parser.parse_args()
+    set_default_priority(PRIORITY_BULK)
 
     processed, cached, missing, errors = run_batch(args.source_id, force=args.force, limit=args.limit)
 
@@ -1,16 +1,17 @@
 #!/bin/env python
-import youtube.client
-youtube.client.API_RETRIES = 3
-
 import argparse
 from itertools import islice
 
+from rate_limiter import set_default_priority
+from rate_limits import PRIORITY_BULK
+
 from context import Context
 from youtube import Subscription
 
 parser = argparse.ArgumentParser(description='Mirror channel uploads for hot subscriptions.')
 parser.add_argument('--limit', type=int, default=None, help='Process at most N subscriptions (default: no limit)')
 args = parser.parse_args()
+set_default_priority(PRIORITY_BULK)
 
 batch_time = Context.get().batch_time
 
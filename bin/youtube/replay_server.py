@@ -0,0 +1,24 @@
+#!/bin/env python
+import argparse
+import time
+
+from youtube.replay import ReplayServer
+
+parser = argparse.ArgumentParser(
+    description='Serve recorded Data API responses as a local stand-in. '
+    'Record with YOUTUBE_RECORD_DIR=<dir>, replay with YOUTUBE_API_ENDPOINT=<url>.')
+parser.add_argument('fixtures', help='Directory of recorded responses')
+parser.add_argument('--port', type=int, default=8765)
+parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to each round trip')
+parser.add_argument('--page-size', type=int, default=None, help='Override maxResults when paging')
+args = parser.parse_args()
+
+server = ReplayServer(args.fixtures, latency=args.latency, page_size=args.page_size, port=args.port)
+with server:
+    print(f"Serving {args.fixtures} at {server.url}")
+    print(f"export YOUTUBE_API_ENDPOINT={server.url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print(f"\n{server.request_count} requests served")
@@ -4,6 +4,9 @@ import argparse
 import json
 from datetime import datetime, timezone
 
+from rate_limiter import set_default_priority
+from rate_limits import PRIORITY_INTERACTIVE
+
 from youtube import Channel, Subscription
 
 
@@ -138,6 +141,7 @@ parser = argparse.ArgumentParser(description='Show details of a YouTube channel.
 parser.add_argument('channel', help='Channel ID (UC...) or handle (@username)')
 parser.add_argument('--no-fetch', action='store_true', help='Skip fetching playlists if not already cached')
 args = parser.parse_args()
+set_default_priority(PRIORITY_INTERACTIVE)
 
 try:
     _show_channel(args.channel, fetch_playlists=not args.no_fetch)
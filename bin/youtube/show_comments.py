@@ -3,8 +3,12 @@
 import argparse
 import json
 import re
+import sys
 
-from youtube import Video, iterate_videos
+from rate_limiter import set_default_priority
+from rate_limits import PRIORITY_INTERACTIVE
+
+from youtube import Video, iterate_videos, quota
 
 
 def _format_line(c, indent, replies_present):
@@ -112,14 +116,12 @@ def _print_single_thread(comments_dict, top_level_id):
         print()
 
 
-def show_comments(video, comment_id=None, force=False, comment_limit=None, include_replies=False, grep=None):
+def show_comments(video, comment_id=None, force=False, include_replies=False, grep=None):
     if comment_id:
         file = Video.get_active_comments_file(video.video_id)
         if not file.exists():
             video.mirror_comments()
         video.expand_replies(comment_id, force=force)
-    else:
-        video.mirror_comments(comment_limit=comment_limit, force=force)
 
     header = f'{video.video_id}  {video.title}'
     print(f'\n{"=" * len(header)}')
@@ -151,17 +153,35 @@ parser.add_argument('--force', action='store_true', help='Refetch from scratch (
 parser.add_argument('--limit', type=int, default=None, help='Cap comments fetched per video (default: all). Resumes where a prior incomplete run stopped unless --force is used.')
 parser.add_argument('--include-replies', action='store_true', help='Include reply rows in the threaded view')
 parser.add_argument('--grep', metavar='PATTERN', help='Filter comments whose text_display matches PATTERN (regex, case-insensitive)')
+parser.add_argument('--plan', action='store_true', help='Show the estimated Data API cost per video and exit')
+parser.add_argument('--budget', type=int, default=None, help='Data API units to spend; videos that don\'t fit are skipped')
 args = parser.parse_args()
+set_default_priority(PRIORITY_INTERACTIVE)
+
+videos = iterate_videos(args.source_id)
+if args.plan or args.budget is not None:
+    plan = quota.plan((quota.comments_job(video, comment_limit=args.limit, force=args.force)
+                       for video in videos), budget=args.budget, rank=False)
+    quota.print_remaining()
+    plan.print_report(verbose=args.plan)
+    if args.plan:
+        sys.exit()
+    videos = [job.payload for job in plan.jobs]
 
 errors = 0
 
 try:
-    for video in iterate_videos(args.source_id):
+    if not args.comment_id:
+        videos = list(videos)
+        failed = Video.mirror_comments_many(videos, comment_limit=args.limit, force=args.force)
+        for video_id, e in failed.items():
+            errors += 1
+            print(f'[error] {video_id}: {e}')
+    for video in videos:
         try:
             show_comments(video,
                 comment_id=args.comment_id,
                 force=args.force,
-                comment_limit=args.limit,
                 include_replies=args.include_replies,
                 grep=args.grep,
             )
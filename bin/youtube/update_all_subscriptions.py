@@ -1,7 +1,18 @@
 #!/bin/env python
-import youtube.client
-youtube.client.API_RETRIES = 3
+import argparse
 
-from youtube import Subscription
+from rate_limiter import set_default_priority
+from rate_limits import PRIORITY_BULK
 
-Subscription.update_all()
+from youtube import Subscription, quota
+
+parser = argparse.ArgumentParser(description='Refresh the list of subscriptions.')
+parser.add_argument('--plan', action='store_true', help='Show the estimated Data API cost and exit')
+args = parser.parse_args()
+set_default_priority(PRIORITY_BULK)
+
+if args.plan:
+    quota.print_remaining()
+    print(f'Subscriptions: ~{quota.subscriptions_cost()} units')
+else:
+    Subscription.update_all()
@@ -1,7 +1,4 @@
 #!/bin/env python
-import youtube.client
-youtube.client.API_RETRIES = 3
-
 from datetime import datetime, timezone
 
 from youtube import Rating
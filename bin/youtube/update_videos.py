@@ -1,19 +1,23 @@
 #!/bin/env python
-import youtube.client
-youtube.client.API_RETRIES = 3
-
 import argparse
+import sys
 from itertools import islice
 from pprint import pprint
 
-from youtube import Subscription, Channel, Video
+from rate_limiter import set_default_priority
+from rate_limits import PRIORITY_BULK
 
 from context import Context
+from youtube import Channel, Subscription, Video, quota
+
 batch_time = Context.get().batch_time
 
 parser = argparse.ArgumentParser(description='Update video lists for hot subscriptions.')
 parser.add_argument('--limit', type=int, default=None, help='Process at most N subscriptions (default: no limit)')
+parser.add_argument('--plan', action='store_true', help='Show the estimated Data API cost per channel and exit')
+parser.add_argument('--budget', type=int, default=None, help="Data API units to spend; channels that don't fit are deferred to a later run")
 args = parser.parse_args()
+set_default_priority(PRIORITY_BULK)
 
 print(f"Update video list. Batch {batch_time}\n")
 
@@ -39,11 +43,29 @@ print(f"Update video list. Batch {batch_time}\n")
 #    print(f"Video {video.video_id} from {video.published_at}:\n{video.title}\n")
 
 
-for subscr in islice(Subscription.get_hot(), args.limit):
-    channel = subscr.channel
-    print(f"## {channel.title} - {channel.channel_id}")
-    channel.mirror_uploads()
-    print("\n")
+if args.plan:
+    # Plan from what the last run stored rather than listing (and paying
+    # for) the subscriptions; the listing a real run makes is still
+    # charged below. Those with the most new items stand in for the hot ones.
+    local = sorted(Subscription.get_all(), key=lambda subscr: subscr.new_item_count, reverse=True)
+    subscriptions = islice(local, args.limit)
+else:
+    subscriptions = islice(Subscription.get_hot(), args.limit)
+if args.plan or args.budget is not None:
+    subscriptions = list(subscriptions)
+    listing_cost = quota.subscriptions_cost(len(subscriptions))
+    budget = args.budget if args.budget is not None else quota.remaining_quota()[0]
+    # Channels with the most new uploads per unit go first; the rest wait
+    # for a later run instead of stalling this one at the quota reset.
+    plan = quota.plan((quota.mirror_job(subscr) for subscr in subscriptions), budget=max(0, budget - listing_cost))
+    quota.print_remaining()
+    print(f'Subscriptions: ~{listing_cost} units')
+    plan.print_report(verbose=args.plan)
+    if args.plan:
+        sys.exit()
+    subscriptions = [job.payload for job in plan.jobs]
+
+Channel.mirror_uploads_many(subscr.channel for subscr in subscriptions)
 
 
 #subscr_list = Subscription.get_hot()
@@ -206,7 +206,7 @@ def _score_author_channel(channel_id, batch_time):
     chan_file = Channel.get_active_dir(channel_id) / 'channel.json'
     if not chan_file.exists():
         return []
-    chan = json.loads(chan_file.read_text())
+    chan = Context.get().objects.load_json(chan_file)
     breakdown = []
 
     handle = (chan.get('custom_url') or '').lstrip('@')
@@ -236,7 +236,7 @@ def _score_author_channel(channel_id, batch_time):
         thumb_meta_path = (Channel.get_active_dir(channel_id)
                            / 'thumbnails' / 'default.json')
         if thumb_meta_path.exists():
-            distinct = json.loads(thumb_meta_path.read_text()).get('distinct_colors')
+            distinct = Context.get().objects.load_json(thumb_meta_path).get('distinct_colors')
             if distinct is not None and distinct <= 2:
                 breakdown.append({'signal': 'author_no_profile_picture', 'points': -5,
                     'note': f'default-letter avatar ({distinct} distinct colors)'})
@@ -543,16 +543,16 @@ def _passes_cheap_text_gate(comment, ctx):
     return False
 
 
-def _trigger_author_fetch(comment, ctx):
-    cid = comment.get('author_channel_id')
-    if not cid:
-        return
-    if cid == ctx['creator_id']:
-        return
-    if (Subscription.data_dir() / f'{cid}.json').exists():
-        return
-    chan = Channel.get(cid)  # idempotent — only fetches if channel.json missing
-    chan.fetch_default_thumbnail_features()  # idempotent — only fetches if default.json missing
+def _prefetch_authors(comments, ctx):
+    """Resolve the channels of every author worth scoring before any
+    classification runs: one channels.list call per 50 uncached authors
+    instead of one Channel.get per comment."""
+    channel_ids = sorted({
+        c['author_channel_id'] for c in comments
+        if _passes_cheap_text_gate(c, ctx)
+    })
+    for chan in Channel.get_many(channel_ids).values():
+        chan.fetch_default_thumbnail_features()  # idempotent — only fetches if default.json missing
 
 
 def classify(video, expand=True, fetch_authors=True, force=False):
@@ -616,17 +616,14 @@ def classify(video, expand=True, fetch_authors=True, force=False):
         'creator_reply_lengths': creator_reply_lengths,
     }
 
-    def _prefetch_and_classify(cid, comment):
-        # Two-stage: (1) cheap text-feature classify to decide if it's worth
-        # fetching the author's channel + thumbnail; (2) if so, prefetch and
-        # re-classify with the channel signals available.
-        if fetch_authors and _passes_cheap_text_gate(comment, ctx):
-            _trigger_author_fetch(comment, ctx)
-        results[cid] = _classify_comment(comment, ctx)
-
+    # Two-stage: (1) cheap text gate decides which authors are worth
+    # fetching channel + thumbnail for, all fetched up front in bulk;
+    # (2) classify against the now-populated local channel cache.
+    if fetch_authors:
+        _prefetch_authors(comments_dict.values(), ctx)
     results = {}
     for cid, comment in comments_dict.items():
-        _prefetch_and_classify(cid, comment)
+        results[cid] = _classify_comment(comment, ctx)
 
     if expand:
         expanded_ids = _expand_quality_threads(video, results, comments_dict)
@@ -638,14 +635,13 @@ def classify(video, expand=True, fetch_authors=True, force=False):
                 if c.get('parent_id') and (c.get('text_original') or '').lstrip().startswith('@')
             }
             # Re-classify expanded top-level comments — their engagement
-            # score depends on the now-complete reply set.
-            for cid in expanded_ids:
-                _prefetch_and_classify(cid, comments_dict[cid])
-            # Classify any newly-arrived replies.
-            for cid, comment in comments_dict.items():
-                if cid in results:
-                    continue
-                _prefetch_and_classify(cid, comment)
+            # score depends on the now-complete reply set — and classify
+            # any newly-arrived replies.
+            pending = expanded_ids + [cid for cid in comments_dict if cid not in results]
+            if fetch_authors:
+                _prefetch_authors((comments_dict[cid] for cid in pending), ctx)
+            for cid in pending:
+                results[cid] = _classify_comment(comments_dict[cid], ctx)
 
     dump_json(out_file, {
         'schema_version': SCHEMA_VERSION,
@@ -9,6 +9,7 @@ class Conversation:
 
         kwargs = {**LLM_PROFILES[profile], **overrides}
         self.llm = ChatOpenAI(**kwargs)
+        self.profile = profile
         self.messages = []
 
     def system(self, text):
@@ -19,6 +20,7 @@ class Conversation:
         from langchain_core.messages import HumanMessage
         self.messages.append(HumanMessage(content=text))
         response = self.llm.invoke(self.messages)
+        _count_tokens(self.profile, response)
         self.messages.append(response)
         return response.content
 
@@ -42,8 +44,9 @@ class Processor:
         kwargs = {**LLM_PROFILES[profile], **overrides}
         prompt_template = ChatPromptTemplate.from_template(prompt)
         llm = ChatOpenAI(**kwargs)
-        chain = prompt_template | llm | StrOutputParser()
-        return chain.invoke(params)
+        response = (prompt_template | llm).invoke(params)
+        _count_tokens(profile, response)
+        return StrOutputParser().invoke(response)
 
     @classmethod
     def conversation(cls, *, profile, **overrides):
@@ -55,3 +58,11 @@ class Processor:
         template = ChatPromptTemplate.from_template(prompt)
         prompt_value = template.format_prompt(**(params or {}))
         return prompt_value.to_string()
+
+
+def _count_tokens(profile, response):
+    import metrics
+    usage = getattr(response, 'usage_metadata', None)
+    if isinstance(usage, dict):
+        metrics.count('llm_tokens', usage.get('input_tokens', 0), profile=profile, kind='input')
+        metrics.count('llm_tokens', usage.get('output_tokens', 0), profile=profile, kind='output')
@@ -3,6 +3,8 @@ import textwrap
 from collections import namedtuple
 from typing import List, Tuple
 
+import metrics
+
 from analysis import Processor
 
 Result = namedtuple('Result', ['text', 'did_work'])
@@ -176,6 +178,7 @@ Unmatched chapters from the description (timestamp and title only — no level):
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text(merged)
         meta.stamp_step('cleanup', cls.CLEANUP_PROMPT_VERSION)
+        metrics.count('transcripts_processed')
         return Result(text=merged, did_work=True)
 
     @classmethod
@@ -14,6 +14,16 @@ if not ROOT.exists():
 DATA_DIR = Path(os.environ.get('DATA_DIR', str(ROOT / "data")))
 MEDIA_DIR = Path(os.environ.get('MEDIA_DIR', '/srv/youtube'))
 
+# Data API record/replay (youtube/replay.py). YOUTUBE_RECORD_DIR captures
+# real responses as fixtures; YOUTUBE_API_ENDPOINT points the client at a
+# local stand-in serving them.
+YOUTUBE_RECORD_DIR = os.environ.get('YOUTUBE_RECORD_DIR')
+YOUTUBE_API_ENDPOINT = os.environ.get('YOUTUBE_API_ENDPOINT')
+
+# Rate limiter priority (interactive, normal or bulk) for every acquire
+# in this process, overriding the default the script sets.
+RATE_LIMIT_PRIORITY = os.environ.get('RATE_LIMIT_PRIORITY')
+
 # Chrome config — only needed for bin/web/ scripts
 CHROME_USER_DIR = os.environ.get('CHROME_USER_DIR')
 CHROME_PROFILE = os.environ.get('CHROME_PROFILE')
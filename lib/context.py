@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import json
+import os
+import threading
+from collections import OrderedDict
 from typing import Optional
 
+# Objects an IdentityMap holds before dropping the least recently used.
+MAX_OBJECTS = 5000
+
 
 class Context:
     """Application context"""
@@ -10,6 +17,7 @@ class Context:
     def __init__(self):
         from datetime import datetime, timezone
         self.batch_time = datetime.now(timezone.utc)
+        self.objects = IdentityMap()
 
     @classmethod
     def get(cls) -> Context:
@@ -21,3 +29,78 @@ class Context:
     @classmethod
     def reset(cls):
         cls._instance = None
+
+
+class IdentityMap:
+    """Objects loaded from files during a batch, keyed by type and path,
+    so repeated gets return the same object without rereading the file.
+    An entry is reused while its file's mtime and size are unchanged.
+
+    Threads racing on one path wait on that path's lock, so they get the
+    same object; loads of different paths run in parallel. The object is
+    shared between them and is never changed in place: an update writes
+    the file, and the next get loads a new object from it."""
+
+    def __init__(self, maxsize=MAX_OBJECTS):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        # Guards _entries and _loading only; never held across a load.
+        self._lock = threading.Lock()
+        # (kind, path) -> [lock, users] for paths being loaded. Reentrant,
+        # as loading a model can get the models it refers to.
+        self._loading = {}
+
+    def get(self, kind, path, load):
+        """The kind object for path, or load() when it isn't held or the
+        file has changed. A None from load isn't held."""
+        key = (kind, path)
+        obj = self._held(key, _stamp(path))
+        if obj is not None:
+            return obj
+        with self._lock:
+            loading = self._loading.setdefault(key, [threading.RLock(), 0])
+            loading[1] += 1
+        try:
+            with loading[0]:
+                # A racer on this path may have loaded it while we waited.
+                obj = self._held(key, _stamp(path))
+                if obj is None:
+                    obj = load()
+                    self.put(kind, path, obj)
+                return obj
+        finally:
+            with self._lock:
+                loading[1] -= 1
+                if not loading[1]:
+                    del self._loading[key]
+
+    def _held(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or stamp is None or entry[0] != stamp:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, kind, path, obj):
+        """Hold obj as what path currently contains."""
+        stamp = _stamp(path)
+        if obj is None or stamp is None:
+            return
+        with self._lock:
+            self._entries[kind, path] = (stamp, obj)
+            self._entries.move_to_end((kind, path))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def load_json(self, path):
+        """Parsed JSON of path, shared; callers must not modify it."""
+        return self.get(dict, path, lambda: json.loads(path.read_text()))
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
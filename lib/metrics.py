@@ -0,0 +1,162 @@
+"""Monitoring metrics in the Prometheus/OpenMetrics text format.
+
+Limiter metrics are read from the limiter DB at render time: window
+utilisation, in-flight tickets and adaptive scales as gauges, and outcome, cost, latency
+and wait-before-grant series as counters and histograms over
+request_log and its hourly rollups. Pipeline code adds its own counters
+with count(), kept in DATA_DIR/metrics.sqlite so every process adds to
+the same totals. bin/metrics_exporter.py serves render() over HTTP or
+writes it for node_exporter's textfile collector."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import config
+
+PREFIX = 'ytarchive_'
+
+CREATE_COUNTERS_SQL = (
+    'CREATE TABLE IF NOT EXISTS counters ('
+    'name TEXT NOT NULL, '
+    'labels TEXT NOT NULL, '
+    'value REAL NOT NULL, '
+    'PRIMARY KEY (name, labels))'
+)
+
+
+class Counters:
+    """Monotonic pipeline counters shared across processes."""
+    _instance: Optional[Counters] = None
+
+    def __init__(self):
+        self.db_path = config.DATA_DIR / 'metrics.sqlite'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn.execute(CREATE_COUNTERS_SQL)
+
+    @classmethod
+    def get(cls) -> Counters:
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    def add(self, name, amount=1, **labels):
+        self._conn.execute(
+            'INSERT INTO counters (name, labels, value) VALUES (?, ?, ?) '
+            'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+            (name, _format_labels(dict(sorted(labels.items()))), amount),
+        )
+
+    def values(self) -> list[tuple[str, str, float]]:
+        """(name, formatted labels, value) for every counter."""
+        return self._conn.execute(
+            'SELECT name, labels, value FROM counters ORDER BY name, labels').fetchall()
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+
+def count(name, amount=1, **labels):
+    """Add amount to the pipeline counter name{labels}."""
+    if amount:
+        Counters.get().add(name, amount, **labels)
+
+
+def render() -> str:
+    """Every metric, as an OpenMetrics text exposition."""
+    lines = []
+    _render_limiter(lines)
+    _render_pipeline(lines)
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path):
+    """Write render() to path atomically, as the textfile collector wants."""
+    path = Path(path)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}')
+    tmp.write_text(render())
+    tmp.replace(path)
+
+
+def _render_limiter(lines):
+    import rate_limits
+    from rate_limiter import HISTOGRAM_BOUNDS, RateLimiter
+
+    limiter = RateLimiter.get()
+    _header(lines, 'rate_limit_window_used', 'gauge', 'Cost counted in the window')
+    _header(lines, 'rate_limit_window_limit', 'gauge', 'Effective limit of the window')
+    _header(lines, 'rate_limit_in_flight', 'gauge', 'Tickets held across processes')
+    for bucket in rate_limits.BUCKETS:
+        for window_sec, limit, used, _ in limiter.window_usage(bucket):
+            labels = _format_labels({'bucket': bucket, 'window': str(window_sec)})
+            lines.append(f'{PREFIX}rate_limit_window_used{labels} {used}')
+            lines.append(f'{PREFIX}rate_limit_window_limit{labels} {limit}')
+        lines.append(f'{PREFIX}rate_limit_in_flight{_format_labels({"bucket": bucket})} '
+                     f'{limiter.in_flight(bucket)}')
+    _header(lines, 'rate_limit_adaptive_scale', 'gauge', 'Learned fraction of the limits in force')
+    for bucket, spec in rate_limits.BUCKETS.items():
+        if 'adaptive' in spec:
+            lines.append(f'{PREFIX}rate_limit_adaptive_scale{_format_labels({"bucket": bucket})} '
+                         f'{limiter.adaptive_scale(bucket)}')
+
+    totals = limiter.totals()
+    _header(lines, 'rate_limit_requests', 'counter', 'Released tickets by outcome')
+    for entry in totals:
+        labels = _format_labels({'bucket': entry.bucket, 'outcome': entry.outcome})
+        lines.append(f'{PREFIX}rate_limit_requests_total{labels} {entry.count}')
+    _header(lines, 'rate_limit_cost', 'counter', 'Cost of released tickets by outcome')
+    for entry in totals:
+        labels = _format_labels({'bucket': entry.bucket, 'outcome': entry.outcome})
+        lines.append(f'{PREFIX}rate_limit_cost_total{labels} {entry.cost}')
+    for name, help_text, sum_attr, hist_attr in (
+        ('rate_limit_latency_seconds', 'Time from grant to release', 'latency_sum', 'latency_hist'),
+        ('rate_limit_wait_seconds', 'Time waited in acquire before grant', 'wait_sum', 'wait_hist'),
+    ):
+        _header(lines, name, 'histogram', help_text)
+        for entry in totals:
+            labels = {'bucket': entry.bucket, 'outcome': entry.outcome}
+            cumulative = 0
+            for bound, n in zip((*HISTOGRAM_BOUNDS, '+Inf'), getattr(entry, hist_attr)):
+                cumulative += n
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{PREFIX}{name}_bucket{_format_labels(dict(labels, le=le))} {cumulative}')
+            lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {cumulative}')
+            lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {getattr(entry, sum_attr)}')
+
+
+def _render_pipeline(lines):
+    current = None
+    for name, labels, value in Counters.get().values():
+        if name != current:
+            current = name
+            _header(lines, name, 'counter', name.replace('_', ' ').capitalize())
+        lines.append(f'{PREFIX}{name}_total{labels} {int(value) if value.is_integer() else value}')
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f'# TYPE {PREFIX}{name} {kind}')
+    lines.append(f'# HELP {PREFIX}{name} {help_text}.')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+               for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
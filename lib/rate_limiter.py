@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import bisect
+import contextvars
+import json
+import math
 import os
 import socket
 import sqlite3
 import threading
 import time
+from collections import defaultdict
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Optional
 from zoneinfo import ZoneInfo
 
 import rate_limits
+from wakeups import AsyncListener, Wakeups
 
 import config
 
@@ -18,11 +27,25 @@ CROSS_HOST_STALE_SECONDS = 86400
 LOCK_POLL_SECONDS = 1.0
 ACQUIRE_JITTER_SECONDS = 0.05
 CLEANUP_INTERVAL_SECONDS = 60
+LEASE_FLUSH_ROWS = 50
+# Each window's usage is kept in this many time slots, so checking a
+# window reads at most this many rows however busy the bucket is. Usage
+# is counted per whole slot, which errs on the safe side by at most one
+# slot (1/60 of the window).
+SLOTS_PER_WINDOW = 60
+# request_log rows past twice the longest window are folded into hourly
+# request_rollup rows, with these latency percentiles.
+ROLLUP_SECONDS = 3600
+ROLLUP_PERCENTILES = (50, 90, 99)
+# Upper bounds in seconds of the latency and wait histograms kept per
+# rollup row; a last count holds everything above.
+HISTOGRAM_BOUNDS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0)
 DB_FILE_MODE = 0o664
 
 OUTCOME_OK = 'ok'
 OUTCOME_BLOCKED = 'blocked'
 OUTCOME_ABANDONED = 'abandoned'
+OUTCOME_LEASED = 'leased'
 OUTCOME_ERROR_PREFIX = 'error:'
 
 CREATE_TABLE_SQL = (
@@ -34,21 +57,183 @@ CREATE_TABLE_SQL = (
     'released_at REAL, '
     'outcome TEXT, '
     'pid INTEGER NOT NULL, '
-    'host TEXT NOT NULL)'
+    'host TEXT NOT NULL, '
+    'attempt INTEGER NOT NULL DEFAULT 1, '
+    'wait_sec REAL NOT NULL DEFAULT 0)'
 )
+
 CREATE_INDEX_SQL = (
     'CREATE INDEX IF NOT EXISTS idx_bucket_requested_at '
     'ON request_log(bucket, requested_at)'
 )
+CREATE_SLOTS_SQL = (
+    'CREATE TABLE IF NOT EXISTS usage_slots ('
+    'bucket TEXT NOT NULL, '
+    'window_sec INTEGER NOT NULL, '
+    'slot INTEGER NOT NULL, '
+    'cost INTEGER NOT NULL, '
+    'PRIMARY KEY (bucket, window_sec, slot))'
+)
+# Which windows usage_slots is kept for, so windows added or changed in
+# rate_limits.BUCKETS are rebuilt from request_log before first use.
+CREATE_COUNTED_WINDOWS_SQL = (
+    'CREATE TABLE IF NOT EXISTS counted_windows ('
+    'bucket TEXT NOT NULL, '
+    'window_sec INTEGER NOT NULL, '
+    "reset_timezone TEXT NOT NULL DEFAULT '', "
+    'PRIMARY KEY (bucket, window_sec))'
+)
+# Blocked acquires queued for fair scheduling. flow is host:pid:priority;
+# tags are virtual times from start-time fair queuing, and a waiter is
+# only served ahead of others once ready_at (when its own wait ends) has
+# passed, so one waiting out a window doesn't hold up callers that fit.
+CREATE_WAITERS_SQL = (
+    'CREATE TABLE IF NOT EXISTS waiters ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'bucket TEXT NOT NULL, '
+    'flow TEXT NOT NULL, '
+    'start_tag REAL NOT NULL, '
+    'finish_tag REAL NOT NULL, '
+    'ready_at REAL NOT NULL, '
+    'pid INTEGER NOT NULL, '
+    'host TEXT NOT NULL, '
+    'seen_at REAL NOT NULL)'
+)
+CREATE_WAITERS_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS idx_waiters_bucket ON waiters(bucket, finish_tag)'
+)
+# Per bucket virtual clock, and the last finish tag granted to each flow.
+CREATE_FAIR_CLOCK_SQL = (
+    'CREATE TABLE IF NOT EXISTS fair_clock ('
+    'bucket TEXT PRIMARY KEY, '
+    'vtime REAL NOT NULL)'
+)
+CREATE_FAIR_FLOWS_SQL = (
+    'CREATE TABLE IF NOT EXISTS fair_flows ('
+    'bucket TEXT NOT NULL, '
+    'flow TEXT NOT NULL, '
+    'last_finish REAL NOT NULL, '
+    'seen_at REAL NOT NULL, '
+    'PRIMARY KEY (bucket, flow))'
+)
+# Learned fraction of an adaptive bucket's limits, see rate_limits.
+CREATE_ADAPTIVE_SQL = (
+    'CREATE TABLE IF NOT EXISTS adaptive_limits ('
+    'bucket TEXT PRIMARY KEY, '
+    'scale REAL NOT NULL, '
+    'successes INTEGER NOT NULL, '
+    'decreased_at REAL NOT NULL)'
+)
+# Hourly aggregates of released request_log rows per bucket and outcome;
+# hour is the epoch second it starts at, latencies are released_at -
+# requested_at and waits wait_sec, in seconds. The *_hist columns are
+# JSON counts per HISTOGRAM_BOUNDS interval.
+CREATE_ROLLUP_SQL = (
+    'CREATE TABLE IF NOT EXISTS request_rollup ('
+    'bucket TEXT NOT NULL, '
+    'hour INTEGER NOT NULL, '
+    'outcome TEXT NOT NULL, '
+    'count INTEGER NOT NULL, '
+    'cost INTEGER NOT NULL, '
+    'latency_p50 REAL, '
+    'latency_p90 REAL, '
+    'latency_p99 REAL, '
+    'latency_sum REAL NOT NULL, '
+    'latency_hist TEXT NOT NULL, '
+    'wait_sum REAL NOT NULL, '
+    'wait_hist TEXT NOT NULL, '
+    'PRIMARY KEY (bucket, hour, outcome))'
+)
+_EMPTY_HISTOGRAM = json.dumps([0] * (len(HISTOGRAM_BOUNDS) + 1))
+# Columns added to tables since they were first created.
+ADDED_COLUMNS = {
+    'request_log': {
+        'attempt': 'INTEGER NOT NULL DEFAULT 1',
+        'wait_sec': 'REAL NOT NULL DEFAULT 0',
+        # In-flight slots a lease row holds for its process's spends.
+        'slots': 'INTEGER NOT NULL DEFAULT 0',
+    },
+    'request_rollup': {
+        'latency_sum': 'REAL NOT NULL DEFAULT 0',
+        'latency_hist': f"TEXT NOT NULL DEFAULT '{_EMPTY_HISTOGRAM}'",
+        'wait_sum': 'REAL NOT NULL DEFAULT 0',
+        'wait_hist': f"TEXT NOT NULL DEFAULT '{_EMPTY_HISTOGRAM}'",
+    },
+}
+
+_priority: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'rate_limit_priority', default=None)
+_default_priority = rate_limits.PRIORITY_NORMAL
 
 
 class UnknownBucket(Exception):
     pass
 
 
+@dataclass
+class Totals:
+    """Released requests of one bucket and outcome since records began.
+    Histograms count per HISTOGRAM_BOUNDS interval, not cumulatively."""
+    bucket: str
+    outcome: str
+    count: int = 0
+    cost: int = 0
+    latency_sum: float = 0.0
+    latency_hist: list[int] = field(default_factory=lambda: [0] * (len(HISTOGRAM_BOUNDS) + 1))
+    wait_sum: float = 0.0
+    wait_hist: list[int] = field(default_factory=lambda: [0] * (len(HISTOGRAM_BOUNDS) + 1))
+
+
+class UnknownPriority(ValueError):
+    pass
+
+
+def set_default_priority(priority):
+    """Priority for acquires in this process that don't name one.
+    RATE_LIMIT_PRIORITY in the environment still wins."""
+    global _default_priority
+    _default_priority = _check_priority(priority)
+
+
+@contextmanager
+def priority(priority):
+    """Acquire at priority within the block (per thread or task)."""
+    token = _priority.set(_check_priority(priority))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get() or config.RATE_LIMIT_PRIORITY or _default_priority
+
+
+def _check_priority(priority):
+    if priority not in rate_limits.PRIORITY_WEIGHTS:
+        raise UnknownPriority(priority)
+    return priority
+
+
+@dataclass
+class Wait:
+    """Why an acquire has to wait: until a timestamp, or until then or a
+    release in the bucket, whichever comes first."""
+    until: float
+    on_release: bool = False
+
+
+@dataclass
+class _Queued:
+    """A blocking acquire's place in the waiters table, kept across tries."""
+    id: Optional[int] = None
+    start: float = 0.0
+    finish: float = 0.0
+
+
 @dataclass
 class Ticket:
-    limiter: RateLimiter
+    limiter: RateLimiter | Lease
     id: int
     bucket: str
     cost: int
@@ -68,7 +253,7 @@ class Ticket:
         if self._released:
             return
         self._released = True
-        self.limiter._release(self.id, outcome)
+        self.limiter._release(self.id, outcome, self.bucket)
 
     def __enter__(self):
         return self
@@ -82,6 +267,57 @@ class Ticket:
             self.error(exc)
         return False
 
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Releasing writes to the database, which may wait on its lock.
+        return await asyncio.to_thread(self.__exit__, exc_type, exc, tb)
+
+
+class Lease:
+    """Tokens reserved for this process by one request_log row, spent from
+    memory. Spends are written back as ordinary rows in batches, and the
+    lease row shrinks by what they cost; what is left is returned when
+    the lease closes. The row also holds a share of the bucket's
+    in-flight slots, which spends fill in memory; closing the lease gives
+    back what they don't still use."""
+
+    def __init__(self, limiter, row_id, bucket, spec, tokens, expires_at, slots):
+        self.limiter = limiter
+        self.row_id = row_id
+        self.bucket = bucket
+        self.spec = spec
+        self.remaining = tokens
+        self.row_cost = tokens
+        self.expires_at = expires_at
+        self.slots = slots
+        self.closed = False
+        self._next_id = 0
+        self._in_flight = {}
+        self._done = []
+
+    def take(self, cost, attempt, now, waited=0.0) -> Ticket:
+        self._next_id += 1
+        self.remaining -= cost
+        self._in_flight[self._next_id] = (cost, now, attempt, waited)
+        return Ticket(limiter=self, id=self._next_id, bucket=self.bucket, cost=cost)
+
+    def _release(self, ticket_id, outcome, bucket):
+        with self.limiter._lease_lock:
+            cost, requested_at, attempt, waited = self._in_flight.pop(ticket_id)
+            self._done.append((cost, requested_at, time.time(), outcome, attempt, waited))
+            if len(self._done) >= LEASE_FLUSH_ROWS or (self.closed and not self._in_flight):
+                self.limiter._flush_lease(self)
+        self.limiter._wakeups.notify(self.bucket)
+
+    @property
+    def reserved(self):
+        """Cost the lease row must still carry."""
+        in_flight = sum(row[0] for row in self._in_flight.values())
+        unflushed = sum(row[0] for row in self._done)
+        return in_flight + unflushed + (0 if self.closed else self.remaining)
+
 
 class RateLimiter:
     _instance: Optional[RateLimiter] = None
@@ -92,8 +328,13 @@ class RateLimiter:
         self.host = socket.gethostname()
         self._last_cleanup = 0.0
         self._local = threading.local()
+        self._leases = {}
+        self._lease_lock = threading.Lock()
+        self._synced = set()
+        self._wakeups = Wakeups(config.DATA_DIR / 'wakeups')
         self._init_schema()
         self._fix_file_modes()
+        atexit.register(self.close_leases)
 
     @classmethod
     def get(cls) -> RateLimiter:
@@ -105,26 +346,243 @@ class RateLimiter:
     def reset(cls):
         cls._instance = None
 
-    def acquire(self, bucket, cost=1) -> Ticket:
-        return self._acquire(bucket, cost, blocking=True)
+    def acquire(self, bucket, cost=1, attempt=1, priority=None) -> Ticket:
+        return self._acquire(bucket, cost, blocking=True, attempt=attempt, priority=priority)
 
-    def try_acquire(self, bucket, cost=1) -> Optional[Ticket]:
-        return self._acquire(bucket, cost, blocking=False)
+    def try_acquire(self, bucket, cost=1, priority=None) -> Optional[Ticket]:
+        """A ticket if the bucket has room and no waiter is due first."""
+        return self._acquire(bucket, cost, blocking=False, priority=priority)
 
-    def _acquire(self, bucket, cost, blocking):
+    def close_leases(self):
+        """Return the unspent tokens of every open lease."""
+        with self._lease_lock:
+            for lease in list(self._leases.values()):
+                self._close_lease(lease)
+            self._leases.clear()
+
+    def retry_count(self, bucket, window_sec) -> int:
+        """Retry attempts (attempt > 1) logged for bucket in the window."""
+        row = self._conn.execute(
+            'SELECT COUNT(*) FROM request_log '
+            'WHERE bucket = ? AND attempt > 1 AND requested_at >= ?',
+            (bucket, time.time() - window_sec),
+        ).fetchone()
+        return row[0]
+
+    def window_usage(self, bucket) -> list[tuple[int, int, int, float]]:
+        """(window_sec, limit, used, frees_at) for each window of bucket.
+        frees_at is when the oldest usage still counted drops out."""
         spec = rate_limits.BUCKETS.get(bucket)
         if spec is None:
             raise UnknownBucket(bucket)
+        self._sync_counters(bucket, spec)
+        now = time.time()
+        tz_name = spec.get('reset_timezone')
+        scale = _adaptive_scale(self._conn, bucket, spec)
+        return [(window_sec, _effective_limit(limit, scale),
+                 *_window_usage(self._conn, bucket, window_sec, tz_name, now))
+                for window_sec, limit in spec['windows']]
 
-        while True:
-            result = self._check_and_insert(bucket, cost, spec)
-            if isinstance(result, Ticket):
-                return result
-            if not blocking:
-                return None
-            wait_until = result
-            delay = max(0.0, wait_until - time.time()) + ACQUIRE_JITTER_SECONDS
+    def remaining(self, bucket, priority=None) -> tuple[int, float]:
+        """(cost bucket can still take at priority, when more frees up),
+        by its tightest window. Below interactive priority the interactive
+        reserve doesn't count."""
+        spec = rate_limits.BUCKETS.get(bucket)
+        if spec is None:
+            raise UnknownBucket(bucket)
+        priority = _check_priority(priority) if priority else current_priority()
+        self._sync_counters(bucket, spec)
+        left, frees_at = min(_window_room(self._conn, bucket, spec, time.time(), priority),
+                             key=lambda room: room[0])
+        return max(0, left), frees_at
+
+    def adaptive_scale(self, bucket) -> float:
+        """Learned fraction of bucket's limits in force; 1.0 unless adaptive."""
+        spec = rate_limits.BUCKETS.get(bucket)
+        if spec is None:
+            raise UnknownBucket(bucket)
+        return _adaptive_scale(self._conn, bucket, spec)
+
+    def rollup(self, before=None):
+        """Fold released request_log rows from whole hours before before
+        (default: twice the longest window ago) into request_rollup."""
+        if before is None:
+            before = time.time() - 2 * max(w for spec in rate_limits.BUCKETS.values()
+                                           for w, _ in spec['windows'])
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            _rollup(conn, before)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def history(self, since) -> list[tuple]:
+        """(bucket, hour, outcome, count, cost, p50, p90, p99) for every
+        hour from since on: rolled-up hours, then what request_log holds."""
+        return [row[:8] for row in self._hours(since)]
+
+    def totals(self) -> list[Totals]:
+        """All-time Totals per bucket and outcome, for monitoring."""
+        totals = {}
+        for bucket, _, outcome, count, cost, _, _, _, latency_sum, latency_hist, wait_sum, \
+                wait_hist in self._hours(0):
+            entry = totals.get((bucket, outcome))
+            if entry is None:
+                entry = totals[bucket, outcome] = Totals(bucket, outcome)
+            entry.count += count
+            entry.cost += cost
+            entry.latency_sum += latency_sum
+            entry.wait_sum += wait_sum
+            entry.latency_hist = [a + b for a, b in zip(entry.latency_hist, latency_hist)]
+            entry.wait_hist = [a + b for a, b in zip(entry.wait_hist, wait_hist)]
+        return sorted(totals.values(), key=lambda entry: (entry.bucket, entry.outcome))
+
+    def in_flight(self, bucket) -> int:
+        """In-flight slots of bucket held right now, across processes:
+        one per ticket, plus the share each lease holds."""
+        row = self._conn.execute(
+            'SELECT COALESCE(SUM(CASE WHEN outcome IS NULL THEN 1 ELSE slots END), 0) '
+            'FROM request_log WHERE bucket = ? AND (outcome IS NULL OR outcome = ?)',
+            (bucket, OUTCOME_LEASED),
+        ).fetchone()
+        return row[0]
+
+    def _hours(self, since):
+        conn = self._conn
+        since = int(since // ROLLUP_SECONDS * ROLLUP_SECONDS)
+        rows = [
+            (*row[:9], json.loads(row[9]), row[10], json.loads(row[11]))
+            for row in conn.execute(
+                'SELECT bucket, hour, outcome, count, cost, latency_p50, latency_p90, latency_p99, '
+                'latency_sum, latency_hist, wait_sum, wait_hist '
+                'FROM request_rollup WHERE hour >= ? ORDER BY hour, bucket, outcome',
+                (since,),
+            )
+        ]
+        live = conn.execute(
+            'SELECT bucket, requested_at, released_at, outcome, cost, wait_sec FROM request_log '
+            'WHERE requested_at >= ? AND outcome IS NOT NULL AND outcome != ?',
+            (since, OUTCOME_LEASED),
+        ).fetchall()
+        return rows + sorted(_aggregate(live), key=lambda row: (row[1], row[0], row[2]))
+
+    def max_in_flight(self, bucket) -> int:
+        """How many tickets in bucket may be outstanding at once."""
+        spec = rate_limits.BUCKETS.get(bucket)
+        if spec is None:
+            raise UnknownBucket(bucket)
+        return spec.get('max_in_flight', 1)
+
+    def _acquire(self, bucket, cost, blocking, attempt=1, priority=None):
+        spec = rate_limits.BUCKETS.get(bucket)
+        if spec is None:
+            raise UnknownBucket(bucket)
+        priority = _check_priority(priority) if priority else current_priority()
+        queued = _Queued() if blocking else None
+        started = time.time()
+        waiter = None
+        try:
+            while True:
+                result = self._try_once(bucket, cost, spec, attempt, priority, queued, started)
+                if isinstance(result, Ticket):
+                    return result
+                if not blocking:
+                    return None
+                waiter = self._wait(bucket, result, waiter)
+        finally:
+            if waiter is not None:
+                waiter.close()
+            if queued is not None:
+                self._dequeue(queued)
+
+    def _wait(self, bucket, wait, waiter):
+        """Sleep out a Wait, woken early by releases where it allows.
+        Returns the waiter to keep listening with."""
+        if wait.on_release and waiter is None:
+            # Listen first, then check again: a release between the check
+            # and listening would otherwise go unnoticed.
+            return self._wakeups.listen(bucket)
+        delay = max(0.0, wait.until - time.time()) + ACQUIRE_JITTER_SECONDS
+        if wait.on_release:
+            waiter.wait(delay)
+        else:
             time.sleep(delay)
+        return waiter
+
+    def _try_once(self, bucket, cost, spec, attempt, priority, queued, started):
+        """A Ticket if one can be had right now, otherwise a Wait."""
+        if spec.get('lease'):
+            return self._take_from_lease(bucket, cost, spec, attempt, priority, queued, started)
+        return self._check_and_insert(
+            bucket, cost, spec, attempt, priority=priority, queued=queued, started=started)
+
+    def _dequeue(self, queued):
+        """Drop a waiter that gave up, or was served by a lease."""
+        if queued.id is not None:
+            self._conn.execute('DELETE FROM waiters WHERE id = ?', (queued.id,))
+            queued.id = None
+
+    def _take_from_lease(self, bucket, cost, spec, attempt, priority, queued, started):
+        tokens, ttl = spec['lease']['tokens'], spec['lease']['ttl']
+        with self._lease_lock:
+            now = time.time()
+            lease = self._leases.get(bucket)
+            if lease is not None and (now >= lease.expires_at or lease.remaining < cost):
+                self._close_lease(lease)
+                del self._leases[bucket]
+                lease = None
+            if lease is None:
+                # Fall back to a lease of just this call's cost when a
+                # full block doesn't fit, e.g. near the end of a quota.
+                for size in sorted({max(tokens, cost), cost}, reverse=True):
+                    result = self._check_and_insert(
+                        bucket, size, spec, ttl=ttl, priority=priority, queued=queued)
+                    if isinstance(result, Lease):
+                        lease = self._leases[bucket] = result
+                        break
+                else:
+                    return result
+            if len(lease._in_flight) < lease.slots:
+                return lease.take(cost, attempt, now, now - started)
+            return Wait(now + LOCK_POLL_SECONDS, on_release=True)
+
+    def _close_lease(self, lease):
+        lease.closed = True
+        self._flush_lease(lease)
+        self._wakeups.notify(lease.bucket)
+
+    def _flush_lease(self, lease):
+        """Write finished spends as request_log rows and shrink the lease
+        row to what it still covers, in one transaction."""
+        done, lease._done = lease._done, []
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO request_log '
+                '(bucket, cost, requested_at, released_at, outcome, pid, host, attempt, wait_sec) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(lease.bucket, cost, requested_at, released_at, outcome,
+                  os.getpid(), self.host, attempt, waited)
+                 for cost, requested_at, released_at, outcome, attempt, waited in done],
+            )
+            reserved = lease.reserved
+            slots = len(lease._in_flight) if lease.closed else lease.slots
+            if reserved:
+                conn.execute('UPDATE request_log SET cost = ?, slots = ? WHERE id = ?',
+                             (reserved, slots, lease.row_id))
+            else:
+                conn.execute('DELETE FROM request_log WHERE id = ?', (lease.row_id,))
+            usage = [(row[1], row[0]) for row in done]
+            usage.append((lease.expires_at, reserved - lease.row_cost))
+            _add_usage(conn, lease.bucket, lease.spec, usage)
+            conn.execute('COMMIT')
+            lease.row_cost = reserved
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
 
     @property
     def _conn(self):
@@ -152,116 +610,340 @@ class RateLimiter:
     def _init_schema(self):
         self._conn.execute(CREATE_TABLE_SQL)
         self._conn.execute(CREATE_INDEX_SQL)
+        self._conn.execute(CREATE_SLOTS_SQL)
+        self._conn.execute(CREATE_COUNTED_WINDOWS_SQL)
+        self._conn.execute(CREATE_WAITERS_SQL)
+        self._conn.execute(CREATE_WAITERS_INDEX_SQL)
+        self._conn.execute(CREATE_FAIR_CLOCK_SQL)
+        self._conn.execute(CREATE_FAIR_FLOWS_SQL)
+        self._conn.execute(CREATE_ADAPTIVE_SQL)
+        self._conn.execute(CREATE_ROLLUP_SQL)
+        for table, added in ADDED_COLUMNS.items():
+            columns = {row[1] for row in self._conn.execute(f'PRAGMA table_info({table})')}
+            for column, definition in added.items():
+                if column in columns:
+                    continue
+                try:
+                    self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+                except sqlite3.OperationalError:
+                    pass  # another process added it first
 
-    def _check_and_insert(self, bucket, cost, spec):
+    def _check_and_insert(self, bucket, cost, spec, attempt=1, ttl=None,
+                          priority=rate_limits.PRIORITY_NORMAL, queued=None, started=None):
+        """Insert a ticket row, or with ttl a lease row, if the bucket has
+        room and no ready waiter comes first; otherwise return a Wait.
+        With queued, a wait also takes or keeps a place in the queue."""
+        self._sync_counters(bucket, spec)
+        flow = f'{self.host}:{os.getpid()}:{priority}'
         conn = self._conn
         conn.execute('BEGIN IMMEDIATE')
         try:
             now = time.time()
+            position = self._fair_position(conn, bucket, flow, cost, priority, queued, now)
 
-            lock_wait = self._reclaim_or_wait_for_lock(conn, bucket, now)
-            if lock_wait is not None:
-                conn.execute('ROLLBACK')
-                return lock_wait
+            free_slots = spec.get('max_in_flight', 1) - self._live_in_flight(conn, bucket, spec, now)
+            if free_slots <= 0:
+                self._enqueue(conn, bucket, flow, cost, priority, queued, position, now, now)
+                conn.execute('COMMIT')
+                return Wait(now + LOCK_POLL_SECONDS, on_release=True)
+
+            if position is not None and position[2]:
+                # A waiter due before us is being served; its grant notifies.
+                self._enqueue(conn, bucket, flow, cost, priority, queued, position, now, now)
+                conn.execute('COMMIT')
+                return Wait(now + LOCK_POLL_SECONDS, on_release=True)
 
             if now - self._last_cleanup > CLEANUP_INTERVAL_SECONDS:
                 max_window = max(w for w, _ in spec['windows'])
-                conn.execute(
-                    'DELETE FROM request_log WHERE requested_at < ? AND outcome IS NOT NULL',
-                    (now - max_window * 2,),
+                _rollup(conn, now - max_window * 2)
+                tz_name = spec.get('reset_timezone')
+                conn.executemany(
+                    'DELETE FROM usage_slots WHERE bucket = ? AND window_sec = ? AND slot < ?',
+                    [(bucket, w, _first_counted_slot(now, w, tz_name)) for w, _ in spec['windows']],
                 )
+                conn.execute(
+                    'DELETE FROM fair_flows WHERE seen_at < ?', (now - CROSS_HOST_STALE_SECONDS,))
                 self._last_cleanup = now
 
-            block_until = self._earliest_free(conn, bucket, cost, spec, now)
+            block_until = self._earliest_free(conn, bucket, cost, spec, now, priority)
             if block_until is not None:
-                conn.execute('ROLLBACK')
-                return block_until
+                self._enqueue(conn, bucket, flow, cost, priority, queued, position, block_until, now)
+                conn.execute('COMMIT')
+                return Wait(block_until)
 
-            cursor = conn.execute(
-                'INSERT INTO request_log '
-                '(bucket, cost, requested_at, pid, host) '
-                'VALUES (?, ?, ?, ?, ?)',
-                (bucket, cost, now, os.getpid(), self.host),
-            )
-            row_id = cursor.lastrowid
-            conn.execute('COMMIT')
-            return Ticket(limiter=self, id=row_id, bucket=bucket, cost=cost)
+            if position is not None:
+                _advance_fair_clock(conn, bucket, flow, position[0], position[1], now)
+                if queued is not None and queued.id is not None:
+                    conn.execute('DELETE FROM waiters WHERE id = ?', (queued.id,))
+                    queued.id = None
+
+            if ttl is not None:
+                # Dated at expiry, the row covers every spend the lease can
+                # make until those are written back as their own rows.
+                slots = min(free_slots, spec['lease'].get('slots', free_slots))
+                cursor = conn.execute(
+                    'INSERT INTO request_log '
+                    '(bucket, cost, requested_at, outcome, pid, host, slots) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (bucket, cost, now + ttl, OUTCOME_LEASED, os.getpid(), self.host, slots),
+                )
+                _add_usage(conn, bucket, spec, [(now + ttl, cost)])
+                conn.execute('COMMIT')
+                result = Lease(self, cursor.lastrowid, bucket, spec, cost, now + ttl, slots)
+            else:
+                cursor = conn.execute(
+                    'INSERT INTO request_log '
+                    '(bucket, cost, requested_at, pid, host, attempt, wait_sec) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (bucket, cost, now, os.getpid(), self.host, attempt,
+                     now - started if started is not None else 0.0),
+                )
+                _add_usage(conn, bucket, spec, [(now, cost)])
+                conn.execute('COMMIT')
+                result = Ticket(limiter=self, id=cursor.lastrowid, bucket=bucket, cost=cost)
         except Exception:
             conn.execute('ROLLBACK')
             raise
+        if position is not None and position[3]:
+            # Let the waiters behind re-check who is next.
+            self._wakeups.notify(bucket)
+        return result
 
-    def _reclaim_or_wait_for_lock(self, conn, bucket, now):
-        """Ensure at most one in-flight row per bucket.
-
-        Returns None if the bucket is free to acquire, or a timestamp to
-        wait until if another caller currently holds it.
-        """
-        row = conn.execute(
-            'SELECT id, pid, host, requested_at FROM request_log '
-            'WHERE bucket = ? AND outcome IS NULL '
-            'ORDER BY requested_at ASC LIMIT 1',
-            (bucket,),
-        ).fetchone()
-        if row is None:
+    def _fair_position(self, conn, bucket, flow, cost, priority, queued, now):
+        """(start tag, finish tag, whether a ready waiter is due first,
+        whether others wait) for this request, or None when nobody is
+        queued, the common case, which skips fair scheduling."""
+        queued_id = queued.id if queued is not None else None
+        others = []
+        for waiter_id, finish, ready_at, pid, host, seen_at in conn.execute(
+            'SELECT id, finish_tag, ready_at, pid, host, seen_at FROM waiters '
+            'WHERE bucket = ? AND id IS NOT ?',
+            (bucket, queued_id),
+        ).fetchall():
+            if host == self.host:
+                alive = _pid_alive(pid)
+            else:
+                alive = now - seen_at < CROSS_HOST_STALE_SECONDS
+            if alive:
+                others.append((finish, waiter_id, ready_at))
+            else:
+                conn.execute('DELETE FROM waiters WHERE id = ?', (waiter_id,))
+        if queued_id is not None:
+            start, finish = queued.start, queued.finish
+        elif others:
+            start, finish = _fair_tags(conn, bucket, flow, cost, priority)
+        else:
             return None
+        key = (finish, queued_id if queued_id is not None else math.inf)
+        ahead = any((f, i) < key for f, i, ready_at in others if ready_at <= now)
+        return start, finish, ahead, bool(others)
 
-        held_id, held_pid, held_host, held_at = row
-
-        if held_host == self.host:
-            if _pid_alive(held_pid):
-                return now + LOCK_POLL_SECONDS
-        elif now - held_at < CROSS_HOST_STALE_SECONDS:
-            return now + LOCK_POLL_SECONDS
-
-        conn.execute(
-            'UPDATE request_log SET outcome=?, released_at=? WHERE id=?',
-            (OUTCOME_ABANDONED, now, held_id),
+    def _enqueue(self, conn, bucket, flow, cost, priority, queued, position, ready_at, now):
+        """Take or refresh queued's place in the waiters table."""
+        if queued is None:
+            return
+        if queued.id is not None:
+            conn.execute(
+                'UPDATE waiters SET ready_at = ?, seen_at = ? WHERE id = ?',
+                (ready_at, now, queued.id),
+            )
+            return
+        if position is None:
+            queued.start, queued.finish = _fair_tags(conn, bucket, flow, cost, priority)
+        else:
+            queued.start, queued.finish = position[0], position[1]
+        cursor = conn.execute(
+            'INSERT INTO waiters '
+            '(bucket, flow, start_tag, finish_tag, ready_at, pid, host, seen_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (bucket, flow, queued.start, queued.finish, ready_at, os.getpid(), self.host, now),
         )
-        return None
+        queued.id = cursor.lastrowid
 
-    def _earliest_free(self, conn, bucket, cost, spec, now):
-        tz_name = spec.get('reset_timezone')
-        wait_until = None
+    def _live_in_flight(self, conn, bucket, spec, now) -> int:
+        """In-flight slots of bucket held across processes and hosts: one
+        per ticket, plus each lease's share. Tickets of dead processes are
+        marked abandoned and their usage given back; their leases, and
+        leases a ttl past expiry, give back their slots."""
+        rows = conn.execute(
+            'SELECT id, pid, host, requested_at, cost FROM request_log '
+            'WHERE bucket = ? AND outcome IS NULL',
+            (bucket,),
+        ).fetchall()
 
-        for window_sec, limit in spec['windows']:
-            if tz_name:
-                window_start = _absolute_window_start(now, tz_name)
+        live = 0
+        for held_id, held_pid, held_host, held_at, held_cost in rows:
+            if held_host == self.host:
+                alive = _pid_alive(held_pid)
             else:
-                window_start = now - window_sec
-
-            row = conn.execute(
-                'SELECT COALESCE(SUM(cost), 0) FROM request_log '
-                'WHERE bucket = ? AND requested_at >= ? '
-                "AND COALESCE(outcome, '') != ?",
-                (bucket, window_start, OUTCOME_ABANDONED),
-            ).fetchone()
-            current = row[0]
-
-            if current + cost <= limit:
+                alive = now - held_at < CROSS_HOST_STALE_SECONDS
+            if alive:
+                live += 1
                 continue
+            conn.execute(
+                'UPDATE request_log SET outcome=?, released_at=? WHERE id=?',
+                (OUTCOME_ABANDONED, now, held_id),
+            )
+            _add_usage(conn, bucket, spec, [(held_at, -held_cost)])
 
-            if tz_name:
-                next_free = _next_absolute_reset(now, tz_name)
+        # A lease row is dated at its expiry. An owner that stops spending
+        # only closes the lease on its next acquire, so a ttl past expiry
+        # its share is taken back rather than held until the owner exits.
+        grace = spec['lease']['ttl'] if spec.get('lease') else 0.0
+        for lease_id, lease_pid, lease_host, expires_at, slots in conn.execute(
+            'SELECT id, pid, host, requested_at, slots FROM request_log '
+            'WHERE bucket = ? AND outcome = ? AND slots > 0',
+            (bucket, OUTCOME_LEASED),
+        ).fetchall():
+            alive = now < expires_at + grace and (lease_host != self.host or _pid_alive(lease_pid))
+            if alive:
+                live += slots
             else:
-                row2 = conn.execute(
-                    'SELECT MIN(requested_at) FROM request_log '
-                    'WHERE bucket = ? AND requested_at >= ? '
-                    "AND COALESCE(outcome, '') != ?",
-                    (bucket, window_start, OUTCOME_ABANDONED),
-                ).fetchone()
-                oldest = row2[0] if row2[0] is not None else now
-                next_free = oldest + window_sec
+                conn.execute('UPDATE request_log SET slots = 0 WHERE id = ?', (lease_id,))
+        return live
 
+    def _earliest_free(self, conn, bucket, cost, spec, now, priority=rate_limits.PRIORITY_NORMAL):
+        wait_until = None
+        for left, next_free in _window_room(conn, bucket, spec, now, priority):
+            if cost <= left:
+                continue
             if wait_until is None or next_free > wait_until:
                 wait_until = next_free
 
         return wait_until
 
-    def _release(self, ticket_id, outcome):
-        self._conn.execute(
-            'UPDATE request_log SET released_at = ?, outcome = ? WHERE id = ?',
-            (time.time(), outcome, ticket_id),
-        )
+    def _sync_counters(self, bucket, spec):
+        """Rebuild usage_slots from request_log for any window of bucket
+        they aren't kept for yet, e.g. after a limit change."""
+        if bucket in self._synced:
+            return
+        tz_name = spec.get('reset_timezone') or ''
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            counted = dict(conn.execute(
+                'SELECT window_sec, reset_timezone FROM counted_windows WHERE bucket = ?',
+                (bucket,),
+            ).fetchall())
+            for window_sec, limit in spec['windows']:
+                if counted.get(window_sec) == tz_name:
+                    continue
+                conn.execute(
+                    'DELETE FROM usage_slots WHERE bucket = ? AND window_sec = ?',
+                    (bucket, window_sec),
+                )
+                rows = conn.execute(
+                    'SELECT requested_at, cost FROM request_log '
+                    'WHERE bucket = ? AND requested_at >= ? '
+                    "AND COALESCE(outcome, '') != ?",
+                    (bucket, time.time() - window_sec * 2, OUTCOME_ABANDONED),
+                ).fetchall()
+                _add_usage(conn, bucket, dict(spec, windows=[(window_sec, limit)]), rows)
+                conn.execute(
+                    'INSERT OR REPLACE INTO counted_windows (bucket, window_sec, reset_timezone) '
+                    'VALUES (?, ?, ?)',
+                    (bucket, window_sec, tz_name),
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._synced.add(bucket)
+
+    def _release(self, ticket_id, outcome, bucket):
+        now = time.time()
+        policy = rate_limits.BUCKETS.get(bucket, {}).get('adaptive')
+        if policy is None or outcome not in (OUTCOME_OK, OUTCOME_BLOCKED):
+            self._conn.execute(
+                'UPDATE request_log SET released_at = ?, outcome = ? WHERE id = ?',
+                (now, outcome, ticket_id),
+            )
+        else:
+            conn = self._conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'UPDATE request_log SET released_at = ?, outcome = ? WHERE id = ?',
+                    (now, outcome, ticket_id),
+                )
+                requested_at, = conn.execute(
+                    'SELECT requested_at FROM request_log WHERE id = ?', (ticket_id,)).fetchone()
+                _adapt(conn, bucket, policy, outcome, requested_at, now)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        self._wakeups.notify(bucket)
+
+
+class AsyncRateLimiter:
+    """asyncio face of RateLimiter. Tickets come from the same SQLite
+    accounting, so coroutines share limits with threads and other
+    processes, but waits are awaited instead of slept. The SQLite work
+    runs in worker threads, since a transaction can wait out another
+    process's lock. One pipe listener per bucket wakes every coroutine
+    waiting on a release."""
+    _instance: Optional[AsyncRateLimiter] = None
+
+    def __init__(self):
+        self.limiter = RateLimiter.get()
+        self._listeners = {}
+
+    @classmethod
+    def get(cls) -> AsyncRateLimiter:
+        if cls._instance is None or cls._instance.limiter is not RateLimiter.get():
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        if cls._instance is not None:
+            for listener in cls._instance._listeners.values():
+                listener.close()
+        cls._instance = None
+
+    async def acquire(self, bucket, cost=1, attempt=1, priority=None) -> Ticket:
+        spec = rate_limits.BUCKETS.get(bucket)
+        if spec is None:
+            raise UnknownBucket(bucket)
+        priority = _check_priority(priority) if priority else current_priority()
+        queued = _Queued()
+        try:
+            return await self._acquire(bucket, cost, spec, attempt, priority, queued)
+        finally:
+            await asyncio.to_thread(self.limiter._dequeue, queued)
+
+    async def _acquire(self, bucket, cost, spec, attempt, priority, queued):
+        started = time.time()
+        released = None
+        while True:
+            result = await asyncio.to_thread(
+                self.limiter._try_once, bucket, cost, spec, attempt, priority, queued, started)
+            if isinstance(result, Ticket):
+                return result
+            if result.on_release and released is None:
+                # As in RateLimiter._wait: listen first, then check again.
+                released = self._listener(bucket).event
+                continue
+            delay = max(0.0, result.until - time.time()) + ACQUIRE_JITTER_SECONDS
+            if not result.on_release:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                await asyncio.wait_for(released.wait(), delay)
+            except TimeoutError:
+                pass
+            released = self._listener(bucket).event
+
+    def _listener(self, bucket):
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(bucket)
+        if listener is None or listener.loop is not loop:
+            if listener is not None:
+                listener.close()
+            listener = self._listeners[bucket] = AsyncListener(
+                self.limiter._wakeups.listen(bucket), loop)
+        return listener
 
 
 def _pid_alive(pid):
@@ -274,6 +956,205 @@ def _pid_alive(pid):
     return True
 
 
+def _slot(t, window_sec, tz_name):
+    """The usage slot time t falls in. Calendar windows have one slot per
+    day, keyed by its local midnight."""
+    if tz_name:
+        return int(_absolute_window_start(t, tz_name))
+    return int(t * SLOTS_PER_WINDOW / window_sec)
+
+
+def _first_counted_slot(now, window_sec, tz_name):
+    if tz_name:
+        return _slot(now, window_sec, tz_name)
+    return _slot(now - window_sec, window_sec, tz_name)
+
+
+def _add_usage(conn, bucket, spec, usage):
+    """Add (requested_at, cost) pairs to the slot counters of every window."""
+    tz_name = spec.get('reset_timezone')
+    conn.executemany(
+        'INSERT INTO usage_slots (bucket, window_sec, slot, cost) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (bucket, window_sec, slot) DO UPDATE SET cost = cost + excluded.cost',
+        [(bucket, window_sec, _slot(requested_at, window_sec, tz_name), cost)
+         for requested_at, cost in usage if cost
+         for window_sec, _ in spec['windows']],
+    )
+
+
+def _fair_tags(conn, bucket, flow, cost, priority):
+    """(start, finish) virtual times for a new request of flow. It
+    starts after the flow's previous grant or queued request, so a flow
+    is served cost / weight apart in virtual time."""
+    vtime = conn.execute(
+        'SELECT vtime FROM fair_clock WHERE bucket = ?', (bucket,)).fetchone()
+    last = conn.execute(
+        'SELECT last_finish FROM fair_flows WHERE bucket = ? AND flow = ?', (bucket, flow)).fetchone()
+    pending = conn.execute(
+        'SELECT MAX(finish_tag) FROM waiters WHERE bucket = ? AND flow = ?', (bucket, flow)).fetchone()
+    start = max(vtime[0] if vtime else 0.0, last[0] if last else 0.0, pending[0] or 0.0)
+    return start, start + cost / rate_limits.PRIORITY_WEIGHTS[priority]
+
+
+def _advance_fair_clock(conn, bucket, flow, start, finish, now):
+    """Record a grant: the clock moves to its start tag, the flow to its finish."""
+    conn.execute(
+        'INSERT INTO fair_clock (bucket, vtime) VALUES (?, ?) '
+        'ON CONFLICT (bucket) DO UPDATE SET vtime = MAX(vtime, excluded.vtime)',
+        (bucket, start),
+    )
+    conn.execute(
+        'INSERT INTO fair_flows (bucket, flow, last_finish, seen_at) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (bucket, flow) DO UPDATE SET '
+        'last_finish = MAX(last_finish, excluded.last_finish), seen_at = excluded.seen_at',
+        (bucket, flow, finish, now),
+    )
+
+
+def _rollup(conn, before):
+    """Aggregate released rows from whole hours before before, and drop
+    them. A row released after its hour was rolled up is merged in
+    later; its percentiles are then blended by count, not recomputed."""
+    before = int(before // ROLLUP_SECONDS * ROLLUP_SECONDS)
+    rows = conn.execute(
+        'SELECT bucket, requested_at, released_at, outcome, cost, wait_sec FROM request_log '
+        'WHERE requested_at < ? AND outcome IS NOT NULL AND outcome != ?',
+        (before, OUTCOME_LEASED),
+    ).fetchall()
+    for new in _aggregate(rows):
+        bucket, hour, outcome, count, cost, *percentiles, latency_sum, latency_hist, \
+            wait_sum, wait_hist = new
+        old = conn.execute(
+            'SELECT count, cost, latency_p50, latency_p90, latency_p99, '
+            'latency_sum, latency_hist, wait_sum, wait_hist FROM request_rollup '
+            'WHERE bucket = ? AND hour = ? AND outcome = ?',
+            (bucket, hour, outcome),
+        ).fetchone()
+        if old is not None:
+            old_count = old[0]
+            percentiles = [
+                (a * old_count + b * count) / (old_count + count) if None not in (a, b)
+                else (a if b is None else b)
+                for a, b in zip(old[2:5], percentiles)
+            ]
+            count += old_count
+            cost += old[1]
+            latency_sum += old[5]
+            latency_hist = [a + b for a, b in zip(json.loads(old[6]), latency_hist)]
+            wait_sum += old[7]
+            wait_hist = [a + b for a, b in zip(json.loads(old[8]), wait_hist)]
+        conn.execute(
+            'INSERT OR REPLACE INTO request_rollup (bucket, hour, outcome, count, cost, '
+            'latency_p50, latency_p90, latency_p99, latency_sum, latency_hist, wait_sum, wait_hist) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (bucket, hour, outcome, count, cost, *percentiles,
+             latency_sum, json.dumps(latency_hist), wait_sum, json.dumps(wait_hist)),
+        )
+    conn.execute(
+        'DELETE FROM request_log WHERE requested_at < ? AND outcome IS NOT NULL', (before,))
+
+
+def _aggregate(rows):
+    """(bucket, hour, outcome, count, cost, p50, p90, p99, latency_sum,
+    latency_hist, wait_sum, wait_hist) per group of (bucket, requested_at,
+    released_at, outcome, cost, wait_sec) rows."""
+    groups = defaultdict(lambda: [0, 0, [], []])
+    for bucket, requested_at, released_at, outcome, cost, wait_sec in rows:
+        group = groups[bucket, int(requested_at // ROLLUP_SECONDS * ROLLUP_SECONDS), outcome]
+        group[0] += 1
+        group[1] += cost
+        if released_at is not None:
+            group[2].append(released_at - requested_at)
+        group[3].append(wait_sec)
+    return [(*key, count, cost, *_percentiles(latencies),
+             sum(latencies), _histogram(latencies), sum(waits), _histogram(waits))
+            for key, (count, cost, latencies, waits) in groups.items()]
+
+
+def _histogram(values):
+    """Counts of values per HISTOGRAM_BOUNDS interval, plus one above."""
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for value in values:
+        counts[bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+    return counts
+
+
+def _percentiles(values):
+    """Nearest-rank ROLLUP_PERCENTILES of values, or Nones if empty."""
+    if not values:
+        return (None,) * len(ROLLUP_PERCENTILES)
+    values = sorted(values)
+    return tuple(values[max(0, math.ceil(p / 100 * len(values)) - 1)] for p in ROLLUP_PERCENTILES)
+
+
+def _adaptive_scale(conn, bucket, spec) -> float:
+    if not spec.get('adaptive'):
+        return 1.0
+    row = conn.execute('SELECT scale FROM adaptive_limits WHERE bucket = ?', (bucket,)).fetchone()
+    return row[0] if row else 1.0
+
+
+def _effective_limit(limit, scale) -> int:
+    """limit scaled down, but never below one call per window."""
+    return max(1, int(limit * scale))
+
+
+def _window_room(conn, bucket, spec, now, priority) -> list[tuple[int, float]]:
+    """(cost left, next_free) for each window of bucket at priority."""
+    tz_name = spec.get('reset_timezone')
+    reserve = 0.0
+    if priority != rate_limits.PRIORITY_INTERACTIVE:
+        reserve = spec.get('interactive_reserve', 0.0)
+    scale = _adaptive_scale(conn, bucket, spec)
+    rooms = []
+    for window_sec, limit in spec['windows']:
+        current, next_free = _window_usage(conn, bucket, window_sec, tz_name, now)
+        rooms.append((int(_effective_limit(limit, scale) * (1 - reserve)) - current, next_free))
+    return rooms
+
+
+def _adapt(conn, bucket, policy, outcome, requested_at, now):
+    """AIMD step on the learned scale for one ok or blocked outcome."""
+    row = conn.execute(
+        'SELECT scale, successes, decreased_at FROM adaptive_limits WHERE bucket = ?',
+        (bucket,),
+    ).fetchone()
+    scale, successes, decreased_at = row or (1.0, 0, 0.0)
+    if outcome == OUTCOME_BLOCKED:
+        if requested_at < decreased_at:
+            return  # taken at the old rate; that block already cut it
+        scale = max(policy['floor'], scale * policy['decrease'])
+        successes, decreased_at = 0, now
+    elif scale >= 1.0:
+        return  # at the ceiling
+    else:
+        successes += 1
+        if successes < policy['successes']:
+            conn.execute(
+                'UPDATE adaptive_limits SET successes = ? WHERE bucket = ?', (successes, bucket))
+            return
+        scale, successes = min(1.0, scale + policy['increase']), 0
+    conn.execute(
+        'INSERT OR REPLACE INTO adaptive_limits (bucket, scale, successes, decreased_at) '
+        'VALUES (?, ?, ?, ?)',
+        (bucket, scale, successes, decreased_at),
+    )
+
+
+def _window_usage(conn, bucket, window_sec, tz_name, now):
+    """(cost used, time the oldest counted slot drops out) for one window."""
+    used, oldest = conn.execute(
+        'SELECT COALESCE(SUM(cost), 0), MIN(slot) FROM usage_slots '
+        'WHERE bucket = ? AND window_sec = ? AND slot >= ? AND cost != 0',
+        (bucket, window_sec, _first_counted_slot(now, window_sec, tz_name)),
+    ).fetchone()
+    if tz_name:
+        return used, _next_absolute_reset(now, tz_name)
+    if oldest is None:
+        return used, now
+    return used, (oldest + 1) * window_sec / SLOTS_PER_WINDOW + window_sec
+
+
 def _absolute_window_start(now, tz_name):
     tz = ZoneInfo(tz_name)
     now_local = datetime.fromtimestamp(now, tz=tz)
@@ -7,6 +7,27 @@ from __future__ import annotations
 # When a new bucket is added without observational data, default to the
 # upper end of what a heavy human user could plausibly do through the
 # normal clients (website, TV, phone). See plan for rationale.
+#
+# 'max_in_flight' (default 1) is how many requests may be outstanding at
+# once across all processes; timedtext and media stay one at a time.
+#
+# 'lease' (optional) lets a process reserve 'tokens' in one transaction and
+# spend them from memory for up to 'ttl' seconds instead of writing a row
+# per call. Reserved tokens count against every window until spent or
+# returned, so keep 'tokens' within the smallest window's limit. A lease
+# also takes the free max_in_flight slots, at most 'slots' if given, and
+# its spends share them without further writes.
+#
+# 'interactive_reserve' (optional) is the fraction of every window held
+# back for interactive callers; other priorities see the limits shrunk by
+# it, so a sweep can't spend the quota a show_* command needs.
+#
+# 'adaptive' (optional) turns the windows into a ceiling learned under:
+# each 'blocked' outcome cuts every limit by 'decrease', down to 'floor'
+# of the ceiling, and each run of 'successes' ok outcomes adds back
+# 'increase' of it. Only blocks on tickets taken after the last cut
+# count, so a burst of in-flight failures cuts once. The learned scale
+# lives in the limiter DB and is shared by every process.
 
 YOUTUBE_TIMEDTEXT = 'youtube.timedtext'
 YOUTUBE_DATA_API = 'youtube.data_api_v3'
@@ -22,12 +43,15 @@ BUCKETS = {
             (86400, 200),
         ],
         'reset_timezone': None,
+        'adaptive': {'floor': 0.1, 'decrease': 0.5, 'increase': 0.1, 'successes': 25},
     },
     YOUTUBE_DATA_API: {
         'windows': [
             (86400, 10000),
         ],
         'reset_timezone': 'America/Los_Angeles',
+        'max_in_flight': 8,
+        'interactive_reserve': 0.1,
     },
     YOUTUBE_MEDIA: {
         'windows': [
@@ -48,6 +72,55 @@ BUCKETS = {
             (86400, 10000),
         ],
         'reset_timezone': None,
+        'max_in_flight': 4,
+        'lease': {'tokens': 5, 'ttl': 5.0},
+    },
+}
+
+# Priority classes for acquire. Under contention a bucket is shared by
+# weighted fair queuing: each class gets tokens in proportion to its
+# weight, so bulk sweeps still progress while interactive commands jump
+# most of the queue.
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_BULK = 'bulk'
+PRIORITY_WEIGHTS = {
+    PRIORITY_INTERACTIVE: 8,
+    PRIORITY_NORMAL: 4,
+    PRIORITY_BULK: 1,
+}
+
+# Retry policy per bucket, used by retry.call_with_retry. A failed call is
+# retried up to max_attempts in total with full-jitter exponential backoff
+# between base_delay and max_delay seconds; a server Retry-After longer
+# than max_delay ends the call instead. 'budget' caps retries per rolling
+# window across all processes, so a failing upstream can't turn a sweep
+# into a retry storm. Every attempt is its own request_log row.
+RETRY_POLICIES = {
+    YOUTUBE_DATA_API: {
+        'max_attempts': 4,
+        'base_delay': 1.0,
+        'max_delay': 60.0,
+        'budget': (3600, 100),
+    },
+    YOUTUBE_TIMEDTEXT: {
+        # Blocks usually lift within minutes; past that, stop the batch.
+        'max_attempts': 3,
+        'base_delay': 60.0,
+        'max_delay': 600.0,
+        'budget': (3600, 10),
+    },
+    YOUTUBE_MEDIA: {
+        'max_attempts': 3,
+        'base_delay': 30.0,
+        'max_delay': 300.0,
+        'budget': (86400, 20),
+    },
+    YOUTUBE_THUMBNAIL: {
+        'max_attempts': 3,
+        'base_delay': 1.0,
+        'max_delay': 30.0,
+        'budget': (3600, 200),
     },
 }
 
@@ -65,3 +138,7 @@ DATA_API_COSTS = {
     'subscriptions.list': 1,
     'search.list': 100,
 }
+
+# List endpoints that filter by id (videos.list, channels.list) accept up to
+# this many comma-separated ids for the same per-call cost.
+MAX_IDS_PER_REQUEST = 50
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import rate_limits
+from rate_limiter import AsyncRateLimiter, RateLimiter
+
+
+@dataclass
+class Transient:
+    """A failure worth retrying. blocked logs the attempt as 'blocked'
+    rather than as an error; retry_after is the server's hint in seconds."""
+    retry_after: Optional[float] = None
+    blocked: bool = False
+
+
+def call_with_retry(bucket, fn, classify: Callable[[Exception], Optional[Transient]], cost=1):
+    """Run fn() under a limiter ticket, retrying transient failures.
+
+    classify(exc) returns a Transient for failures worth retrying and None
+    for the rest, which are raised straight away. Each attempt takes its
+    own ticket, so it is logged and counted against the bucket. The last
+    failure is raised once attempts, the bucket's retry budget or a
+    too-long Retry-After run out."""
+    policy = rate_limits.RETRY_POLICIES.get(bucket)
+    limiter = RateLimiter.get()
+    attempt = 1
+    while True:
+        ticket = limiter.acquire(bucket, cost=cost, attempt=attempt)
+        try:
+            result = fn()
+        except Exception as e:
+            delay = _failed(limiter, ticket, e, classify, policy, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        ticket.ok()
+        return result
+
+
+async def call_with_retry_async(bucket, fn, classify: Callable[[Exception], Optional[Transient]], cost=1):
+    """call_with_retry for coroutines: fn() is awaited, and neither the
+    limiter nor the backoff blocks the event loop."""
+    policy = rate_limits.RETRY_POLICIES.get(bucket)
+    limiter = AsyncRateLimiter.get()
+    attempt = 1
+    while True:
+        ticket = await limiter.acquire(bucket, cost=cost, attempt=attempt)
+        try:
+            result = await fn()
+        except Exception as e:
+            delay = await asyncio.to_thread(
+                _failed, limiter.limiter, ticket, e, classify, policy, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        await asyncio.to_thread(ticket.ok)
+        return result
+
+
+def _failed(limiter, ticket, e, classify, policy, attempt):
+    """Record a failed attempt; the delay before retrying, or None."""
+    transient = classify(e)
+    if transient is not None and transient.blocked:
+        ticket.blocked()
+    else:
+        ticket.error(e)
+    delay = _retry_delay(limiter, ticket.bucket, policy, attempt, transient)
+    if delay is not None:
+        print(f'[retry] {ticket.bucket} attempt {attempt} failed ({type(e).__name__}), '
+              f'retrying in {delay:.1f}s')
+    return delay
+
+
+def backoff_delay(policy, attempt) -> float:
+    """Full-jitter exponential backoff before retry number attempt."""
+    ceiling = min(policy['max_delay'], policy['base_delay'] * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date)."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(limiter, bucket, policy, attempt, transient):
+    if transient is None or policy is None or attempt >= policy['max_attempts']:
+        return None
+    if transient.retry_after is not None and transient.retry_after > policy['max_delay']:
+        return None
+    window_sec, max_retries = policy['budget']
+    if limiter.retry_count(bucket, window_sec) >= max_retries:
+        print(f'[retry] {bucket} retry budget spent ({max_retries} per {window_sec}s)')
+        return None
+    return max(backoff_delay(policy, attempt), transient.retry_after or 0.0)
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import json
+from functools import cache
 from types import SimpleNamespace
+from typing import Callable
 
 
 class SafeNamespace(SimpleNamespace):
@@ -64,40 +66,59 @@ def safe_convert(converter_func):
 
 from datetime import datetime
 
-TYPE_CONVERTERS = {
-    datetime: safe_convert(datetime.fromisoformat),
-    int: safe_convert(int),
-    #float: safe_convert(float),
-    bool: safe_convert(lambda v: str(v).lower() in ('true', 'yes', '1', 'on') if isinstance(v, str) else bool(v)),
+
+def _parse_bool(value):
+    return str(value).lower() in ('true', 'yes', '1', 'on') if isinstance(value, str) else bool(value)
+
+TYPE_PARSERS = {
+    datetime: datetime.fromisoformat,
+    int: int,
+    #float: float,
+    bool: _parse_bool,
 }
 
+TYPE_CONVERTERS = {field_type: safe_convert(parser) for field_type, parser in TYPE_PARSERS.items()}
+
 def convert_fields(cls, data: Dict[str, Any]) -> Dict[str, Any]:
-    from typing import Any, Callable, Dict, Optional, Union, get_args, get_origin, get_type_hints  # noqa: I001
     """
     Convert fields in data according to their types in the class.
     Handles both direct types and Optional[Type] annotations.
     """
     result = data.copy()
-    type_hints = get_type_hints(cls)
-
-    for field_name, field_type in type_hints.items():
-        if field_name not in result:
-            continue
+    for field_name, converter in compile_converters(cls):
+        if field_name in result:
+            result[field_name] = converter(result[field_name])
+    return result
 
-        base_types = []
-        origin = get_origin(field_type)
+@cache
+def compile_converters(cls) -> tuple[tuple[str, Callable], ...]:
+    """(field name, converter) for each field of cls that TYPE_CONVERTERS
+    handles, worked out from the type hints once per class."""
+    from typing import Optional, Union, get_args, get_origin, get_type_hints
 
-        if origin is Union or origin is Optional:
+    plan = []
+    for field_name, field_type in get_type_hints(cls).items():
+        if get_origin(field_type) in (Union, Optional):
             base_types = [t for t in get_args(field_type) if t is not type(None)]
         else:
             base_types = [field_type]
-
         for base_type in base_types:
-            if base_type in TYPE_CONVERTERS:
-                result[field_name] = TYPE_CONVERTERS[base_type](result[field_name])
+            if base_type in TYPE_PARSERS:
+                plan.append((field_name, _fast_convert(TYPE_PARSERS[base_type])))
                 break
+    return tuple(plan)
 
-    return result
+def _fast_convert(parser):
+    """safe_convert(parser), with the common None and non-blank string
+    values (ISO datetimes, counts) handled without the generic checks."""
+    convert = safe_convert(parser)
+    def wrapper(value):
+        if value is None:
+            return None
+        if type(value) is str:
+            return parser(value) if value and not value.isspace() else None
+        return convert(value)
+    return wrapper
 
 def to_serializable(obj):
     """Convert Python objects to JSON-serializable types."""
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import select
+import time
+from pathlib import Path
+from typing import Optional
+
+FIFO_MODE = 0o664
+
+
+class Wakeups:
+    """Per-bucket named pipes under a directory, letting a release wake
+    same-host waiters at once instead of at their next poll.
+
+    A waiter holds the pipe open for reading; notify() opens it for
+    writing and closes it again without writing anything, which leaves
+    every current reader at EOF and so readable. Nothing is buffered, so
+    one waiter rearming can't leave another spinning on a stale byte.
+    Waiters always re-check the limiter after waking, so a
+    spurious or missed wakeup costs at most one timed wait. Holders on
+    other hosts never notify, and there waiters fall back to polling, as
+    they do where mkfifo is unavailable."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.enabled = hasattr(os, 'mkfifo')
+
+    def listen(self, key) -> Waiter:
+        return Waiter(self._fifo(key) if self.enabled else None)
+
+    def notify(self, key):
+        if not self.enabled:
+            return
+        try:
+            fd = os.open(self.directory / f'{key}.fifo', os.O_WRONLY | os.O_NONBLOCK)
+        except OSError:
+            return  # no pipe yet, or nobody waiting (ENXIO)
+        os.close(fd)
+
+    def _fifo(self, key) -> Optional[Path]:
+        path = self.directory / f'{key}.fifo'
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            os.mkfifo(path, FIFO_MODE)
+            path.chmod(FIFO_MODE)
+        except FileExistsError:
+            pass
+        except OSError:
+            return None
+        return path
+
+
+class Waiter:
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self._open()
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds, returning early on a notify."""
+        if self.fd is None:
+            time.sleep(timeout)
+            return
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            self.rearm()
+
+    def rearm(self):
+        """Drain and reopen the pipe after a notify. A descriptor that
+        has seen the writer go stays at EOF, so only a fresh one blocks
+        until the next notify."""
+        self._drain()
+        self.close()
+        self._open()
+
+    def _drain(self):
+        while True:
+            try:
+                if not os.read(self.fd, 4096):
+                    return
+            except BlockingIOError:
+                return
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _open(self):
+        self.fd = None
+        if self.path is not None:
+            try:
+                self.fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                pass
+
+
+class AsyncListener:
+    """A Waiter registered with an event loop. Every notify sets the
+    current event and replaces it with a fresh one."""
+
+    def __init__(self, waiter, loop):
+        self.waiter = waiter
+        self.loop = loop
+        self.event = asyncio.Event()
+        if waiter.fd is not None:
+            loop.add_reader(waiter.fd, self._on_ready)
+
+    def _on_ready(self):
+        self.loop.remove_reader(self.waiter.fd)
+        self.waiter.rearm()
+        if self.waiter.fd is not None:
+            self.loop.add_reader(self.waiter.fd, self._on_ready)
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+    def close(self):
+        if self.waiter.fd is not None and not self.loop.is_closed():
+            self.loop.remove_reader(self.waiter.fd)
+        self.waiter.close()
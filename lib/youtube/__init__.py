@@ -1,8 +1,10 @@
 from googleapiclient.errors import HttpError
 
+from .catalog import Catalog, CatalogEntry
 from .channel import Channel
 from .client import SCOPES, get_youtube_client
 from .comment import Comment, CommentsDisabledError
+from .executor import ApiExecutor
 from .media import Media
 from .playlist import Playlist
 from .ratings import Rating
@@ -0,0 +1,134 @@
+"""asyncio versions of the Data API, transcript and thumbnail fetches.
+
+Many I/O-bound fetches can run as coroutines in one process. Limits are
+the same SQLite-backed ones the synchronous code uses, via
+AsyncRateLimiter, and HTTP goes through one httpx connection pool per
+event loop. youtube_transcript_api has no async client, so its calls run
+in a worker thread; only the limiter wait and backoff stay on the loop."""
+
+from __future__ import annotations
+
+import asyncio
+
+from rate_limits import (
+    DATA_API_COSTS,
+    YOUTUBE_DATA_API,
+    YOUTUBE_THUMBNAIL,
+    YOUTUBE_TIMEDTEXT,
+)
+from retry import Transient, call_with_retry_async, parse_retry_after
+
+MAX_CONNECTIONS = 100
+
+_pool = None
+
+
+def http_pool():
+    """The httpx.AsyncClient shared by every fetch on the running loop."""
+    import httpx
+    global _pool
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool[0] is not loop:
+        _pool = (loop, httpx.AsyncClient(
+            timeout=30, limits=httpx.Limits(max_connections=MAX_CONNECTIONS)))
+    return _pool[1]
+
+
+async def close_http_pool():
+    global _pool
+    if _pool is not None:
+        _, client = _pool
+        _pool = None
+        await client.aclose()
+
+
+async def execute_api_async(request, operation, etag=None):
+    """execute_api for coroutines. request is built as usual, e.g.
+    get_youtube_client().videos().list(...), but sent through the pool."""
+    import httplib2
+
+    import config
+    from youtube.client import _get_credentials
+
+    cost = DATA_API_COSTS.get(operation, 1)
+    headers = dict(request.headers)
+    if etag:
+        headers['If-None-Match'] = etag
+    if config.YOUTUBE_API_ENDPOINT:
+        from youtube.replay import stand_in_uri
+        uri = stand_in_uri(config.YOUTUBE_API_ENDPOINT, request.uri)
+    else:
+        uri = request.uri
+        credentials = _get_credentials()
+        if not credentials.valid:
+            from google.auth.transport.requests import Request
+            await asyncio.to_thread(credentials.refresh, Request())
+        credentials.apply(headers)
+
+    async def execute():
+        resp = await http_pool().request(request.method, uri, headers=headers, content=request.body)
+        if etag and resp.status_code == 304:
+            return None
+        if config.YOUTUBE_RECORD_DIR and request.method == 'GET' and resp.status_code == 200:
+            from youtube.replay import RecordingHttp
+            RecordingHttp(None, config.YOUTUBE_RECORD_DIR).record(request.uri, resp.content)
+        info = httplib2.Response({'status': resp.status_code, **resp.headers})
+        return request.postproc(info, resp.content)
+
+    return await call_with_retry_async(YOUTUBE_DATA_API, execute, _classify_api_error, cost=cost)
+
+
+async def download_transcript(video_id):
+    """Transcript.download for coroutines."""
+    from youtube.transcript import Transcript, list_transcripts
+
+    available = await _run_timedtext_async(video_id, lambda: list_transcripts(video_id))
+    transcript = Transcript.select_best(available)
+    transcript_data = await _run_timedtext_async(video_id, transcript.fetch)
+    return Transcript.to_data(video_id, transcript, transcript_data)
+
+
+async def download_thumbnail(url):
+    """(content type, bytes) of an image fetched under the thumbnail bucket."""
+    async def fetch():
+        resp = await http_pool().get(url, headers={'User-Agent': 'Mozilla/5.0'})
+        resp.raise_for_status()
+        return resp.headers.get('content-type'), resp.content
+
+    return await call_with_retry_async(YOUTUBE_THUMBNAIL, fetch, _classify_http_error)
+
+
+async def _run_timedtext_async(video_id, fn):
+    from youtube_transcript_api._errors import IpBlocked, RequestBlocked
+
+    from youtube.transcript import TranscriptUnavailable, _classify_timedtext
+
+    try:
+        return await call_with_retry_async(
+            YOUTUBE_TIMEDTEXT, lambda: asyncio.to_thread(fn), _classify_timedtext)
+    except (IpBlocked, RequestBlocked) as e:
+        print(f'[blocked] {video_id}: {e}')
+        raise
+    except Exception as e:
+        raise TranscriptUnavailable(type(e).__name__) from e
+
+
+def _classify_api_error(e):
+    import httpx
+
+    from youtube.client import classify_api_error
+    if isinstance(e, httpx.TransportError):
+        return Transient()
+    return classify_api_error(e)
+
+
+def _classify_http_error(e):
+    import httpx
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        if status == 429 or status >= 500:
+            return Transient(retry_after=parse_retry_after(e.response.headers.get('retry-after')))
+        return None
+    if isinstance(e, httpx.TransportError):
+        return Transient()
+    return None
@@ -0,0 +1,262 @@
+"""SQLite catalog of the scalar fields of every stored video.json, and
+of the @handle of every stored channel.json.
+
+Video.update_from_data and Video.touch write each video's row in the
+same transaction as its file, so listing or filtering a channel's videos is one indexed
+query instead of a file open and JSON parse per video. Likewise
+Channel.update_from_data records the channel's handle, so resolving one
+doesn't scan every cached channel. rebuild() fills the catalog from the
+tree in one transaction, for data written before the catalog existed or
+by hand."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+import config
+from util import convert_fields, dump_json
+
+DB_FILE_MODE = 0o664
+
+COLUMNS = (
+    'video_id', 'channel_id', 'title', 'published_at', 'duration_seconds', 'duration_data',
+    'view_count', 'like_count', 'comment_count', 'first_seen', 'last_updated',
+    'description_hash',
+)
+
+CREATE_TABLES_SQL = (
+    'CREATE TABLE IF NOT EXISTS videos ('
+    'video_id TEXT PRIMARY KEY, '
+    'channel_id TEXT, '
+    'title TEXT, '
+    'published_at TEXT, '
+    'duration_seconds INTEGER, '
+    'duration_data TEXT, '
+    'view_count INTEGER, '
+    'like_count INTEGER, '
+    'comment_count INTEGER, '
+    'first_seen TEXT, '
+    'last_updated TEXT, '
+    'description_hash TEXT)',
+    'CREATE INDEX IF NOT EXISTS videos_channel ON videos (channel_id, published_at)',
+    'CREATE TABLE IF NOT EXISTS handles ('
+    'handle TEXT PRIMARY KEY, '
+    'channel_id TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS handles_channel ON handles (channel_id)',
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+)
+
+# Columns added since the tables were first created, added to older
+# catalogs on open. Rows written before stay NULL until rewritten.
+ADDED_COLUMNS = {
+    'videos': {'duration_data': 'TEXT'},
+}
+
+UPSERT_SQL = (
+    f'INSERT OR REPLACE INTO videos ({", ".join(COLUMNS)}) '
+    f'VALUES ({", ".join("?" for _ in COLUMNS)})'
+)
+
+
+@dataclass(slots=True)
+class CatalogEntry:
+    video_id: str
+    channel_id: Optional[str]
+    title: Optional[str]
+    published_at: Optional[datetime]
+    duration_seconds: Optional[int]
+    duration_data: Optional[str]
+    view_count: Optional[int]
+    like_count: Optional[int]
+    comment_count: Optional[int]
+    first_seen: Optional[datetime]
+    last_updated: Optional[datetime]
+    description_hash: Optional[str]
+
+    @property
+    def channel(self) -> 'Channel':
+        from youtube import Channel
+        return Channel.get(self.channel_id)
+
+
+class Catalog:
+    _instance: Optional[Catalog] = None
+
+    def __init__(self):
+        self.db_path = config.DATA_DIR / 'youtube' / 'catalog.sqlite'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        for sql in CREATE_TABLES_SQL:
+            self._conn.execute(sql)
+        for table, added in ADDED_COLUMNS.items():
+            columns = {row[1] for row in self._conn.execute(f'PRAGMA table_info({table})')}
+            for column, definition in added.items():
+                if column in columns:
+                    continue
+                try:
+                    self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+                except sqlite3.OperationalError:
+                    pass  # another process added it first
+        try:
+            self.db_path.chmod(DB_FILE_MODE)
+        except PermissionError:
+            pass
+
+    @classmethod
+    def get(cls) -> Catalog:
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    def save(self, data):
+        """Write the row for one video.json dict."""
+        self._conn.execute(UPSERT_SQL, _row(data))
+
+    def store(self, path, data):
+        """Write one video.json to path along with its row. The row only
+        commits once the file is written, and rolls back if writing fails."""
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(UPSERT_SQL, _row(data))
+            dump_json(path, data)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def find(self, video_id) -> Optional[CatalogEntry]:
+        rows = self._select('WHERE video_id = ?', (video_id,))
+        return rows[0] if rows else None
+
+    def find_by_channel(self, channel_id, grep=None, limit=None) -> list[CatalogEntry]:
+        """A channel's videos, newest first. grep filters titles by a
+        case-insensitive regex."""
+        where, params = 'WHERE channel_id = ?', [channel_id]
+        if grep:
+            where += ' AND title REGEXP ?'
+            params.append(grep)
+        where += ' ORDER BY published_at DESC'
+        if limit is not None:
+            where += ' LIMIT ?'
+            params.append(limit)
+        return self._select(where, params)
+
+    def save_handle(self, channel_id, custom_url):
+        """Record channel_id's current handle, replacing any earlier one."""
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM handles WHERE channel_id = ?', (channel_id,))
+            if custom_url:
+                conn.execute('INSERT OR REPLACE INTO handles (handle, channel_id) VALUES (?, ?)',
+                             (_handle_key(custom_url), channel_id))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def find_channel_id(self, handle) -> Optional[str]:
+        """channel_id for @handle, case-insensitive, or None."""
+        row = self._conn.execute('SELECT channel_id FROM handles WHERE handle = ?',
+                                 (_handle_key(handle),)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def is_built(self) -> bool:
+        """Whether rebuild() has run, so videos stored before the catalog
+        existed are in it too."""
+        row = self._conn.execute("SELECT 1 FROM meta WHERE key = 'rebuilt_at'").fetchone()
+        return row is not None
+
+    def rebuild(self) -> int:
+        """Replace every row with what the active tree holds. Returns the
+        number of videos catalogued."""
+        rows = []
+        for path in (config.DATA_DIR / 'youtube/videos/active').glob('*/*/video.json'):
+            rows.append(_row(json.loads(path.read_text())))
+            if len(rows) % 10000 == 0:
+                print(f'  Read {len(rows)} videos')
+        handles = []
+        for path in (config.DATA_DIR / 'youtube/channels/active').glob('*/channel.json'):
+            data = json.loads(path.read_text())
+            if data.get('custom_url'):
+                handles.append((_handle_key(data['custom_url']), data['channel_id']))
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM videos')
+            conn.executemany(UPSERT_SQL, rows)
+            conn.execute('DELETE FROM handles')
+            conn.executemany('INSERT OR REPLACE INTO handles (handle, channel_id) VALUES (?, ?)',
+                             handles)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rebuilt_at', ?)",
+                         (str(time.time()),))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return len(rows)
+
+    def _select(self, where, params) -> list[CatalogEntry]:
+        rows = self._conn.execute(f'SELECT {", ".join(COLUMNS)} FROM videos {where}', params)
+        return [CatalogEntry(**convert_fields(CatalogEntry, dict(zip(COLUMNS, row)))) for row in rows]
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.create_function('regexp', 2, _regexp, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+
+def _row(data) -> tuple:
+    from youtube.video import parse_duration
+    description = data.get('description')
+    return (
+        data['video_id'],
+        data.get('channel_id'),
+        data.get('title'),
+        data.get('published_at'),
+        parse_duration(data.get('duration_data')),
+        data.get('duration_data'),
+        _int(data.get('view_count')),
+        _int(data.get('like_count')),
+        _int(data.get('comment_count')),
+        data.get('first_seen'),
+        data.get('last_updated'),
+        hashlib.sha1(description.encode()).hexdigest() if description is not None else None,
+    )
+
+
+def _handle_key(handle):
+    return handle.lstrip('@').lower()
+
+
+def _int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def _regexp(pattern, value):
+    return value is not None and _compile(pattern).search(value) is not None
+
+
+@lru_cache(maxsize=32)
+def _compile(pattern):
+    return re.compile(pattern, re.IGNORECASE)
@@ -6,18 +6,23 @@ from datetime import datetime, timedelta
 from pprint import pprint
 from typing import Optional
 
+import metrics
+from rate_limits import MAX_IDS_PER_REQUEST
+
 import config
 from context import Context
 from util import convert_fields, dump_json, to_dict, to_obj, to_serializable
+from youtube.catalog import Catalog
 
 SCHEMA_VERSION = 2
+CHANNEL_PARTS = 'brandingSettings,contentDetails,statistics,status,topicDetails,snippet'
 
 class PlaylistInaccessibleError(Exception):
     def __init__(self, channel, message=None):
         super().__init__(message or f"Uploads playlist inaccessible for channel {channel.channel_id} {channel.title}")
         self.channel = channel
 
-@dataclass
+@dataclass(slots=True)
 class Channel:
     """Represents a YouTube channel"""
     channel_id: str
@@ -38,7 +43,7 @@ class Channel:
     schema_version: int
     #last_uploads_mirror: Optional[datetime] = None
 
-    @dataclass
+    @dataclass(slots=True)
     class SyncState:
         first_updated: datetime
         last_uploads_mirror: Optional[datetime] = None
@@ -62,19 +67,54 @@ class Channel:
     @classmethod
     def get(cls, channel_id) -> Channel:
         data_file = cls.get_active_dir(channel_id) / "channel.json"
+        objects = Context.get().objects
+        channel = objects.get(cls, data_file, lambda: cls._from_file(data_file))
+        if channel is None:
+            channel = cls(**convert_fields(cls, cls.update(channel_id)))
+            objects.put(cls, data_file, channel)
+        return channel
 
-        if data_file.exists():
-            data = json.loads(data_file.read_text())
-            if data.get('schema_version', 0) >= SCHEMA_VERSION:
-                return cls(**convert_fields(cls,data))
+    @classmethod
+    def get_many(cls, channel_ids) -> dict[str, Channel]:
+        """Like get(), but fetches all uncached channels in batched calls.
+        Returns {channel_id: Channel} in input order; channels the API no
+        longer returns are left out."""
+        channel_ids = list(channel_ids)
+        objects = Context.get().objects
+        found = {}
+        stale = []
+        for channel_id in channel_ids:
+            data_file = cls.get_active_dir(channel_id) / "channel.json"
+            channel = objects.get(cls, data_file, lambda: cls._from_file(data_file))
+            if channel is None:
+                stale.append(channel_id)
+            else:
+                found[channel_id] = channel
+        if stale:
+            for channel_id, data in cls.update_many(stale).items():
+                found[channel_id] = cls(**convert_fields(cls, data))
+                objects.put(cls, cls.get_active_dir(channel_id) / "channel.json", found[channel_id])
+        return {channel_id: found[channel_id] for channel_id in channel_ids if channel_id in found}
 
-        data = cls.update(channel_id)
-        return cls(**convert_fields(cls,data))
+    @classmethod
+    def _from_file(cls, data_file) -> Optional[Channel]:
+        """The stored channel, or None if there is none or its schema is old."""
+        if not data_file.exists():
+            return None
+        data = json.loads(data_file.read_text())
+        if data.get('schema_version', 0) < SCHEMA_VERSION:
+            return None
+        return cls(**convert_fields(cls, data))
 
     @classmethod
     def find_by_handle(cls, handle):
-        """Local lookup of a channel by @handle. Scans cached channel.json
-        files. Returns the channel_id or None. Case-insensitive."""
+        """Local lookup of a channel by @handle. Returns the channel_id or
+        None. Case-insensitive. Until the catalog has been built, misses
+        fall back to scanning cached channel.json files."""
+        catalog = Catalog.get()
+        channel_id = catalog.find_channel_id(handle)
+        if channel_id or catalog.is_built:
+            return channel_id
         base = config.DATA_DIR / 'youtube/channels/active'
         if not base.exists():
             return None
@@ -82,9 +122,10 @@ class Channel:
         for path in base.glob('*/channel.json'):
             try:
                 d = json.loads(path.read_text())
-            except Exception:
+            except (FileNotFoundError, json.JSONDecodeError):
                 continue
             if (d.get('custom_url') or '').lstrip('@').lower() == target:
+                catalog.save_handle(d['channel_id'], d['custom_url'])
                 return d['channel_id']
         return None
 
@@ -105,15 +146,18 @@ class Channel:
             raise ValueError(f'No channel found for handle {clean}')
         return cls.get(items[0]['id'])
 
-    def sync(self):
+    def sync(self) -> Channel:
+        """This channel, or a refreshed copy if it is stale. The channel
+        itself is left as it was: Context.objects shares it between
+        threads."""
         batch_time = Context.get().batch_time
         age = batch_time - self.last_updated
         if age > timedelta(days=1):
             data = self.__class__.update(self.channel_id)
-            record =  convert_fields(self.__class__, data)
-            for field, value in record.items():
-                if hasattr(self, field):
-                    setattr(self, field, value)
+            channel = self.__class__(**convert_fields(self.__class__, data))
+            data_file = self.get_active_dir(self.channel_id) / "channel.json"
+            Context.get().objects.put(self.__class__, data_file, channel)
+            return channel
         return self
 
 #    def get_uploads(self) -> Generator[Video, None, None]:
@@ -125,39 +169,54 @@ class Channel:
 #            yield video
 
     def local_uploads(self) -> Generator[Video, None, None]:
+        """Stored uploads, newest year first. Videos in the catalog come
+        from it with their large fields left on disk until used."""
         from youtube import Video
+        entries = {entry.video_id: entry for entry in Catalog.get().find_by_channel(self.channel_id)}
         uploads_dir = self.get_active_dir(self.channel_id) / "uploads"
         for path in sorted(uploads_dir.glob('*.json'), reverse=True):
             data = json.loads(path.read_text())
-            for (video_id, published_at_data) in data:
-                published_at = datetime.fromisoformat(published_at_data)
-                yield Video.get(video_id)
+            for (video_id, _published_at) in data:
+                entry = entries.get(video_id)
+                yield Video.from_catalog(entry) if entry else Video.get(video_id)
 
     def remote_uploads(self) -> Generator[Video, None, None]:
         from youtube import Video
+        from youtube.video import VideoUnavailableError
         buffer_year = None
         buffer_data = []
         try:
-            for item in self.retrieve_uploads():
-                video_id = item['contentDetails']['videoId']
-                published_at = datetime.fromisoformat(item['contentDetails']['videoPublishedAt'])
-                year = published_at.year
-
-                if buffer_year and year != buffer_year:
-                    self.update_uploads_from_data(buffer_data)
-                    buffer_data = []
-
-                buffer_year = year
-                buffer_data.append((video_id, published_at))
-
-                yield Video.get(video_id)
+            for items in self.retrieve_upload_pages():
+                # One batched videos.list for the page's uncached videos
+                # instead of a round trip per Video.get.
+                videos = Video.get_many(item['contentDetails']['videoId'] for item in items)
+                for item in items:
+                    video_id = item['contentDetails']['videoId']
+                    published_at = datetime.fromisoformat(item['contentDetails']['videoPublishedAt'])
+                    year = published_at.year
+
+                    if buffer_year and year != buffer_year:
+                        self.update_uploads_from_data(buffer_data)
+                        buffer_data = []
+
+                    buffer_year = year
+                    buffer_data.append((video_id, published_at))
+
+                    if video_id not in videos:
+                        raise VideoUnavailableError(video_id)
+                    yield videos[video_id]
         finally:
             if buffer_year and buffer_data:
                 self.update_uploads_from_data(buffer_data)
 
     def retrieve_uploads(self) -> Generator[dict, None, None]:
+        for items in self.retrieve_upload_pages():
+            yield from items
+
+    def retrieve_upload_pages(self) -> Generator[list[dict], None, None]:
         from youtube import HttpError, get_youtube_client
         from youtube.client import execute_api
+        from youtube.fields import FIELD_MASKS
         if self.uploads_count == 0:
             print("No uploads to retrieve")
             return
@@ -167,13 +226,14 @@ class Channel:
         request = youtube.playlistItems().list(
             playlistId=playlist_id,
             part="contentDetails",
+            fields=FIELD_MASKS['playlistItems.list'],
             maxResults=50
         )
         try:
             while request:
                 response = execute_api(request, 'playlistItems.list')
                 #print(f"Batch with {len(response['items'])}")
-                for item in response['items']: yield item
+                yield response['items']
                 request = youtube.playlistItems().list_next(request, response)
         except HttpError as e:
             if e.resp.status == 404:
@@ -206,6 +266,7 @@ class Channel:
             final_videos = new_videos
 
         dump_json(data_file, final_videos)
+        metrics.count('videos_mirrored', len(buffer_data))
 
     def archive_uploads(self, old, new):
         from difflib import SequenceMatcher
@@ -241,6 +302,22 @@ class Channel:
         else:
             self.fetch_all_uploads()
 
+    @classmethod
+    def mirror_uploads_many(cls, channels):
+        """mirror_uploads for each channel, spread over the API executor.
+        Each channel's output is printed in one piece once it is done. A
+        channel listed twice is mirrored once, so no two workers write
+        the same files."""
+        from youtube.executor import ApiExecutor
+
+        def mirror(channel):
+            print(f"## {channel.title} - {channel.channel_id}")
+            channel.mirror_uploads()
+            print("\n")
+
+        unique = {channel.channel_id: channel for channel in channels}
+        ApiExecutor.get().map_output(mirror, unique.values())
+
     def get_sync_state(self) -> Channel.SyncState:
         sync_file = self.get_active_dir(self.channel_id) / "uploads.json"
         if sync_file.exists():
@@ -255,13 +332,13 @@ class Channel:
         dump_json(sync_file, to_serializable(state))
 
     def fetch_all_uploads(self):
-        self.sync()
-        print(f"Uploaded {self.uploads_count} videos")
+        channel = self.sync()
+        print(f"Uploaded {channel.uploads_count} videos")
         count = 0
         latest_video_date = False
-        for video in self.remote_uploads():
+        for video in channel.remote_uploads():
             count += 1
-            print(f"Video {count} of {self.uploads_count} at {video.published_at}: {video.title}")
+            print(f"Video {count} of {channel.uploads_count} at {video.published_at}: {video.title}")
             if count == 1:
                 latest_video_date = video.published_at
         sync_data = self.get_sync_state()
@@ -296,15 +373,24 @@ class Channel:
 
     @classmethod
     def retrieve(cls, channel_id) -> dict:
+        return cls.retrieve_if_changed(channel_id)[1]
+
+    @classmethod
+    def retrieve_if_changed(cls, channel_id, etag=None):
+        """(etag, data) for the channel, or None if it still matches etag."""
         from youtube import get_youtube_client
         from youtube.client import execute_api
+        from youtube.fields import FIELD_MASKS
         youtube = get_youtube_client()
 
         request = youtube.channels().list(
-            part="brandingSettings,contentDetails,localizations,statistics,status,topicDetails,snippet",
+            part=CHANNEL_PARTS,
+            fields=FIELD_MASKS['channels.list'],
             id=channel_id,
         )
-        response = execute_api(request, 'channels.list')
+        response = execute_api(request, 'channels.list', etag=etag)
+        if response is None:
+            return None
         item = to_obj(response['items'][0])
 
         #sections_response = youtube.channelSections().list(
@@ -314,6 +400,53 @@ class Channel:
         #sections = sections_response['items']
         #pprint(sections)
 
+        return response.get('etag'), cls.data_from_item(item)
+
+    @classmethod
+    def retrieve_many(cls, channel_ids):
+        """Fetch channels MAX_IDS_PER_REQUEST at a time, one quota unit per
+        page, with all pages sent as one batch call. Yields data dicts
+        and skips unknown or terminated channels. A page that fails is
+        fetched again one channel at a time, so only the channels that
+        still fail are left out."""
+        from youtube import get_youtube_client
+        from youtube.client import execute_api_many
+        from youtube.fields import FIELD_MASKS
+        youtube = get_youtube_client()
+        channel_ids = list(dict.fromkeys(channel_ids))
+        pages = [channel_ids[start:start + MAX_IDS_PER_REQUEST]
+                 for start in range(0, len(channel_ids), MAX_IDS_PER_REQUEST)]
+        requests = [
+            youtube.channels().list(
+                part=CHANNEL_PARTS,
+                fields=FIELD_MASKS['channels.list'],
+                id=','.join(page),
+            )
+            for page in pages
+        ]
+        if not requests:
+            return
+        responses = execute_api_many(requests, 'channels.list', return_exceptions=True)
+        for page, response in zip(pages, responses):
+            if isinstance(response, Exception):
+                yield from cls._retrieve_each(page, response)
+                continue
+            for item in to_obj(response.get('items', [])):
+                yield cls.data_from_item(item)
+
+    @classmethod
+    def _retrieve_each(cls, channel_ids, page_error):
+        print(f'[error] channels.list page failed ({page_error}), fetching one by one')
+        for channel_id in channel_ids:
+            try:
+                yield cls.retrieve(channel_id)
+            except (KeyError, IndexError):
+                pass  # unknown or terminated: no items
+            except Exception as e:
+                print(f'[error] {channel_id}: {e}')
+
+    @classmethod
+    def data_from_item(cls, item) -> dict:
         data = {
             'channel_id': item.id,
             'title': item.snippet.title,
@@ -336,11 +469,45 @@ class Channel:
 
     @classmethod
     def update(cls, channel_id) -> dict:
+        """Refresh one channel. When we hold its etag the request is
+        conditional, and a 304 only bumps last_updated. Channels on an old
+        schema are always fetched in full so they get migrated."""
+        from youtube.etags import EtagStore
+        etags = EtagStore.get()
+        known = None
+        data_file = cls.get_active_dir(channel_id) / "channel.json"
+        if data_file.exists():
+            if json.loads(data_file.read_text()).get('schema_version', 0) >= SCHEMA_VERSION:
+                known = etags.lookup('channels.list', channel_id, CHANNEL_PARTS)
+        result = cls.retrieve_if_changed(channel_id, etag=known and known.etag)
+        if result is None:
+            return cls.touch(channel_id)
+        etag, new_data = result
+        data = cls.update_from_data(new_data)
+        etags.save('channels.list', channel_id, CHANNEL_PARTS, etag)
+        return data
+
+    @classmethod
+    def touch(cls, channel_id) -> dict:
+        data_file = cls.get_active_dir(channel_id) / "channel.json"
+        data = json.loads(data_file.read_text())
+        data['last_updated'] = Context.get().batch_time.isoformat()
+        dump_json(data_file, data)
+        return data
+
+    @classmethod
+    def update_many(cls, channel_ids) -> dict[str, dict]:
+        return {
+            new_data['channel_id']: cls.update_from_data(new_data)
+            for new_data in cls.retrieve_many(channel_ids)
+        }
+
+    @classmethod
+    def update_from_data(cls, new_data) -> dict:
 
         print("Update channel")
         batch_time = Context.get().batch_time
-        new_data = cls.retrieve(channel_id)
-        output_file = cls.get_active_dir(channel_id) / "channel.json"
+        output_file = cls.get_active_dir(new_data['channel_id']) / "channel.json"
 
         if output_file.exists():
             data = json.loads(output_file.read_text())
@@ -354,6 +521,7 @@ class Channel:
         data.update(new_data)
         data['last_updated'] =  batch_time.isoformat()
         dump_json(output_file, data)
+        Catalog.get().save_handle(data['channel_id'], data.get('custom_url'))
         return data
 
     @classmethod
@@ -421,14 +589,17 @@ class Channel:
         else:
             import urllib.request
 
-            from rate_limiter import RateLimiter
             from rate_limits import YOUTUBE_THUMBNAIL
+            from retry import call_with_retry
 
             req = urllib.request.Request(thumb['url'], headers={'User-Agent': 'Mozilla/5.0'})
-            with RateLimiter.get().acquire(YOUTUBE_THUMBNAIL):
-                with urllib.request.urlopen(req) as resp:
-                    content_type = (resp.headers.get('Content-Type') or 'image/jpeg').split(';')[0].strip()
-                    data = resp.read()
+
+            def fetch():
+                with urllib.request.urlopen(req, timeout=30) as resp:
+                    return resp.headers.get('Content-Type'), resp.read()
+
+            content_type, data = call_with_retry(YOUTUBE_THUMBNAIL, fetch, _classify_thumbnail_error)
+            content_type = (content_type or 'image/jpeg').split(';')[0].strip()
             ext = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp'}.get(content_type, '.jpg')
             img_path = thumbs_dir / f'default{ext}'
             img_path.parent.mkdir(parents=True, exist_ok=True)
@@ -466,3 +637,16 @@ class Channel:
         result['uploads_count'] = result.pop('video_count', None)
         result['schema_version'] = 2
         return result
+
+
+def _classify_thumbnail_error(e):
+    import urllib.error
+
+    from retry import Transient, parse_retry_after
+    if isinstance(e, urllib.error.HTTPError):
+        if e.code == 429 or e.code >= 500:
+            return Transient(retry_after=parse_retry_after(e.headers.get('Retry-After')))
+        return None
+    if isinstance(e, (urllib.error.URLError, TimeoutError, ConnectionError)):
+        return Transient()
+    return None
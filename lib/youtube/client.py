@@ -1,4 +1,6 @@
 import os
+import threading
+from concurrent.futures import Future
 
 from rate_limiter import RateLimiter
 from rate_limits import DATA_API_COSTS, YOUTUBE_DATA_API
@@ -7,31 +9,243 @@ SCOPES = [
     "https://www.googleapis.com/auth/youtube.readonly",
     "https://www.googleapis.com/auth/youtube.force-ssl",
 ]
-API_RETRIES = 0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+# Sub-requests per multipart batch call. The client library allows more,
+# but Google recommends staying at or below 50.
+MAX_BATCH_SIZE = 50
 ROOT = os.environ["PROJECT_ROOT"]
 TOKEN_FILE = ROOT + "/var/token.json"
 
+# httplib2.Http is not thread-safe, so each thread gets its own service
+# object (and with it its own keep-alive connection pool). Credentials are
+# shared process-wide; AuthorizedHttp refreshes them only once expired.
+# A thread rebuilds its client when _generation has moved past the one
+# it was built in, which reset_youtube_client does for every thread.
+_local = threading.local()
+_credentials = None
+_credentials_lock = threading.Lock()
+_token_file_lock = threading.Lock()
+_generation = 0
 
-def execute_api(request, operation):
-    """Wrap a googleapiclient request.execute() with rate-limit accounting."""
+
+def execute_api(request, operation, etag=None):
+    """Wrap a googleapiclient request.execute() with rate-limit accounting
+    and retries of transient failures (see RETRY_POLICIES).
+
+    With an etag the request is sent with If-None-Match, and None is
+    returned when the server answers 304 Not Modified."""
+    from googleapiclient.errors import HttpError
+
+    from retry import call_with_retry
     cost = DATA_API_COSTS.get(operation, 1)
-    with RateLimiter.get().acquire(YOUTUBE_DATA_API, cost=cost):
-        return request.execute(num_retries=API_RETRIES)
+    if etag:
+        request.headers['If-None-Match'] = etag
+
+    def execute():
+        try:
+            return request.execute()
+        except HttpError as e:
+            if etag and e.resp.status == 304:
+                return None
+            raise
+
+    return call_with_retry(YOUTUBE_DATA_API, execute, classify_api_error, cost=cost)
+
+
+def classify_api_error(e):
+    """Transient for Data API failures worth retrying: 429 and 5xx,
+    per-user rate limiting and dropped connections. Quota exhaustion and
+    other 4xx are final."""
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    from retry import Transient, parse_retry_after
+    if isinstance(e, HttpError):
+        reasons = {d.get('reason') for d in (getattr(e, 'error_details', None) or [])
+                   if isinstance(d, dict)}
+        if e.resp.status in RETRY_STATUSES or (
+                e.resp.status == 403 and reasons & RATE_LIMIT_REASONS):
+            return Transient(retry_after=parse_retry_after(e.resp.get('retry-after')))
+        return None
+    if isinstance(e, (ConnectionError, TimeoutError, httplib2.ServerNotFoundError)):
+        return Transient()
+    return None
+
+
+def execute_api_many(requests, operation, return_exceptions=False):
+    """execute_api for several requests of one operation. Returns the
+    responses in order, sending them as a single batch when there is more
+    than one. With return_exceptions a failed request's entry is its
+    exception, so the others still count; otherwise it is raised. A batch
+    call that fails as a whole is always raised."""
+    if len(requests) == 1:
+        try:
+            return [execute_api(requests[0], operation)]
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return [e]
+    with ApiBatch() as batch:
+        futures = [batch.add(request, operation) for request in requests]
+    if return_exceptions:
+        return [future.exception() or future.result() for future in futures]
+    return [future.result() for future in futures]
+
+
+class ApiBatch:
+    """Queue Data API requests and send them as multipart batch calls.
+
+    Each batch reserves the summed DATA_API_COSTS of its sub-requests under
+    one limiter ticket. Results are routed to the Future returned by add(),
+    and to callback(response, exception) if one was given. Leaving the
+    with-block executes whatever is still queued."""
+
+    def __init__(self):
+        self.queue = []
+
+    def add(self, request, operation, callback=None) -> Future:
+        future = Future()
+        self.queue.append((request, operation, callback, future))
+        if len(self.queue) >= MAX_BATCH_SIZE:
+            self.execute()
+        return future
+
+    def execute(self):
+        while self.queue:
+            chunk = self.queue[:MAX_BATCH_SIZE]
+            self.queue = self.queue[MAX_BATCH_SIZE:]
+            self._execute_chunk(chunk)
+
+    def _execute_chunk(self, chunk):
+        from retry import call_with_retry
+
+        from youtube import get_youtube_client
+        batch = get_youtube_client().new_batch_http_request()
+        for request_id, (request, _, callback, future) in enumerate(chunk):
+            batch.add(request, callback=_route_response(callback, future),
+                request_id=str(request_id))
+        cost = sum(DATA_API_COSTS.get(operation, 1) for _, operation, _, _ in chunk)
+        try:
+            # Only failures of the batch call itself are retried here. A
+            # transport error means no sub-response was delivered, so the
+            # whole batch is safe to resend.
+            call_with_retry(YOUTUBE_DATA_API, batch.execute, classify_api_error, cost=cost)
+        except Exception as e:
+            for _, _, _, future in chunk:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+        return False
+
+
+def _route_response(callback, future):
+    def route(request_id, response, exception):
+        if exception is None:
+            future.set_result(response)
+        else:
+            future.set_exception(exception)
+        if callback is not None:
+            callback(response, exception)
+    return route
 
 
 def get_youtube_client():
-    """Builds an authenticated YouTube API client."""
-    import google_auth_oauthlib.flow
+    """Authenticated YouTube API client, built once per thread."""
+    youtube = getattr(_local, 'youtube', None)
+    generation = _generation
+    if youtube is None or _local.generation != generation:
+        youtube = _build_client()
+        _local.youtube = youtube
+        _local.generation = generation
+    return youtube
+
+
+def reset_youtube_client():
+    """Drop cached clients, in every thread, and credentials (tests,
+    token rotation)."""
+    global _credentials, _generation
+    with _credentials_lock:
+        _credentials = None
+        _generation += 1
+
+
+def _build_client():
+    import google_auth_httplib2
     import googleapiclient.discovery
-    import googleapiclient.errors
+    import httplib2
+
+    import config
+
+    if config.YOUTUBE_API_ENDPOINT:
+        from youtube.replay import StandInHttp
+        http = StandInHttp(config.YOUTUBE_API_ENDPOINT)
+    else:
+        credentials = _get_credentials()
+        http = _TokenSavingHttp(
+            google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http()), credentials)
+    if config.YOUTUBE_RECORD_DIR:
+        from youtube.replay import RecordingHttp
+        http = RecordingHttp(http, config.YOUTUBE_RECORD_DIR)
+    # static_discovery uses the discovery document bundled with the client
+    # library instead of fetching and caching one over the network.
+    return googleapiclient.discovery.build(
+        'youtube', 'v3', http=http, static_discovery=True, cache_discovery=False)
+
+
+class _TokenSavingHttp:
+    """Wraps an AuthorizedHttp and writes its credentials back to
+    TOKEN_FILE when a request refreshed them, so the next run starts from
+    the new token instead of refreshing again."""
+
+    def __init__(self, http, credentials):
+        self.http = http
+        self.credentials = credentials
+
+    def request(self, *args, **kwargs):
+        token = self.credentials.token
+        try:
+            return self.http.request(*args, **kwargs)
+        finally:
+            if self.credentials.token != token:
+                _save_credentials(self.credentials)
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+def _save_credentials(credentials):
+    """Write credentials to TOKEN_FILE, replacing it in one step."""
+    with _token_file_lock:
+        tmp = f'{TOKEN_FILE}.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp, 'w') as token:
+            token.write(credentials.to_json())
+        os.replace(tmp, TOKEN_FILE)
+
+
+def _get_credentials():
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = _load_credentials()
+        return _credentials
+
+
+def _load_credentials():
+    import google_auth_oauthlib.flow
     from google.auth.exceptions import RefreshError
     from google.auth.transport.requests import Request
     from google.oauth2.credentials import Credentials
 
     os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
-    api_service_name = "youtube"
-    api_version = "v3"
     client_secrets_file = os.environ["GOOGLE_OAUTH_FILE"]
 
     credentials = None
@@ -45,6 +259,7 @@ def get_youtube_client():
         try:
             if credentials and credentials.expired and credentials.refresh_token:
                 credentials.refresh(Request())
+                _save_credentials(credentials)
             else:
                 raise RefreshError("Invalid or missing credentials")
         except RefreshError:
@@ -57,9 +272,6 @@ def get_youtube_client():
             credentials = flow.run_local_server(port=0)
 
             # Save the credentials for the next run
-            with open(TOKEN_FILE, "w") as token:
-                token.write(credentials.to_json())
+            _save_credentials(credentials)
 
-    youtube = googleapiclient.discovery.build(
-        api_service_name, api_version, credentials=credentials)
-    return youtube
+    return credentials
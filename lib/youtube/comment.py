@@ -12,7 +12,7 @@ class CommentsDisabledError(Exception):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class Comment:
     """Represents a single YouTube comment (top-level thread or reply)."""
     comment_id: str
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import config
+
+DB_FILE_MODE = 0o664
+
+CREATE_TABLE_SQL = (
+    'CREATE TABLE IF NOT EXISTS etags ('
+    'operation TEXT NOT NULL, '
+    'resource_id TEXT NOT NULL, '
+    'selector TEXT NOT NULL, '
+    'etag TEXT NOT NULL, '
+    'data TEXT, '
+    'saved_at REAL NOT NULL, '
+    'PRIMARY KEY (operation, resource_id, selector))'
+)
+
+
+@dataclass
+class StoredEtag:
+    etag: str
+    data: Any = None
+
+
+class EtagStore:
+    """ETags of the Data API responses we have written to disk, for
+    If-None-Match refreshes.
+
+    An etag covers exactly the returned fields, so rows are keyed by
+    operation, resource id and the part + fields selection. A row may
+    carry a little JSON (a page's ids and next page token) for callers
+    that need it to act on a 304."""
+    _instance: Optional[EtagStore] = None
+
+    def __init__(self):
+        self.db_path = config.DATA_DIR / 'etags.sqlite'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn.execute(CREATE_TABLE_SQL)
+        try:
+            self.db_path.chmod(DB_FILE_MODE)
+        except PermissionError:
+            pass
+
+    @classmethod
+    def get(cls) -> EtagStore:
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    def lookup(self, operation, resource_id, part) -> Optional[StoredEtag]:
+        row = self._conn.execute(
+            'SELECT etag, data FROM etags '
+            'WHERE operation = ? AND resource_id = ? AND selector = ?',
+            (operation, resource_id, _selector(operation, part)),
+        ).fetchone()
+        if row is None:
+            return None
+        return StoredEtag(etag=row[0], data=json.loads(row[1]) if row[1] else None)
+
+    def save(self, operation, resource_id, part, etag, data=None):
+        if not etag:
+            return
+        self._conn.execute(
+            'INSERT OR REPLACE INTO etags '
+            '(operation, resource_id, selector, etag, data, saved_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (operation, resource_id, _selector(operation, part), etag,
+             json.dumps(data) if data is not None else None, time.time()),
+        )
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+
+def _selector(operation, part):
+    from youtube.fields import FIELD_MASKS
+    return f"{part}|{FIELD_MASKS.get(operation, '')}"
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import io
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Optional
+
+from rate_limiter import RateLimiter
+from rate_limits import YOUTUBE_DATA_API
+
+DEFAULT_WORKERS = 8
+
+_worker = threading.local()
+# The buffer a worker's prints go to while map_output runs its item.
+_output = threading.local()
+
+
+def _mark_worker():
+    _worker.active = True
+
+
+class ApiExecutor:
+    """Thread pool for Data API work.
+
+    Worker threads each get their own API client (get_youtube_client is
+    per-thread), and the pool is never wider than the number of requests
+    the limiter lets run at once in the Data API bucket. Work submitted
+    from inside a worker runs inline, so nested fan-out (a channel sweep
+    whose channels fan out over playlists) can't deadlock the pool.
+
+    Models loaded through Context.objects are shared between threads but
+    not changed in place; still, two workers mirroring the same object
+    would write the same files, so each should go to one worker at a
+    time."""
+    _instance: Optional[ApiExecutor] = None
+
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        limit = RateLimiter.get().max_in_flight(YOUTUBE_DATA_API)
+        self.max_workers = max(1, min(max_workers, limit))
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='api',
+            initializer=_mark_worker,
+        )
+
+    @classmethod
+    def get(cls) -> ApiExecutor:
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        if cls._instance is not None:
+            cls._instance.pool.shutdown(wait=True)
+        cls._instance = None
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        if getattr(_worker, 'active', False):
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self.pool.submit(fn, *args, **kwargs)
+
+    def map(self, fn, items) -> list:
+        """Run fn over items concurrently; results come back in input
+        order. The first exception is raised once every item has run."""
+        futures = [self.submit(fn, item) for item in items]
+        return [future.result() for future in futures]
+
+    def map_output(self, fn, items) -> list:
+        """map() for items that print: what each item prints is held back
+        and printed in one piece as it finishes, so items running at once
+        don't interleave their output. Inside a worker it is plain map(),
+        as the item running there is held back already."""
+        if getattr(_worker, 'active', False):
+            return self.map(fn, items)
+
+        def run(item, buffer):
+            _output.buffer = buffer
+            try:
+                return fn(item)
+            finally:
+                _output.buffer = None
+
+        with _routed_stdout():
+            futures = {}
+            for item in items:
+                buffer = io.StringIO()
+                futures[self.pool.submit(run, item, buffer)] = buffer
+            for future in as_completed(futures):
+                print(futures[future].getvalue(), end='', flush=True)
+        return [future.result() for future in futures]
+
+
+class _RoutedStdout:
+    """Sends writes from a map_output item to its buffer, the rest on."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = getattr(_output, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def _routed_stdout():
+    stdout = sys.stdout
+    sys.stdout = _RoutedStdout(stdout)
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
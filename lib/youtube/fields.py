@@ -0,0 +1,84 @@
+"""Partial-response `fields` masks for Data API list calls.
+
+Each mask names only what the matching retrieve*/update_from_data code
+reads, so the server leaves out localizations, duplicated localized
+snippets, branding keywords and the like. Response-level etag and
+nextPageToken are kept so etag checks and list_next keep working."""
+
+_COMMENT = 'id,snippet(authorDisplayName,authorChannelId,textDisplay,textOriginal,' \
+    'likeCount,publishedAt,updatedAt,parentId)'
+
+FIELD_MASKS = {
+    'videos.list': 'etag,nextPageToken,items(id,etag,'
+        'snippet(title,channelId,publishedAt,description,thumbnails,tags,categoryId,'
+        'liveBroadcastContent),'
+        'contentDetails(duration,dimension,definition,caption,licensedContent,'
+        'contentRating,projection),'
+        'status(privacyStatus,license,embeddable,publicStatsViewable,madeForKids),'
+        'statistics(viewCount,likeCount,commentCount),'
+        'liveStreamingDetails(scheduledStartTime,activeLiveChatId),'
+        'recordingDetails(recordingDate),'
+        'paidProductPlacementDetails(hasPaidProductPlacement),'
+        'topicDetails)',
+    'channels.list': 'etag,nextPageToken,items(id,etag,'
+        'snippet(title,customUrl,description,publishedAt,thumbnails),'
+        'brandingSettings(image(bannerExternalUrl)),'
+        'contentDetails(relatedPlaylists),'
+        'statistics(viewCount,subscriberCount,videoCount),'
+        'status,topicDetails)',
+    'playlists.list': 'etag,nextPageToken,items(id,etag,'
+        'snippet(channelId,title,publishedAt,description,thumbnails),'
+        'contentDetails(itemCount),status(privacyStatus))',
+    'playlistItems.list': 'etag,nextPageToken,'
+        'items(contentDetails(videoId,videoPublishedAt))',
+    'commentThreads.list': 'nextPageToken,items('
+        f'snippet(totalReplyCount,topLevelComment({_COMMENT})),'
+        f'replies(comments({_COMMENT})))',
+    'comments.list': f'nextPageToken,items({_COMMENT})',
+    'subscriptions.list': 'etag,nextPageToken,items(id,'
+        'snippet(title,resourceId(channelId)),'
+        'contentDetails(activityType,newItemCount,totalItemCount))',
+}
+
+
+def parse_field_mask(mask) -> dict:
+    """Parse a fields selector such as 'a,b(c,d)' into a tree of
+    {name: subtree or None}."""
+    tree, pos = _parse_fields(mask, 0)
+    if pos != len(mask):
+        raise ValueError(f'Unbalanced field mask: {mask}')
+    return tree
+
+
+def _parse_fields(mask, pos):
+    tree = {}
+    while pos < len(mask) and mask[pos] != ')':
+        end = pos
+        while end < len(mask) and mask[end] not in ',()':
+            end += 1
+        name = mask[pos:end].strip()
+        pos = end
+        sub = None
+        if pos < len(mask) and mask[pos] == '(':
+            sub, pos = _parse_fields(mask, pos + 1)
+            if pos >= len(mask):
+                raise ValueError(f'Unbalanced field mask: {mask}')
+            pos += 1
+        tree[name] = sub
+        if pos < len(mask) and mask[pos] == ',':
+            pos += 1
+    return tree, pos
+
+
+def apply_field_mask(data, mask):
+    """Prune a response dict the way the API does for fields=mask."""
+    tree = parse_field_mask(mask) if isinstance(mask, str) else mask
+    if isinstance(data, list):
+        return [apply_field_mask(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for name, sub in tree.items():
+        if name in data:
+            result[name] = data[name] if sub is None else apply_field_mask(data[name], sub)
+    return result
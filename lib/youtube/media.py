@@ -3,7 +3,6 @@ import subprocess
 from datetime import datetime, timezone
 from pathlib import Path
 
-from rate_limiter import RateLimiter
 from rate_limits import YOUTUBE_MEDIA
 
 import config
@@ -17,6 +16,25 @@ FORMAT_ARGS = {
 }
 
 
+class DownloadFailed(Exception):
+    pass
+
+
+# yt-dlp stderr fragments that mean "try again later" rather than "this
+# video can't be had".
+TRANSIENT_YT_DLP_ERRORS = (
+    'HTTP Error 429', 'HTTP Error 500', 'HTTP Error 502', 'HTTP Error 503',
+    'timed out', 'Connection reset', 'Temporary failure in name resolution',
+)
+
+
+def _classify_yt_dlp(e):
+    from retry import Transient
+    if isinstance(e, DownloadFailed) and any(s in str(e) for s in TRANSIENT_YT_DLP_ERRORS):
+        return Transient()
+    return None
+
+
 class Media:
 
     @classmethod
@@ -239,11 +257,17 @@ class Media:
             f'https://www.youtube.com/watch?v={video_id}',
         ]
 
-        with RateLimiter.get().acquire(YOUTUBE_MEDIA):
+        from retry import call_with_retry
+
+        def download():
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=3600)
+            if result.returncode != 0:
+                raise DownloadFailed(result.stderr)
 
-        if result.returncode != 0:
-            print(f'yt-dlp error: {result.stderr}')
+        try:
+            call_with_retry(YOUTUBE_MEDIA, download, _classify_yt_dlp)
+        except (DownloadFailed, subprocess.TimeoutExpired) as e:
+            print(f'yt-dlp error: {e}')
             return None
 
         paths = cls._find_in_dir(dest_dir, video_id)
@@ -163,9 +163,11 @@ class Playlist:
     def retrieve(cls, channel_id) -> Generator[SafeNamespace, None, None]:
         from youtube import get_youtube_client
         from youtube.client import execute_api
+        from youtube.fields import FIELD_MASKS
         youtube = get_youtube_client()
         request = youtube.playlists().list(
             part="id,contentDetails,status,snippet",
+            fields=FIELD_MASKS['playlists.list'],
             channelId=channel_id
         )
 
@@ -179,10 +181,12 @@ class Playlist:
     def retrieve_playlist_items(cls, playlist_id, etag=None):
         from youtube import get_youtube_client
         from youtube.client import execute_api
+        from youtube.fields import FIELD_MASKS
         youtube = get_youtube_client()
         request = youtube.playlistItems().list(
             playlistId=playlist_id,
             part="contentDetails",
+            fields=FIELD_MASKS['playlistItems.list'],
             maxResults=50,
         )
 
@@ -0,0 +1,162 @@
+"""Data API quota planning.
+
+Estimates what a job will cost before it runs, from DATA_API_COSTS and
+what is stored locally, and fits jobs into what is left of today's
+quota, most valuable per unit first. Jobs that don't fit are deferred
+to a later run rather than left to stall in acquire until the reset."""
+
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from rate_limits import DATA_API_COSTS, YOUTUBE_DATA_API
+
+# Page sizes our list calls ask for.
+UPLOADS_PER_PAGE = 50
+SUBSCRIPTIONS_PER_PAGE = 50
+THREADS_PER_PAGE = 100
+
+
+@dataclass
+class Job:
+    """A unit of work with an estimated cost in quota units. value is
+    whatever the caller ranks by; jobs are taken by value / cost."""
+    name: str
+    cost: int
+    value: float = 1.0
+    payload: Any = None
+
+    @property
+    def value_per_unit(self) -> float:
+        return self.value / self.cost if self.cost else math.inf
+
+
+@dataclass
+class Plan:
+    budget: int
+    jobs: list[Job] = field(default_factory=list)
+    deferred: list[Job] = field(default_factory=list)
+
+    @property
+    def cost(self) -> int:
+        return sum(job.cost for job in self.jobs)
+
+    def print_report(self, verbose=False):
+        if verbose:
+            for job in self.jobs:
+                print(f'  {job.cost:>6}  {job.name}')
+            for job in self.deferred:
+                print(f'  {job.cost:>6}  {job.name} [deferred]')
+        summary = f'Plan: {len(self.jobs)} jobs, ~{self.cost} of {self.budget} units'
+        if self.deferred:
+            deferred_cost = sum(job.cost for job in self.deferred)
+            summary += f', {len(self.deferred)} deferred (~{deferred_cost} units)'
+        print(summary)
+
+
+def remaining_quota() -> tuple[int, float]:
+    """(Data API units this process may still spend, when they next free up).
+    Outside interactive priority, the interactive reserve doesn't count."""
+    from rate_limiter import RateLimiter
+    return RateLimiter.get().remaining(YOUTUBE_DATA_API)
+
+
+def plan(jobs, budget=None, rank=True) -> Plan:
+    """Take jobs by value per unit while they fit in budget (default: the
+    remaining quota). Cheaper jobs further down can still fill a gap.
+    With rank=False jobs are taken in the order given."""
+    if budget is None:
+        budget = remaining_quota()[0]
+    result = Plan(budget=budget)
+    left = budget
+    if rank:
+        jobs = sorted(jobs, key=lambda job: job.value_per_unit, reverse=True)
+    for job in jobs:
+        if job.cost <= left:
+            result.jobs.append(job)
+            left -= job.cost
+        else:
+            result.deferred.append(job)
+    return result
+
+
+def pages(count, per_page) -> int:
+    """List calls needed for count items; an empty listing still takes one."""
+    return max(1, math.ceil(count / per_page))
+
+
+def mirror_job(subscription) -> Job:
+    """Channel.mirror_uploads for a subscription's channel. Each uploads
+    page costs a playlistItems.list plus a videos.list for its uncached
+    videos; a first mirror also refreshes the channel. Valued by the
+    uploads not yet stored locally."""
+    from youtube import Channel
+    channel_dir = Channel.get_active_dir(subscription.channel_id)
+    channel_file = channel_dir / 'channel.json'
+    sync_file = channel_dir / 'uploads.json'
+    uploads = subscription.total_item_count or 0
+    local = _local_uploads_count(channel_dir)
+    new = max(0, uploads - local)
+
+    page_cost = DATA_API_COSTS['playlistItems.list'] + DATA_API_COSTS['videos.list']
+    synced = sync_file.exists() and json.loads(sync_file.read_text()).get('last_uploads_sync')
+    if synced:
+        cost = pages(new, UPLOADS_PER_PAGE) * page_cost
+    else:
+        cost = pages(uploads, UPLOADS_PER_PAGE) * page_cost
+        if not channel_file.exists() or _stale(json.loads(channel_file.read_text())):
+            cost += DATA_API_COSTS['channels.list']
+    return Job(name=f'{subscription.channel_id} {subscription.title}', cost=cost,
+               value=1 + new, payload=subscription)
+
+
+def comments_job(video, comment_limit=None, force=False) -> Job:
+    """Video.mirror_comments, from the video's comment count less the
+    pages a previous incomplete run already fetched. The count includes
+    replies, which come inside their threads, so this errs high."""
+    from youtube import Video
+    file = Video.get_active_comments_file(video.video_id)
+    fetched = 0
+    if not force and file.exists():
+        state = json.loads(file.read_text())
+        if state.get('comments_disabled') or state.get('fetch_complete', True):
+            return Job(name=f'{video.video_id} {video.title}', cost=0, payload=video)
+        fetched = state.get('pages_fetched', 0) * THREADS_PER_PAGE
+    wanted = max(0, (video.comment_count or 0) - fetched)
+    if comment_limit is not None:
+        wanted = min(wanted, comment_limit)
+    cost = pages(wanted, THREADS_PER_PAGE) * DATA_API_COSTS['commentThreads.list']
+    return Job(name=f'{video.video_id} {video.title}', cost=cost, payload=video)
+
+
+def subscriptions_cost(count=None) -> int:
+    """Subscription.update_all, by the subscriptions stored last time."""
+    from youtube import Subscription
+    if count is None:
+        count = sum(1 for _ in Subscription.data_dir().glob('*.json'))
+    return pages(count, SUBSCRIPTIONS_PER_PAGE) * DATA_API_COSTS['subscriptions.list']
+
+
+def print_remaining():
+    left, frees_at = remaining_quota()
+    when = datetime.fromtimestamp(frees_at).strftime('%Y-%m-%d %H:%M')
+    print(f'Data API quota: {left} units left, more from {when}')
+
+
+def _local_uploads_count(channel_dir) -> int:
+    return sum(len(json.loads(path.read_text()))
+               for path in (channel_dir / 'uploads').glob('*.json'))
+
+
+def _stale(channel_data) -> bool:
+    """Whether Channel.sync would refetch the channel."""
+    from context import Context
+    from youtube.channel import SCHEMA_VERSION
+    if channel_data.get('schema_version', 0) < SCHEMA_VERSION:
+        return True
+    last_updated = datetime.fromisoformat(channel_data['last_updated'])
+    return Context.get().batch_time - last_updated > timedelta(days=1)
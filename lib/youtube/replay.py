@@ -0,0 +1,322 @@
+"""Record/replay for the Data API.
+
+RecordingHttp sits under the client built by get_youtube_client and saves
+every JSON list response to a fixture directory (YOUTUBE_RECORD_DIR).
+ReplayServer is a local HTTP stand-in that indexes those recordings and
+answers list calls for the resources we mirror, including batch calls,
+fields masks, If-None-Match and re-paging at any page size. Point the
+client at it with YOUTUBE_API_ENDPOINT."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httplib2
+
+from util import dump_json
+
+API_ROOT = 'https://youtube.googleapis.com/'
+API_PATH = '/youtube/v3/'
+RESOURCES = (
+    'videos', 'channels', 'playlists', 'playlistItems',
+    'commentThreads', 'comments', 'subscriptions',
+)
+DEFAULT_PAGE_SIZE = 5
+# Query parameters that shape or page a response rather than select what
+# it lists.
+SHAPING_PARAMS = {'part', 'fields', 'pageToken', 'maxResults', 'alt', 'prettyPrint', 'key'}
+
+
+class StandInHttp(httplib2.Http):
+    """Unauthenticated transport that sends API calls to a stand-in."""
+
+    def __init__(self, endpoint):
+        super().__init__()
+        self.endpoint = endpoint
+
+    def request(self, uri, *args, **kwargs):
+        return super().request(stand_in_uri(self.endpoint, uri), *args, **kwargs)
+
+
+def stand_in_uri(endpoint, uri):
+    """uri with the API root swapped for the stand-in endpoint."""
+    if uri.startswith(API_ROOT):
+        return endpoint.rstrip('/') + '/' + uri[len(API_ROOT):]
+    return uri
+
+
+class RecordingHttp:
+    """Wraps a transport and records successful list responses,
+    unpacking batch calls into their sub-requests."""
+
+    def __init__(self, http, fixture_dir):
+        self.http = http
+        self.fixture_dir = Path(fixture_dir)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        if resp.status == 200:
+            if method == 'GET':
+                self.record(uri, content)
+            elif urlsplit(uri).path.endswith('/batch'):
+                self.record_batch(headers or {}, body, resp, content)
+        return resp, content
+
+    def record(self, uri, content):
+        resource, params = _split_api_uri(uri)
+        if resource not in RESOURCES:
+            return
+        response = json.loads(content)
+        key = hashlib.sha1(urlencode(sorted(params.items())).encode()).hexdigest()[:16]
+        dump_json(self.fixture_dir / resource / f'{key}.json', {
+            'resource': resource,
+            'params': params,
+            'response': response,
+        })
+
+    def record_batch(self, headers, body, resp, content):
+        content_type = {k.lower(): v for k, v in headers.items()}.get('content-type', '')
+        if isinstance(body, str):
+            body = body.encode()
+        requests = dict(_parse_batch_request(content_type, body))
+        for content_id, (status, sub_body) in _parse_batch_response(resp['content-type'], content):
+            sub_request = requests.get(content_id.removeprefix('response-'))
+            if status == 200 and sub_request and sub_request[0] == 'GET':
+                self.record(sub_request[1], sub_body)
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+class FixtureIndex:
+    """Recorded items, by id and by the query that listed them."""
+
+    def __init__(self):
+        self.by_id = {resource: {} for resource in RESOURCES}
+        self.collections = {}
+
+    @classmethod
+    def load(cls, fixture_dir) -> FixtureIndex:
+        index = cls()
+        pages = {}
+        for path in sorted(Path(fixture_dir).glob('*/*.json')):
+            recording = json.loads(path.read_text())
+            resource, params = recording['resource'], recording['params']
+            response = recording['response']
+            for item in response.get('items', []):
+                if isinstance(item.get('id'), str):
+                    index.by_id[resource].setdefault(item['id'], item)
+            pages[(resource, _selection(params), params.get('pageToken'))] = response
+        for (resource, selection, page_token), response in pages.items():
+            if page_token is not None:
+                continue
+            items = []
+            while response is not None:
+                items.extend(response.get('items', []))
+                next_token = response.get('nextPageToken')
+                response = pages.get((resource, selection, next_token)) if next_token else None
+            index.collections[(resource, selection)] = items
+        return index
+
+    def lookup(self, resource, params):
+        """Items answering a list query, or None if nothing was recorded."""
+        if 'id' in params:
+            ids = params['id'].split(',')
+            return [self.by_id[resource][i] for i in ids if i in self.by_id[resource]]
+        return self.collections.get((resource, _selection(params)))
+
+
+class ReplayServer:
+    """Local stand-in for the Data API serving recorded responses.
+
+    latency is added to every HTTP round trip (a batch counts as one).
+    page_size overrides maxResults, so paging can be exercised with
+    whatever was recorded."""
+
+    def __init__(self, fixture_dir, latency=0.0, page_size=None, host='127.0.0.1', port=0):
+        self.index = FixtureIndex.load(fixture_dir)
+        self.latency = latency
+        self.page_size = page_size
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _handler_for(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> ReplayServer:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def round_trip(self):
+        with self._count_lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def respond(self, method, uri, headers) -> tuple[int, dict, bytes]:
+        """Answer one API call with (status, headers, body)."""
+        from youtube.fields import apply_field_mask, parse_field_mask
+
+        resource, params = _split_api_uri(uri)
+        if method != 'GET' or resource not in RESOURCES:
+            return _error(404, 'notFound', f'{method} {uri} is not replayed')
+        items = self.index.lookup(resource, params)
+        if items is None:
+            return _error(404, 'notFound', f'No recording for {resource} {_selection(params)}')
+
+        if 'id' in params:
+            size = max(len(items), 1)
+        else:
+            size = self.page_size or int(params.get('maxResults', DEFAULT_PAGE_SIZE))
+        offset = int(params.get('pageToken', 'p0')[1:])
+        page = items[offset:offset + size]
+        response = {
+            'kind': f'youtube#{resource[:-1]}ListResponse',
+            'pageInfo': {'totalResults': len(items), 'resultsPerPage': size},
+            'items': page,
+        }
+        if offset + size < len(items):
+            response['nextPageToken'] = f'p{offset + size}'
+        mask = parse_field_mask(params['fields']) if 'fields' in params else None
+        if mask is not None:
+            response = apply_field_mask(response, mask)
+        etag = '"' + hashlib.sha1(json.dumps(response, sort_keys=True).encode()).hexdigest() + '"'
+        if headers.get('if-none-match') == etag:
+            return 304, {'ETag': etag}, b''
+        if mask is None or 'etag' in mask:
+            response['etag'] = etag
+        return 200, {'Content-Type': 'application/json', 'ETag': etag}, json.dumps(response).encode()
+
+    def respond_batch(self, content_type, body) -> tuple[int, dict, bytes]:
+        boundary = 'batch_' + hashlib.sha1(body).hexdigest()[:16]
+        parts = []
+        for content_id, (method, uri, headers) in _parse_batch_request(content_type, body):
+            status, sub_headers, sub_body = self.respond(method, uri, headers)
+            header_lines = ''.join(f'{k}: {v}\r\n' for k, v in sub_headers.items())
+            parts.append(
+                f'--{boundary}\r\n'
+                'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status} {_reason(status)}\r\n{header_lines}\r\n'
+                + sub_body.decode()
+                + '\r\n'
+            )
+        payload = (''.join(parts) + f'--{boundary}--\r\n').encode()
+        return 200, {'Content-Type': f'multipart/mixed; boundary={boundary}'}, payload
+
+
+def _handler_for(server):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.round_trip()
+            headers = {k.lower(): v for k, v in self.headers.items()}
+            self._send(*server.respond('GET', self.path, headers))
+
+        def do_POST(self):
+            server.round_trip()
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if urlsplit(self.path).path.rstrip('/') == '/batch':
+                self._send(*server.respond_batch(self.headers['Content-Type'], body))
+            else:
+                self._send(*_error(404, 'notFound', f'POST {self.path} is not replayed'))
+
+        def _send(self, status, headers, body):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _split_api_uri(uri):
+    parts = urlsplit(uri)
+    resource = parts.path.split(API_PATH, 1)[-1] if API_PATH in parts.path else None
+    return resource, dict(parse_qsl(parts.query))
+
+
+def _selection(params):
+    return urlencode(sorted((k, v) for k, v in params.items() if k not in SHAPING_PARAMS))
+
+
+def _parse_batch_request(content_type, body):
+    """Yield (content_id, (method, uri, headers)) for each sub-request."""
+    for content_id, payload in _batch_parts(content_type, body):
+        request_line, headers, _ = _split_http(payload)
+        method, uri, _ = request_line.split(' ', 2)
+        yield content_id, (method, uri, headers)
+
+
+def _parse_batch_response(content_type, content):
+    """Yield (content_id, (status, body)) for each sub-response."""
+    for content_id, payload in _batch_parts(content_type, content):
+        status_line, _, body = _split_http(payload)
+        yield content_id, (int(status_line.split(' ', 2)[1]), body.encode())
+
+
+def _batch_parts(content_type, body):
+    """Split a multipart/mixed batch body into (content_id, payload),
+    leaving 8bit UTF-8 payloads untouched."""
+    boundary = content_type.split('boundary=', 1)[1].split(';')[0].strip('"')
+    for chunk in body.split(b'--' + boundary.encode())[1:]:
+        if chunk.startswith(b'--'):
+            break
+        head, _, payload = chunk.decode().replace('\r\n', '\n').strip('\n').partition('\n\n')
+        yield _parse_headers(head.split('\n'))['content-id'].strip('<>'), payload
+
+
+def _split_http(text):
+    """Split an HTTP message into (first line, {header: value}, body)."""
+    text = text.replace('\r\n', '\n')
+    head, _, body = text.partition('\n\n')
+    first_line, *lines = head.split('\n')
+    return first_line, _parse_headers(lines), body.rstrip('\n')
+
+
+def _parse_headers(lines):
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def _error(status, reason, message):
+    body = {'error': {'code': status, 'message': message,
+                      'errors': [{'reason': reason, 'message': message}]}}
+    return status, {'Content-Type': 'application/json'}, json.dumps(body).encode()
+
+
+def _reason(status):
+    from http import HTTPStatus
+    return HTTPStatus(status).phrase
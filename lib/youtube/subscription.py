@@ -7,10 +7,11 @@ from typing import Generator
 
 import config
 from context import Context
-from util import dump_json, to_obj
+from util import convert_fields, dump_json, to_obj
 
+SUBSCRIPTION_PARTS = 'contentDetails,snippet'
 
-@dataclass
+@dataclass(slots=True)
 class Subscription:
     """Represents a YouTube subscription"""
     channel_id: str
@@ -37,28 +38,59 @@ class Subscription:
 
     @classmethod
     def get_all(cls) -> Generator[Subscription, None, None]:
+        objects = Context.get().objects
         for path in cls.data_dir().glob('*.json'):
-            data = json.loads(path.read_text())
-            data['first_seen'] = datetime.fromisoformat(data['first_seen'])
-            data['last_updated'] = datetime.fromisoformat(data['last_updated'])
-            yield cls(**data)
+            yield objects.get(cls, path, lambda: cls._from_file(path))
+
+    @classmethod
+    def _from_file(cls, path) -> Subscription:
+        return cls(**convert_fields(cls, json.loads(path.read_text())))
 
     @classmethod
     def get_hot(cls) -> Generator[Subscription, None, None]:
+        for page in cls.update_pages():
+            for data in page:
+                yield cls(**data)
+
+    @classmethod
+    def update_pages(cls, **params) -> Generator[list[dict], None, None]:
+        """Page through our subscriptions, writing each one. Pages we hold
+        an etag for are requested with If-None-Match, and a 304 page only
+        bumps last_updated on the subscriptions it held last time."""
         from youtube import get_youtube_client
         from youtube.client import execute_api
+        from youtube.etags import EtagStore
+        from youtube.fields import FIELD_MASKS
+        etags = EtagStore.get()
         youtube = get_youtube_client()
-        request = youtube.subscriptions().list(
-            part="contentDetails,snippet",
-            mine=True,
-        )
-
-        while request:
-            response = execute_api(request, 'subscriptions.list')
-            for item in to_obj(response['items']):
-                data = cls.update_from_data(item)
-                yield cls(**data)
-            request = youtube.subscriptions().list_next(request, response)
+        page_token = None
+        while True:
+            request = youtube.subscriptions().list(
+                part=SUBSCRIPTION_PARTS,
+                fields=FIELD_MASKS['subscriptions.list'],
+                mine=True,
+                pageToken=page_token,
+                **params,
+            )
+            page_key = json.dumps(dict(params, pageToken=page_token), sort_keys=True)
+            known = etags.lookup('subscriptions.list', page_key, SUBSCRIPTION_PARTS)
+            if known and not all((cls.data_dir() / f"{id}.json").exists()
+                                 for id in known.data['channel_ids']):
+                known = None
+            response = execute_api(request, 'subscriptions.list', etag=known and known.etag)
+            if response is None:
+                page = [cls.touch(id) for id in known.data['channel_ids']]
+                page_token = known.data['next_page_token']
+            else:
+                page = [cls.update_from_data(item) for item in to_obj(response['items'])]
+                page_token = response.get('nextPageToken')
+                etags.save('subscriptions.list', page_key, SUBSCRIPTION_PARTS, response.get('etag'), {
+                    'channel_ids': [data['channel_id'] for data in page],
+                    'next_page_token': page_token,
+                })
+            yield page
+            if not page_token:
+                return
 
     @classmethod
     def update_from_data(cls, item) -> dict:
@@ -88,25 +120,18 @@ class Subscription:
         return data
 
     @classmethod
-    def update_all(cls):
-        from youtube import get_youtube_client
-        from youtube.client import execute_api
-        youtube = get_youtube_client()
-        request = youtube.subscriptions().list(
-            part="contentDetails,snippet",
-            order="alphabetical",
-            mine=True,
-            maxResults=50
-        )
+    def touch(cls, channel_id) -> dict:
+        output_file = cls.data_dir() / f"{channel_id}.json"
+        data = json.loads(output_file.read_text())
+        data['last_updated'] = Context.get().batch_time.isoformat()
+        dump_json(output_file, data)
+        return data
 
+    @classmethod
+    def update_all(cls):
         channel_ids = []
-        while request:
-            response = execute_api(request, 'subscriptions.list')
-            for item in to_obj(response['items']):
-                data = cls.update_from_data(item)
-                channel_ids.append(data['channel_id'])
-            request = youtube.subscriptions().list_next(request, response)
-            #request = False
+        for page in cls.update_pages(order="alphabetical", maxResults=50):
+            channel_ids.extend(data['channel_id'] for data in page)
 
         existing_files = list(cls.data_dir().glob('*.json'))
         existing_ids = {f.stem for f in existing_files}
@@ -1,10 +1,14 @@
 from datetime import datetime
 
 from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import IpBlocked, RequestBlocked
+from youtube_transcript_api._errors import (
+    IpBlocked,
+    RequestBlocked,
+    YouTubeRequestFailed,
+)
 
-from rate_limiter import RateLimiter
 from rate_limits import YOUTUBE_TIMEDTEXT
+from retry import Transient, call_with_retry
 
 
 class TranscriptUnavailable(Exception):
@@ -14,19 +18,31 @@ class TranscriptUnavailable(Exception):
 
 
 def _run_timedtext(video_id, fn):
-    """Run a timedtext API call under the rate limiter, mapping errors."""
-    ticket = RateLimiter.get().acquire(YOUTUBE_TIMEDTEXT)
+    """Run a timedtext API call under the rate limiter, mapping errors.
+    Blocks and transient failures are retried with backoff; a block that
+    outlasts the retries is raised so the batch can stop."""
     try:
-        result = fn()
+        return call_with_retry(YOUTUBE_TIMEDTEXT, fn, _classify_timedtext)
     except (IpBlocked, RequestBlocked) as e:
-        ticket.blocked()
         print(f'[blocked] {video_id}: {e}')
         raise
     except Exception as e:
-        ticket.error(e)
         raise TranscriptUnavailable(type(e).__name__) from e
-    ticket.ok()
-    return result
+
+
+def _classify_timedtext(e):
+    import requests
+    if isinstance(e, (IpBlocked, RequestBlocked)):
+        return Transient(blocked=True)
+    if isinstance(e, YouTubeRequestFailed) and e.reason[:3] in ('429', '500', '502', '503', '504'):
+        return Transient()
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return Transient()
+    return None
+
+
+def list_transcripts(video_id):
+    return list(YouTubeTranscriptApi().list(video_id))
 
 
 class Transcript:
@@ -34,12 +50,11 @@ class Transcript:
 
     @classmethod
     def get_best(cls, video_id):
-        def _list():
-            ytt_api = YouTubeTranscriptApi()
-            return list(ytt_api.list(video_id))
-
-        available_transcripts = _run_timedtext(video_id, _list)
+        available_transcripts = _run_timedtext(video_id, lambda: list_transcripts(video_id))
+        return cls.select_best(available_transcripts)
 
+    @classmethod
+    def select_best(cls, available_transcripts):
         english_variants = [t for t in available_transcripts
             if t.language_code.startswith('en')]
 
@@ -59,7 +74,10 @@ class Transcript:
     def download(cls, video_id):
         transcript = cls.get_best(video_id)
         transcript_data = _run_timedtext(video_id, transcript.fetch)
+        return cls.to_data(video_id, transcript, transcript_data)
 
+    @classmethod
+    def to_data(cls, video_id, transcript, transcript_data):
         segments = transcript_data.to_raw_data()
 
         return {
@@ -1,18 +1,77 @@
 import json
-from dataclasses import dataclass
+import re
+import threading
+from dataclasses import MISSING, dataclass, field, fields
 from datetime import datetime, timezone
 from pprint import pprint
 from typing import Optional
 
+from rate_limits import MAX_IDS_PER_REQUEST
+
 import config
 from context import Context
 from util import convert_fields, dump_json, to_dict, to_obj
+from youtube.catalog import Catalog
+
+VIDEO_PARTS = 'snippet,contentDetails,liveStreamingDetails,paidProductPlacementDetails,recordingDetails,statistics,status,topicDetails'
+# Fields a catalog entry carries. A Video built from one reads the rest
+# from video.json when one of them is first used.
+CATALOG_FIELDS = (
+    'video_id', 'channel_id', 'title', 'published_at', 'first_seen', 'last_updated',
+    'duration_data', 'view_count', 'like_count', 'comment_count',
+)
+# Large fields a Video read from video.json holds as their JSON text,
+# each decoded when first used.
+RAW_FIELDS = ('description', 'thumbnails_data', 'topic_details')
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Held while a shared Video fills in a deferred field.
+_FILL_LOCK = threading.Lock()
 
 
 class VideoUnavailableError(Exception):
     pass
 
 
+def parse_duration(duration_data) -> int:
+    """Seconds in an ISO 8601 duration such as PT1H2M3S; 0 if unparseable."""
+    try:
+        import isodate
+        duration = isodate.parse_duration(duration_data)
+        return int(duration.total_seconds())
+    except (AttributeError, ValueError, TypeError):
+        return 0
+
+
+def _json_members(text, raw=()) -> dict:
+    """Members of the JSON object in text, decoded except for those named
+    in raw, which are kept as their JSON text."""
+    members = {}
+    idx = _WHITESPACE.match(text, 0).end()
+    if text[idx:idx + 1] != '{':
+        raise json.JSONDecodeError('Expecting object', text, idx)
+    idx = _WHITESPACE.match(text, idx + 1).end()
+    if text[idx:idx + 1] == '}':
+        return members
+    while True:
+        if text[idx:idx + 1] != '"':
+            raise json.JSONDecodeError('Expecting property name enclosed in double quotes', text, idx)
+        key, idx = json.decoder.scanstring(text, idx + 1)
+        idx = _WHITESPACE.match(text, idx).end()
+        if text[idx:idx + 1] != ':':
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+        start = _WHITESPACE.match(text, idx + 1).end()
+        value, idx = _DECODER.raw_decode(text, start)
+        members[key] = text[start:idx] if key in raw else value
+        idx = _WHITESPACE.match(text, idx).end()
+        if text[idx:idx + 1] == '}':
+            return members
+        if text[idx:idx + 1] != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+        idx = _WHITESPACE.match(text, idx + 1).end()
+
+
 def _api_to_comment_dict(item, video_id, parent_id, total_reply_count):
     s = item['snippet']
     author_channel = s.get('authorChannelId')
@@ -83,7 +142,7 @@ def _render_comments_txt(comments_dict):
     return '\n'.join(lines).rstrip() + '\n'
 
 
-@dataclass
+@dataclass(slots=True)
 class Video:
     """Represents a YouTube video"""
     video_id: str
@@ -117,6 +176,39 @@ class Video:
     live_start: Optional[datetime] = None
     live_chat_id: Optional[str] = None
     recording_date: Optional[datetime] = None
+    # JSON text of the RAW_FIELDS not decoded yet; None until read.
+    _raw: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+
+    def __getattr__(self, name):
+        # Only reached for unset slots: a raw field not decoded yet, or a
+        # field a Video from from_catalog() doesn't carry.
+        # Context.objects shares a Video between threads, so filling in is
+        # the one change made to it, and is done under _FILL_LOCK.
+        if name not in _DEFERRED_FIELDS:
+            raise AttributeError(f"'Video' object has no attribute '{name}'")
+        if self._raw is None:
+            self._load_deferred()
+        with _FILL_LOCK:
+            raw = self._raw.get(name)
+            if raw is not None:
+                setattr(self, name, convert_fields(self.__class__, {name: json.loads(raw)})[name])
+                del self._raw[name]
+        return object.__getattribute__(self, name)
+
+    def _load_deferred(self):
+        """Fill in what a from_catalog() Video doesn't carry from video.json,
+        leaving the RAW_FIELDS undecoded."""
+        data_file = self.__class__.get_active_dir(self.video_id) / "video.json"
+        members = _json_members(data_file.read_text(), raw=RAW_FIELDS)
+        raw = {name: members.pop(name) for name in RAW_FIELDS if name in members}
+        values = _DEFAULTS | convert_fields(self.__class__, members)
+        with _FILL_LOCK:
+            if self._raw is not None:
+                return
+            for name, value in values.items():
+                if name in _DEFERRED_FIELDS:
+                    setattr(self, name, value)
+            self._raw = raw
 
     @property
     def channel(self) -> 'Channel':
@@ -126,12 +218,7 @@ class Video:
     @property
     def duration_seconds(self) -> int:
         """Get video duration in seconds."""
-        try:
-            import isodate
-            duration = isodate.parse_duration(self.duration_data)
-            return int(duration.total_seconds())
-        except (AttributeError, ValueError, TypeError):
-            return 0
+        return parse_duration(self.duration_data)
 
     @property
     def duration_formatted(self) -> str:
@@ -171,18 +258,99 @@ class Video:
     @classmethod
     def get(cls, video_id):
         data_file = cls.get_active_dir(video_id) / "video.json"
-        if data_file.exists():
-            data = json.loads(data_file.read_text())
-        else:
-            data = cls.update(video_id)
-        return cls(**convert_fields(cls, data))
+        objects = Context.get().objects
+        video = objects.get(cls, data_file, lambda: cls._load(video_id, data_file))
+        if video is None:
+            video = cls(**convert_fields(cls, cls.update(video_id)))
+            objects.put(cls, data_file, video)
+        return video
+
+    @classmethod
+    def get_many(cls, video_ids) -> dict[str, 'Video']:
+        """Like get(), but fetches all uncached videos in batched calls.
+        Returns {video_id: Video} in input order; unavailable videos are
+        left out."""
+        video_ids = list(video_ids)
+        objects = Context.get().objects
+        found = {}
+        missing = []
+        for video_id in video_ids:
+            data_file = cls.get_active_dir(video_id) / "video.json"
+            video = objects.get(cls, data_file, lambda: cls._load(video_id, data_file))
+            if video is None:
+                missing.append(video_id)
+            else:
+                found[video_id] = video
+        if missing:
+            for video_id, data in cls.update_many(missing).items():
+                found[video_id] = cls(**convert_fields(cls, data))
+                objects.put(cls, cls.get_active_dir(video_id) / "video.json", found[video_id])
+        return {video_id: found[video_id] for video_id in video_ids if video_id in found}
+
+    @classmethod
+    def from_catalog(cls, entry) -> 'Video':
+        """A Video with only the CatalogEntry's fields decoded."""
+        video = cls.__new__(cls)
+        for name in CATALOG_FIELDS:
+            value = getattr(entry, name)
+            # Rows from before duration_data was catalogued leave it to the file.
+            if value is not None or name != 'duration_data':
+                setattr(video, name, value)
+        video._raw = None
+        return video
+
+    @classmethod
+    def _load(cls, video_id, data_file) -> Optional['Video']:
+        """The stored video: from its catalog row when there is one,
+        otherwise from video.json."""
+        if not data_file.exists():
+            return None
+        entry = Catalog.get().find(video_id)
+        if entry is not None:
+            return cls.from_catalog(entry)
+        return cls._from_file(data_file)
+
+    @classmethod
+    def _from_file(cls, data_file) -> Optional['Video']:
+        if not data_file.exists():
+            return None
+        members = _json_members(data_file.read_text(), raw=RAW_FIELDS)
+        raw = {name: members.pop(name) for name in RAW_FIELDS if name in members}
+        video = cls(**convert_fields(cls, members), **dict.fromkeys(raw))
+        for name in raw:
+            delattr(video, name)
+        video._raw = raw
+        return video
 
     @classmethod
     def update(cls, video_id):
+        """Refresh one video. When we hold its etag the request is
+        conditional, and a 304 only bumps last_updated."""
+        from youtube.etags import EtagStore
+        etags = EtagStore.get()
+        known = None
+        if (cls.get_active_dir(video_id) / "video.json").exists():
+            known = etags.lookup('videos.list', video_id, VIDEO_PARTS)
+        result = cls.retrieve_if_changed(video_id, etag=known and known.etag)
+        if result is None:
+            return cls.touch(video_id)
+        etag, new_data = result
+        data = cls.update_from_data(new_data)
+        etags.save('videos.list', video_id, VIDEO_PARTS, etag)
+        return data
+
+    @classmethod
+    def update_many(cls, video_ids) -> dict[str, dict]:
+        return {
+            new_data['video_id']: cls.update_from_data(new_data)
+            for new_data in cls.retrieve_many(video_ids)
+        }
+
+    @classmethod
+    def update_from_data(cls, new_data):
         from deepdiff import DeepDiff
 
-        new_data = cls.retrieve(video_id)
-        data_file = cls.get_active_dir(video_id) / "video.json"
+        data_file = cls.get_active_dir(new_data['video_id']) / "video.json"
         batch_time = Context.get().batch_time
         #print(data_file)
 
@@ -208,22 +376,85 @@ class Video:
 
         data.update(new_data)
         data['last_updated'] =  batch_time.isoformat()
-        dump_json(data_file, data)
+        Catalog.get().store(data_file, data)
+        return data
+
+    @classmethod
+    def touch(cls, video_id):
+        data_file = cls.get_active_dir(video_id) / "video.json"
+        data = json.loads(data_file.read_text())
+        data['last_updated'] = Context.get().batch_time.isoformat()
+        Catalog.get().store(data_file, data)
         return data
 
     @classmethod
     def retrieve(cls, video_id):
+        return cls.retrieve_if_changed(video_id)[1]
+
+    @classmethod
+    def retrieve_if_changed(cls, video_id, etag=None):
+        """(etag, data) for the video, or None if it still matches etag."""
         from youtube import get_youtube_client
         from youtube.client import execute_api
+        from youtube.fields import FIELD_MASKS
         youtube = get_youtube_client()
         request = youtube.videos().list(
             id=video_id,
-            part="snippet,contentDetails,liveStreamingDetails,paidProductPlacementDetails,recordingDetails,statistics,status,topicDetails",
+            part=VIDEO_PARTS,
+            fields=FIELD_MASKS['videos.list'],
         )
-        response = execute_api(request, 'videos.list')
+        response = execute_api(request, 'videos.list', etag=etag)
+        if response is None:
+            return None
         if not response.get('items'):
             raise VideoUnavailableError(video_id)
-        item = to_obj(response['items'][0])
+        return response.get('etag'), cls.data_from_item(video_id, to_obj(response['items'][0]))
+
+    @classmethod
+    def retrieve_many(cls, video_ids):
+        """Fetch videos MAX_IDS_PER_REQUEST at a time, one quota unit per
+        page, with all pages sent as one batch call. Yields data dicts
+        and skips unavailable videos. A page that fails is fetched again
+        one video at a time, so only the videos that still fail are left
+        out."""
+        from youtube import get_youtube_client
+        from youtube.client import execute_api_many
+        from youtube.fields import FIELD_MASKS
+        youtube = get_youtube_client()
+        video_ids = list(dict.fromkeys(video_ids))
+        pages = [video_ids[start:start + MAX_IDS_PER_REQUEST]
+                 for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST)]
+        requests = [
+            youtube.videos().list(
+                id=','.join(page),
+                part=VIDEO_PARTS,
+                fields=FIELD_MASKS['videos.list'],
+            )
+            for page in pages
+        ]
+        if not requests:
+            return
+        responses = execute_api_many(requests, 'videos.list', return_exceptions=True)
+        for page, response in zip(pages, responses):
+            if isinstance(response, Exception):
+                yield from cls._retrieve_each(page, response)
+                continue
+            for item in to_obj(response.get('items', [])):
+                yield cls.data_from_item(item.id, item)
+
+    @classmethod
+    def _retrieve_each(cls, video_ids, page_error):
+        print(f'[error] videos.list page failed ({page_error}), fetching one by one')
+        for video_id in video_ids:
+            try:
+                yield cls.retrieve(video_id)
+            except VideoUnavailableError:
+                pass
+            except Exception as e:
+                print(f'[error] {video_id}: {e}')
+
+    @classmethod
+    def data_from_item(cls, video_id, item):
         #pprint(item, width=120)
         #batch_time = Context.get().batch_time
 
@@ -324,11 +555,13 @@ class Video:
         from youtube import get_youtube_client
         from youtube.client import execute_api
         from youtube.comment import CommentsDisabledError
+        from youtube.fields import FIELD_MASKS
 
         youtube = get_youtube_client()
         kwargs = dict(
             videoId=self.video_id,
             part='snippet,replies',
+            fields=FIELD_MASKS['commentThreads.list'],
             maxResults=100,
             textFormat='plainText',
         )
@@ -448,14 +681,34 @@ class Video:
         except CommentsDisabledError:
             self._mark_comments_disabled()
 
+    @classmethod
+    def mirror_comments_many(cls, videos, comment_limit=None, force=False):
+        """mirror_comments for each video, spread over the API executor.
+        A video listed twice is mirrored once, so no two workers write the
+        same comments file. A failed video doesn't stop the others:
+        returns {video_id: exception} for those that failed."""
+        from youtube.executor import ApiExecutor
+
+        def mirror(video):
+            try:
+                video.mirror_comments(comment_limit=comment_limit, force=force)
+            except Exception as e:
+                return e
+
+        unique = {video.video_id: video for video in videos}
+        failed = ApiExecutor.get().map(mirror, unique.values())
+        return {video_id: e for video_id, e in zip(unique, failed) if e is not None}
+
     def retrieve_thread_replies(self, comment_id):
         from youtube import get_youtube_client
         from youtube.client import execute_api
+        from youtube.fields import FIELD_MASKS
 
         youtube = get_youtube_client()
         request = youtube.comments().list(
             parentId=comment_id,
             part='snippet',
+            fields=FIELD_MASKS['comments.list'],
             maxResults=100,
             textFormat='plainText',
         )
@@ -533,3 +786,8 @@ class Video:
         dump_json(file, existing)
         txt_file = file.parent / 'comments.txt'
         txt_file.write_text(_render_comments_txt(existing.get('comments', {})))
+
+
+_DEFERRED_FIELDS = frozenset(field.name for field in fields(Video)) - set(CATALOG_FIELDS) - {'_raw'}
+_DEFAULTS = {field.name: field.default for field in fields(Video)
+             if field.default is not MISSING and field.name != '_raw'}
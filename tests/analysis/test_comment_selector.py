@@ -740,20 +740,21 @@ class TestClassify:
                 author_channel_id='UC_quality'),
         ])
 
-        # Mock Channel.retrieve so we can detect calls without real API.
+        # Mock Channel.retrieve_many so we can detect calls without real API.
         retrieve_calls = []
-        def fake_retrieve(channel_id):
-            retrieve_calls.append(channel_id)
-            return {
-                'channel_id': channel_id, 'title': f'C {channel_id}',
-                'description': '', 'subscriber_count': 100, 'uploads_count': 5,
-                'view_count': 1000, 'banner_external_url': '', 'custom_url': '',
-                'playlists_data': {}, 'status': {}, 'thumbnails': {},
-                'topic_details': {}, 'published_at': '2020-01-01T00:00:00+00:00',
-                'schema_version': 2,
-            }
-
-        with patch('youtube.channel.Channel.retrieve', side_effect=fake_retrieve):
+        def fake_retrieve_many(channel_ids):
+            for channel_id in channel_ids:
+                retrieve_calls.append(channel_id)
+                yield {
+                    'channel_id': channel_id, 'title': f'C {channel_id}',
+                    'description': '', 'subscriber_count': 100, 'uploads_count': 5,
+                    'view_count': 1000, 'banner_external_url': '', 'custom_url': '',
+                    'playlists_data': {}, 'status': {}, 'thumbnails': {},
+                    'topic_details': {}, 'published_at': '2020-01-01T00:00:00+00:00',
+                    'schema_version': 2,
+                }
+
+        with patch('youtube.channel.Channel.retrieve_many', side_effect=fake_retrieve_many):
             classify(_video(), expand=False)
 
         # Quality comment author got fetched, spam author did not.
@@ -761,6 +762,34 @@ class TestClassify:
         assert 'UC_spam' not in retrieve_calls
 
 
+class TestAuthorPrefetch:
+    def _ctx(self):
+        return {'creator_id': 'UC_creator'}
+
+    def test_gated_authors_fetched_in_one_call(self, ctx, write_json):
+        from analysis.comment_selector import _prefetch_authors
+        _stub_subscription(write_json, 'UC_sub')
+        long_text = 'x' * 60
+        comments = [
+            _comment('c1', long_text, author_channel_id='UC_b'),
+            _comment('c2', long_text, author_channel_id='UC_a'),
+            _comment('c3', long_text, author_channel_id='UC_b'),
+            _comment('c4', 'short', author_channel_id='UC_short'),
+            _comment('c5', long_text, author_channel_id='UC_creator'),
+            _comment('c6', long_text, author_channel_id='UC_sub'),
+        ]
+        with patch('youtube.channel.Channel.get_many', return_value={}) as get_many:
+            _prefetch_authors(comments, self._ctx())
+        get_many.assert_called_once_with(['UC_a', 'UC_b'])
+
+    def test_fetches_thumbnail_features_for_each_channel(self, ctx):
+        from analysis.comment_selector import _prefetch_authors
+        chan = MagicMock()
+        with patch('youtube.channel.Channel.get_many', return_value={'UC_a': chan}):
+            _prefetch_authors([_comment('c1', 'x' * 60, author_channel_id='UC_a')], self._ctx())
+        chan.fetch_default_thumbnail_features.assert_called_once()
+
+
 class TestExpansion:
     def test_quality_thread_expands(self, ctx, write_json):
         _seed_comments(write_json, 'vid_TEST', [
@@ -794,13 +823,13 @@ class TestExpansion:
         client.comments.return_value.list_next.return_value = None
 
         with patch('youtube.get_youtube_client', return_value=client), \
-             patch('youtube.channel.Channel.retrieve', return_value={
+             patch('youtube.channel.Channel.retrieve_many', return_value=[{
                  'channel_id': 'UC_quality', 'title': 't', 'description': '',
                  'subscriber_count': 100, 'uploads_count': 5, 'view_count': 0,
                  'banner_external_url': '', 'custom_url': '', 'playlists_data': {},
                  'status': {}, 'thumbnails': {}, 'topic_details': {},
                  'published_at': '2020-01-01T00:00:00+00:00', 'schema_version': 2,
-             }):
+             }]):
             classify(_video())
 
         comments = json.loads(
@@ -7,6 +7,25 @@ import pytest
 BATCH_TIME = datetime(2025, 3, 15, 12, 0, 0, tzinfo=timezone.utc)
 
 
+class FakeBatch:
+    """Stand-in for BatchHttpRequest: executes the queued mock requests
+    one by one and reports each to its callback."""
+    def __init__(self, callback=None):
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id, request, callback))
+
+    def execute(self):
+        from googleapiclient.errors import HttpError
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = request.execute(), None
+            except HttpError as e:
+                response, exception = None, e
+            callback(request_id, response, exception)
+
+
 @pytest.fixture(autouse=True)
 def _isolate_rate_limiter(tmp_path_factory, monkeypatch):
     """Redirect the RateLimiter singleton to a per-test tmp DB."""
@@ -14,20 +33,37 @@ def _isolate_rate_limiter(tmp_path_factory, monkeypatch):
 
     monkeypatch.setattr(config, 'DATA_DIR', tmp_path_factory.mktemp('rl'))
 
-    from rate_limiter import RateLimiter
+    from metrics import Counters
+    from rate_limiter import AsyncRateLimiter, RateLimiter
     RateLimiter.reset()
+    Counters.reset()
     yield
+    AsyncRateLimiter.reset()
     RateLimiter.reset()
+    Counters.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolate_etag_store():
+    """Drop the EtagStore and Catalog singletons so each test opens its own DATA_DIR."""
+    from youtube.catalog import Catalog
+    from youtube.etags import EtagStore
+    EtagStore.reset()
+    Catalog.reset()
+    yield
+    EtagStore.reset()
+    Catalog.reset()
 
 
 @pytest.fixture
 def ctx(tmp_path):
     """Patch DATA_DIR to tmp_path, set deterministic Context.batch_time."""
-    from context import Context
+    from context import Context, IdentityMap
 
     Context.reset()
     instance = Context.__new__(Context)
     instance.batch_time = BATCH_TIME
+    instance.objects = IdentityMap()
     Context._instance = instance
 
     with patch("config.DATA_DIR", tmp_path):
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from context import IdentityMap
+
+
+class TestIdentityMap:
+    def test_repeated_get_loads_once(self, tmp_path):
+        path = tmp_path / 'a.json'
+        path.write_text('{}')
+        objects = IdentityMap()
+        loads = []
+        first = objects.get(dict, path, lambda: loads.append(1) or {'n': 1})
+        assert objects.get(dict, path, lambda: loads.append(1) or {'n': 2}) is first
+        assert len(loads) == 1
+
+    def test_changed_file_reloads(self, tmp_path):
+        path = tmp_path / 'a.json'
+        path.write_text('{"n": 1}')
+        objects = IdentityMap()
+        assert objects.load_json(path) == {'n': 1}
+        path.write_text('{"n": 2}')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert objects.load_json(path) == {'n': 2}
+
+    def test_missing_file_not_held(self, tmp_path):
+        path = tmp_path / 'missing.json'
+        objects = IdentityMap()
+        assert objects.get(dict, path, lambda: None) is None
+        path.write_text(json.dumps({'n': 1}))
+        assert objects.load_json(path) == {'n': 1}
+
+    def test_least_recently_used_dropped(self, tmp_path):
+        paths = [tmp_path / f'{i}.json' for i in range(3)]
+        for path in paths:
+            path.write_text('{}')
+        objects = IdentityMap(maxsize=2)
+        held = [objects.load_json(path) for path in paths[:2]]
+        objects.load_json(paths[0])
+        objects.load_json(paths[2])
+        assert objects.load_json(paths[0]) is held[0]
+        assert objects.load_json(paths[1]) is not held[1]
+
+    def test_concurrent_gets_share_one_object(self, tmp_path):
+        path = tmp_path / 'a.json'
+        path.write_text('{}')
+        objects = IdentityMap()
+        barrier = threading.Barrier(4)
+
+        def load():
+            time.sleep(0.05)
+            return {}
+
+        def get():
+            barrier.wait()
+            return objects.get(dict, path, load)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: get(), range(4)))
+        assert all(result is results[0] for result in results)
+
+    def test_different_paths_load_in_parallel(self, tmp_path):
+        paths = [tmp_path / 'a.json', tmp_path / 'b.json']
+        for path in paths:
+            path.write_text('{}')
+        objects = IdentityMap()
+        barrier = threading.Barrier(2, timeout=5)
+
+        def load():
+            # Both loads must be running at once to pass the barrier.
+            barrier.wait()
+            return {}
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda path: objects.get(dict, path, load), paths))
+        assert results == [{}, {}]
+        assert not objects._loading
+
+    def test_kinds_kept_apart(self, tmp_path):
+        path = tmp_path / 'a.json'
+        path.write_text('{}')
+        objects = IdentityMap()
+        objects.get(dict, path, lambda: {'kind': 'dict'})
+        assert objects.get(list, path, lambda: ['list']) == ['list']
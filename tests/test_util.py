@@ -1,10 +1,15 @@
+import os
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+import pytest
+
 from util import (
     NoneObject,
     SafeNamespace,
+    compile_converters,
     convert_fields,
     from_obj,
     to_obj,
@@ -168,6 +173,78 @@ class TestConvertFields:
         assert result == {"name": "test"}
 
 
+    def test_none_object_and_blank_string_become_none(self):
+        @dataclass
+        class Item:
+            created: Optional[datetime] = None
+            count: Optional[int] = None
+
+        result = convert_fields(Item, {"created": "  ", "count": NoneObject()})
+        assert result == {"created": None, "count": None}
+
+    def test_converters_compiled_once_per_class(self):
+        @dataclass
+        class Item:
+            name: str
+            created: datetime
+            count: Optional[int] = None
+
+        plan = compile_converters(Item)
+        assert [name for name, _ in plan] == ["created", "count"]
+        assert compile_converters(Item) is plan
+
+
+class TestConvertFieldsBenchmark:
+    ROWS = 2000
+    COMMENT = {
+        "comment_id": "c1", "video_id": "v1", "parent_id": None,
+        "author_display_name": "a", "author_channel_id": "UC1",
+        "text_display": "t", "text_original": "t", "like_count": 3,
+        "published_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z",
+        "total_reply_count": 0,
+        "first_seen": "2025-03-15T00:00:00+00:00", "last_seen": "2025-03-15T00:00:00+00:00",
+    }
+
+    @staticmethod
+    def _reflective(cls, data):
+        """convert_fields as it was: type hints resolved on every call."""
+        from typing import Union, get_args, get_origin, get_type_hints
+
+        from util import TYPE_CONVERTERS
+        result = data.copy()
+        for field_name, field_type in get_type_hints(cls).items():
+            if field_name not in result:
+                continue
+            if get_origin(field_type) is Union:
+                base_types = [t for t in get_args(field_type) if t is not type(None)]
+            else:
+                base_types = [field_type]
+            for base_type in base_types:
+                if base_type in TYPE_CONVERTERS:
+                    result[field_name] = TYPE_CONVERTERS[base_type](result[field_name])
+                    break
+        return result
+
+    def _timed(self, convert):
+        from youtube.comment import Comment
+        start = time.perf_counter()
+        built = [Comment(**convert(Comment, self.COMMENT)) for _ in range(self.ROWS)]
+        return time.perf_counter() - start, built
+
+    def test_matches_reflective(self):
+        from youtube.comment import Comment
+        assert convert_fields(Comment, self.COMMENT) == self._reflective(Comment, self.COMMENT)
+
+    @pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to time')
+    def test_hydrating_comments(self):
+        reflective, expected = self._timed(self._reflective)
+        compiled, built = self._timed(convert_fields)
+        print(f"\n{self.ROWS} comments: reflective {reflective * 1000:.0f}ms, "
+              f"compiled {compiled * 1000:.0f}ms ({reflective / compiled:.0f}x)")
+        assert built == expected
+        assert compiled * 5 < reflective
+
+
 # --- to_serializable ---
 
 class TestToSerializable:
@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+from urllib.parse import urlencode
+
+import pytest
+
+from util import dump_json
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    import rate_limits
+    monkeypatch.setitem(rate_limits.BUCKETS, 'test.async', {
+        'windows': [(60, 100)],
+        'reset_timezone': None,
+    })
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    import retry
+
+    async def sleep(seconds):
+        pass
+    monkeypatch.setattr(retry.asyncio, 'sleep', sleep)
+
+
+def _run(coro):
+    async def main():
+        from youtube.aio import close_http_pool
+        try:
+            return await coro
+        finally:
+            await close_http_pool()
+    return asyncio.run(main())
+
+
+class TestAsyncRateLimiter:
+    def test_ticket_is_async_context_manager(self, buckets):
+        from rate_limiter import AsyncRateLimiter, RateLimiter
+
+        async def main():
+            async with await AsyncRateLimiter.get().acquire('test.async') as ticket:
+                return ticket
+        ticket = _run(main())
+        assert ticket.bucket == 'test.async'
+        assert RateLimiter.get().window_usage('test.async')[0][2] == 1
+
+    def test_release_wakes_waiting_coroutine(self, buckets):
+        from rate_limiter import AsyncRateLimiter
+
+        async def main():
+            limiter = AsyncRateLimiter.get()
+            held = await limiter.acquire('test.async')
+            start = time.monotonic()
+            waiter = asyncio.create_task(limiter.acquire('test.async'))
+            await asyncio.sleep(0.1)
+            assert not waiter.done()
+            held.ok()
+            (await waiter).ok()
+            return time.monotonic() - start
+        assert _run(main()) < 0.6
+
+    def test_many_coroutines_share_the_bucket(self, buckets):
+        from rate_limiter import AsyncRateLimiter
+
+        async def one(limiter):
+            async with await limiter.acquire('test.async'):
+                await asyncio.sleep(0)
+
+        async def main():
+            limiter = AsyncRateLimiter.get()
+            await asyncio.gather(*(one(limiter) for _ in range(20)))
+        _run(main())
+
+        from rate_limiter import RateLimiter
+        assert RateLimiter.get().window_usage('test.async')[0][2] == 20
+
+    def test_locked_database_does_not_block_loop(self, buckets):
+        import sqlite3
+
+        from rate_limiter import AsyncRateLimiter, RateLimiter
+
+        async def main():
+            conn = sqlite3.connect(str(RateLimiter.get().db_path), isolation_level=None)
+            conn.execute('BEGIN IMMEDIATE')
+            acquiring = asyncio.create_task(AsyncRateLimiter.get().acquire('test.async'))
+            ticks = 0
+            for _ in range(5):
+                await asyncio.sleep(0.05)
+                ticks += 1
+            assert not acquiring.done()
+            conn.execute('COMMIT')
+            conn.close()
+            (await acquiring).ok()
+            return ticks
+        assert _run(main()) == 5
+
+    def test_locked_database_does_not_block_release(self, buckets):
+        import sqlite3
+
+        from rate_limiter import AsyncRateLimiter, RateLimiter
+
+        async def main():
+            ticket = await AsyncRateLimiter.get().acquire('test.async')
+            conn = sqlite3.connect(str(RateLimiter.get().db_path), isolation_level=None)
+            conn.execute('BEGIN IMMEDIATE')
+            releasing = asyncio.create_task(ticket.__aexit__(None, None, None))
+            ticks = 0
+            for _ in range(5):
+                await asyncio.sleep(0.05)
+                ticks += 1
+            assert not releasing.done()
+            conn.execute('COMMIT')
+            conn.close()
+            await releasing
+            return ticks
+        assert _run(main()) == 5
+
+
+class TestCallWithRetryAsync:
+    def test_retries_then_succeeds(self, buckets, no_backoff, monkeypatch):
+        import rate_limits
+        from retry import Transient, call_with_retry_async
+        monkeypatch.setitem(rate_limits.RETRY_POLICIES, 'test.async', {
+            'max_attempts': 3, 'base_delay': 1.0, 'max_delay': 10.0, 'budget': (3600, 5),
+        })
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError('reset')
+            return 'ok'
+        result = _run(call_with_retry_async('test.async', flaky, lambda e: Transient()))
+        assert result == 'ok'
+        assert len(calls) == 3
+
+    def test_outcomes_recorded_off_the_loop(self, buckets, no_backoff, monkeypatch):
+        import rate_limits
+        from rate_limiter import RateLimiter
+        from retry import Transient, call_with_retry_async
+        monkeypatch.setitem(rate_limits.RETRY_POLICIES, 'test.async', {
+            'max_attempts': 3, 'base_delay': 1.0, 'max_delay': 10.0, 'budget': (3600, 5),
+        })
+        limiter = RateLimiter.get()
+        release = limiter._release
+        threads = []
+
+        def record_thread(*args):
+            threads.append(threading.get_ident())
+            return release(*args)
+        monkeypatch.setattr(limiter, '_release', record_thread)
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 2:
+                raise ConnectionError('reset')
+            return 'ok'
+        assert _run(call_with_retry_async('test.async', flaky, lambda e: Transient())) == 'ok'
+        assert len(threads) == 2
+        assert threading.get_ident() not in threads
+
+
+def _record(fixture_dir, resource, params, response):
+    key = hashlib.sha1(urlencode(sorted(params.items())).encode()).hexdigest()[:16]
+    dump_json(fixture_dir / resource / f'{key}.json',
+              {'resource': resource, 'params': params, 'response': response})
+
+
+@pytest.fixture
+def stand_in(tmp_path, monkeypatch):
+    import config
+    from youtube import client
+    from youtube.replay import ReplayServer
+    fixture_dir = tmp_path / 'fixtures'
+    _record(fixture_dir, 'videos', {'id': 'vid00000001', 'part': 'snippet'},
+            {'items': [{'id': 'vid00000001', 'snippet': {'title': 'Hello ö'}}]})
+    server = ReplayServer(fixture_dir).start()
+    monkeypatch.setattr(config, 'YOUTUBE_API_ENDPOINT', server.url)
+    client.reset_youtube_client()
+    yield server
+    client.reset_youtube_client()
+    server.stop()
+
+
+class TestExecuteApiAsync:
+    def _request(self):
+        from youtube import get_youtube_client
+        return get_youtube_client().videos().list(
+            id='vid00000001', part='snippet', fields='etag,items(id,snippet(title))')
+
+    def test_fetches_through_stand_in(self, stand_in):
+        from youtube.aio import execute_api_async
+        response = _run(execute_api_async(self._request(), 'videos.list'))
+        assert response['items'][0]['snippet']['title'] == 'Hello ö'
+        assert stand_in.request_count == 1
+
+    def test_not_modified_returns_none(self, stand_in):
+        from youtube.aio import execute_api_async
+
+        async def main():
+            first = await execute_api_async(self._request(), 'videos.list')
+            return await execute_api_async(self._request(), 'videos.list', etag=first['etag'])
+        assert _run(main()) is None
+
+    def test_http_error_raised(self, stand_in):
+        from googleapiclient.errors import HttpError
+
+        from youtube import get_youtube_client
+        from youtube.aio import execute_api_async
+        request = get_youtube_client().playlists().list(channelId='UC_none', part='snippet')
+        with pytest.raises(HttpError):
+            _run(execute_api_async(request, 'playlists.list'))
+
+
+@pytest.fixture
+def image_server(tmp_path):
+    (tmp_path / 'avatar.png').write_bytes(b'\x89PNG fake')
+    handler = partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+    handler.log_message = lambda *args: None
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestDownloadThumbnail:
+    def test_downloads(self, image_server):
+        from youtube.aio import download_thumbnail
+        content_type, data = _run(download_thumbnail(image_server + 'avatar.png'))
+        assert content_type == 'image/png'
+        assert data == b'\x89PNG fake'
+
+    def test_404_not_retried(self, image_server):
+        import httpx
+
+        from youtube.aio import download_thumbnail
+        with pytest.raises(httpx.HTTPStatusError):
+            _run(download_thumbnail(image_server + 'missing.png'))
+
+
+class TestDownloadTranscript:
+    def test_selects_and_fetches(self):
+        from youtube.aio import download_transcript
+        fetched = MagicMock()
+        fetched.to_raw_data.return_value = [{'text': 'hi', 'start': 0.0, 'duration': 1.0}]
+        fetched.__len__.return_value = 1
+        transcript = MagicMock(language='English', language_code='en', is_generated=False)
+        transcript.fetch.return_value = fetched
+        with patch('youtube.transcript.list_transcripts', return_value=[transcript]):
+            data = _run(download_transcript('vid00000001'))
+        assert data['metadata']['language_code'] == 'en'
+        assert data['segments'] == [{'text': 'hi', 'start': 0.0, 'duration': 1.0}]
+
+    def test_unavailable(self):
+        from youtube.aio import download_transcript
+        from youtube.transcript import TranscriptUnavailable
+        with patch('youtube.transcript.list_transcripts', side_effect=ValueError('nope')):
+            with pytest.raises(TranscriptUnavailable):
+                _run(download_transcript('vid00000001'))
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from conftest import BATCH_TIME
+
+from youtube.catalog import Catalog
+from youtube.video import Video
+
+
+def _video_data(video_id='vid_CAT001', **overrides):
+    data = {
+        'video_id': video_id,
+        'title': 'Catalogued Video',
+        'channel_id': 'UC_cat',
+        'published_at': '2024-06-01T12:00:00+00:00',
+        'description': 'A description',
+        'duration_data': 'PT10M',
+        'view_count': '100',
+        'like_count': '10',
+        'comment_count': None,
+        'first_seen': BATCH_TIME.isoformat(),
+        'last_updated': BATCH_TIME.isoformat(),
+    }
+    data.update(overrides)
+    return data
+
+
+class TestCatalog:
+    def test_update_writes_row(self, ctx):
+        with patch.object(Video, 'retrieve_if_changed', return_value=('etag_1', _video_data())):
+            Video.update('vid_CAT001')
+        entry = Catalog.get().find('vid_CAT001')
+        assert entry.title == 'Catalogued Video'
+        assert entry.published_at == datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+        assert entry.duration_seconds == 600
+        assert (entry.view_count, entry.like_count, entry.comment_count) == (100, 10, None)
+        assert entry.last_updated == BATCH_TIME
+
+    def test_touch_refreshes_row(self, ctx, write_json):
+        write_json('youtube/videos/active/vi/vid_CAT001/video.json',
+                   _video_data(last_updated='2020-01-01T00:00:00+00:00'))
+        with patch.object(Video, 'retrieve_if_changed', return_value=None):
+            Video.update('vid_CAT001')
+        assert Catalog.get().find('vid_CAT001').last_updated == BATCH_TIME
+
+    def test_get_reads_catalog_row(self, ctx):
+        with patch.object(Video, 'retrieve_if_changed', return_value=('etag_1', _video_data())):
+            Video.update('vid_CAT001')
+        with patch.object(Video, '_from_file', side_effect=AssertionError('parsed video.json')):
+            video = Video.get('vid_CAT001')
+        assert video.title == 'Catalogued Video'
+        assert video.view_count == 100
+
+    def test_failed_write_rolls_back_row(self, ctx, tmp_path):
+        catalog = Catalog.get()
+        with patch('youtube.catalog.dump_json', side_effect=OSError('disk full')):
+            with pytest.raises(OSError):
+                catalog.store(tmp_path / 'video.json', _video_data())
+        assert catalog.find('vid_CAT001') is None
+        catalog.store(tmp_path / 'video.json', _video_data())
+        assert catalog.find('vid_CAT001').title == 'Catalogued Video'
+        assert (tmp_path / 'video.json').exists()
+
+    def test_find_by_channel_newest_first(self, ctx):
+        catalog = Catalog.get()
+        catalog.save(_video_data('vid_old', title='Old News', published_at='2023-01-01T00:00:00Z'))
+        catalog.save(_video_data('vid_new', title='New Things', published_at='2024-01-01T00:00:00Z'))
+        catalog.save(_video_data('vid_other', channel_id='UC_else'))
+        assert [e.video_id for e in catalog.find_by_channel('UC_cat')] == ['vid_new', 'vid_old']
+        assert [e.video_id for e in catalog.find_by_channel('UC_cat', grep='^new')] == ['vid_new']
+        assert [e.video_id for e in catalog.find_by_channel('UC_cat', limit=1)] == ['vid_new']
+
+    def test_rebuild_from_tree(self, ctx, write_json):
+        catalog = Catalog.get()
+        catalog.save(_video_data('vid_gone'))
+        write_json('youtube/videos/active/vi/vid_CAT001/video.json', _video_data())
+        write_json('youtube/videos/active/vi/vid_CAT002/video.json',
+                   _video_data('vid_CAT002', description='Changed'))
+        assert not catalog.is_built
+        assert catalog.rebuild() == 2
+        assert catalog.is_built
+        assert catalog.find('vid_gone') is None
+        assert catalog.find('vid_CAT001').description_hash != catalog.find('vid_CAT002').description_hash
@@ -3,8 +3,9 @@ from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
 import pytest
-from conftest import BATCH_TIME
+from conftest import BATCH_TIME, FakeBatch
 
+from youtube.catalog import Catalog
 from youtube.channel import SCHEMA_VERSION, Channel, PlaylistInaccessibleError
 
 # ---------------------------------------------------------------------------
@@ -103,7 +104,7 @@ class TestGetActiveDir:
 class TestChannelUpdate:
     def test_first_update_creates_file(self, ctx, read_json):
         retrieve_data = _sample_channel_data()
-        with patch.object(Channel, "retrieve", return_value=retrieve_data):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Channel.update("UC_test123")
 
         data = read_json("youtube/channels/active/UC_test123/channel.json")
@@ -117,7 +118,7 @@ class TestChannelUpdate:
                         last_updated=BATCH_TIME.isoformat())
         write_json("youtube/channels/active/UC_test123/channel.json", existing)
 
-        with patch.object(Channel, "retrieve", return_value=retrieve_data):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Channel.update("UC_test123")
 
         # BATCH_TIME: 2025-03-15 → week 11
@@ -131,7 +132,7 @@ class TestChannelUpdate:
                         last_updated=BATCH_TIME.isoformat())
         write_json("youtube/channels/active/UC_test123/channel.json", existing)
 
-        with patch.object(Channel, "retrieve", return_value=retrieve_data):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Channel.update("UC_test123")
 
         archive = read_json("youtube/channels/archive/2025/week-11/UC_test123/channel.json")
@@ -154,7 +155,7 @@ class TestChannelUpdate:
         write_json("youtube/channels/archive/2025/week-11/UC_test123/channel.json",
                     _sample_channel_data(title="First Title"))
 
-        with patch.object(Channel, "retrieve", return_value=retrieve_data):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Channel.update("UC_test123")
 
         # Archive should still be the first title (not overwritten)
@@ -185,11 +186,61 @@ class TestChannelGet:
         write_json("youtube/channels/active/UC_test123/channel.json", old_data)
 
         retrieve_data = _sample_channel_data()
-        with patch.object(Channel, "retrieve", return_value=retrieve_data):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             channel = Channel.get("UC_test123")
 
         assert channel.schema_version == SCHEMA_VERSION
 
+    def test_sync_leaves_shared_channel_unchanged(self, ctx, write_json):
+        data = dict(_sample_channel_data(),
+                     first_seen="2025-01-01T00:00:00+00:00",
+                     last_updated="2025-01-01T00:00:00+00:00")
+        write_json("youtube/channels/active/UC_test123/channel.json", data)
+        stale = Channel.get("UC_test123")
+
+        retrieve_data = _sample_channel_data(title="Renamed")
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
+            synced = stale.sync()
+
+        assert stale.title == "Test Channel"
+        assert synced.title == "Renamed"
+        assert Channel.get("UC_test123") is synced
+
+
+class TestChannelFindByHandle:
+    def test_update_indexes_handle(self, ctx):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", _sample_channel_data())):
+            Channel.update("UC_test123")
+        assert Channel.find_by_handle("@TestChannel") == "UC_test123"
+
+    def test_changed_handle_replaces_old(self, ctx):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", _sample_channel_data())):
+            Channel.update("UC_test123")
+        renamed = _sample_channel_data(custom_url="@renamed")
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_2", renamed)):
+            Channel.update("UC_test123")
+        assert Channel.find_by_handle("renamed") == "UC_test123"
+        assert Channel.find_by_handle("testchannel") is None
+
+    def test_unindexed_tree_falls_back_to_scan(self, ctx, write_json):
+        write_json("youtube/channels/active/UC_test123/channel.json", _sample_channel_data())
+        assert Channel.find_by_handle("@testchannel") == "UC_test123"
+        assert Catalog.get().find_channel_id("testchannel") == "UC_test123"
+
+    def test_scan_skips_unreadable_files(self, ctx, write_json):
+        write_json("youtube/channels/active/UC_broken/channel.json", {})
+        (ctx / "youtube/channels/active/UC_broken/channel.json").write_text("{")
+        write_json("youtube/channels/active/UC_test123/channel.json", _sample_channel_data())
+        assert Channel.find_by_handle("@testchannel") == "UC_test123"
+
+    def test_built_catalog_is_authoritative(self, ctx, write_json):
+        write_json("youtube/channels/active/UC_test123/channel.json", _sample_channel_data())
+        Catalog.get().rebuild()
+        assert Catalog.get().find_channel_id("@TESTCHANNEL") == "UC_test123"
+        write_json("youtube/channels/active/UC_other/channel.json",
+                   _sample_channel_data(channel_id="UC_other", custom_url="@other"))
+        assert Channel.find_by_handle("@other") is None
+
 
 # ---------------------------------------------------------------------------
 # Channel uploads — file-DB integration tests
@@ -235,6 +286,110 @@ class TestChannelUploads:
         assert "vid_new" in ids
         assert "vid_old" in ids
 
+    def test_local_uploads_defer_large_fields(self, ctx, write_json, read_json):
+        from youtube.video import Video
+        channel = self._make_channel()
+        write_json("youtube/channels/active/UC_test123/uploads/2024.json", [
+            ["vid_cat", "2024-06-01T00:00:00+00:00"],
+            ["vid_raw", "2024-03-01T00:00:00+00:00"],
+        ])
+        video_data = {
+            "channel_id": "UC_test123", "title": "Catalogued", "published_at": "2024-06-01T00:00:00+00:00",
+            "first_seen": BATCH_TIME.isoformat(), "last_updated": BATCH_TIME.isoformat(),
+            "description": "Before", "thumbnails_data": {}, "tags": [], "category_id": "22",
+            "live_status": "none", "duration_data": "PT1M", "spatial_dimension_type": "2d",
+            "resolution_tier": "hd", "captioned": "false", "licensed_content": False,
+            "content_rating_data": {}, "viewing_projection": "rectangular",
+            "privacy_status": "public", "license": "youtube", "embeddable": True,
+            "public_stats_viewable": True, "made_for_kids": False, "view_count": "1",
+            "like_count": "1", "comment_count": "0", "topic_details": None,
+            "has_paid_product_placement": False,
+        }
+        Catalog.get().save(dict(video_data, video_id="vid_cat"))
+        write_json("youtube/videos/active/vi/vid_cat/video.json",
+                   dict(video_data, video_id="vid_cat", description="After"))
+        write_json("youtube/videos/active/vi/vid_raw/video.json",
+                   dict(video_data, video_id="vid_raw", title="From file"))
+
+        lazy, loaded = channel.local_uploads()
+        assert not hasattr(lazy, "__dict__")
+        assert (lazy.title, lazy.view_count) == ("Catalogued", 1)
+        assert lazy.description == "After"  # read from video.json on first use
+        assert lazy == Video.get("vid_cat")
+        assert loaded.title == "From file"
+
+
+class TestChannelRemoteUploads:
+    def _make_channel(self):
+        data = dict(_sample_channel_data(),
+                     first_seen=BATCH_TIME.isoformat(),
+                     last_updated=BATCH_TIME.isoformat())
+        from util import convert_fields
+        return Channel(**convert_fields(Channel, data))
+
+    def _page(self, *uploads):
+        request = MagicMock()
+        request.execute.return_value = {"items": [
+            {"contentDetails": {"videoId": vid, "videoPublishedAt": published}}
+            for vid, published in uploads
+        ]}
+        return request
+
+    def _mock_client(self, *pages):
+        mock_client = MagicMock()
+        mock_client.playlistItems.return_value.list.return_value = pages[0]
+        mock_client.playlistItems.return_value.list_next.side_effect = list(pages[1:]) + [None]
+        return mock_client
+
+    def _fake_get_many(self, calls, unavailable=()):
+        from types import SimpleNamespace
+
+        def get_many(video_ids):
+            video_ids = list(video_ids)
+            calls.append(video_ids)
+            return {vid: SimpleNamespace(video_id=vid) for vid in video_ids if vid not in unavailable}
+        return get_many
+
+    def test_fetches_each_page_in_one_batch(self, ctx, read_json):
+        from youtube.video import Video
+        mock_client = self._mock_client(
+            self._page(("vid1", "2024-06-15T00:00:00Z"), ("vid2", "2024-06-10T00:00:00Z")),
+            self._page(("vid3", "2023-12-01T00:00:00Z")),
+        )
+        calls = []
+        with patch("youtube.get_youtube_client", return_value=mock_client), \
+             patch.object(Video, "get_many", side_effect=self._fake_get_many(calls)):
+            videos = list(self._make_channel().remote_uploads())
+
+        assert [v.video_id for v in videos] == ["vid1", "vid2", "vid3"]
+        assert calls == [["vid1", "vid2"], ["vid3"]]
+        assert [u[0] for u in read_json("youtube/channels/active/UC_test123/uploads/2024.json")] == ["vid1", "vid2"]
+        assert [u[0] for u in read_json("youtube/channels/active/UC_test123/uploads/2023.json")] == ["vid3"]
+
+    def test_early_stop_skips_later_pages(self, ctx):
+        from youtube.video import Video
+        mock_client = self._mock_client(
+            self._page(("vid1", "2024-06-15T00:00:00Z"), ("vid2", "2024-06-10T00:00:00Z")),
+            self._page(("vid3", "2023-12-01T00:00:00Z")),
+        )
+        calls = []
+        with patch("youtube.get_youtube_client", return_value=mock_client), \
+             patch.object(Video, "get_many", side_effect=self._fake_get_many(calls)):
+            uploads = self._make_channel().remote_uploads()
+            next(uploads)
+            uploads.close()
+
+        assert calls == [["vid1", "vid2"]]
+        mock_client.playlistItems.return_value.list_next.assert_not_called()
+
+    def test_unavailable_video_raises(self, ctx):
+        from youtube.video import Video, VideoUnavailableError
+        mock_client = self._mock_client(self._page(("vid1", "2024-06-15T00:00:00Z")))
+        with patch("youtube.get_youtube_client", return_value=mock_client), \
+             patch.object(Video, "get_many", side_effect=self._fake_get_many([], unavailable={"vid1"})):
+            with pytest.raises(VideoUnavailableError):
+                list(self._make_channel().remote_uploads())
+
 
 # ---------------------------------------------------------------------------
 # Channel.retrieve  — API response transformation
@@ -298,6 +453,76 @@ class TestChannelRetrieve:
         assert result["playlists_data"]["uploads"] == "UU_chan"
 
 
+# ---------------------------------------------------------------------------
+# Channel.get_many / update_many  — batched channels.list
+# ---------------------------------------------------------------------------
+
+def _batch_client(unavailable=(), failing=()):
+    """Fake client answering channels.list for whatever ids it is asked.
+    A request that includes a failing id is refused with a 403."""
+    mock_client = MagicMock()
+
+    def list_(part, id, **kwargs):
+        request = MagicMock()
+        if set(id.split(",")) & set(failing):
+            from googleapiclient.errors import HttpError
+            resp = MagicMock()
+            resp.status = 403
+            request.execute.side_effect = HttpError(resp, b"forbidden")
+            return request
+        request.execute.return_value = {"items": [
+            {"id": cid, "snippet": {"title": f"API {cid}", "publishedAt": "2020-01-15T00:00:00Z"},
+             "statistics": {"videoCount": "3"}}
+            for cid in id.split(",") if cid not in unavailable
+        ]}
+        return request
+
+    mock_client.channels.return_value.list.side_effect = list_
+    mock_client.new_batch_http_request.side_effect = FakeBatch
+    return mock_client
+
+
+class TestChannelBatch:
+    def test_update_many_pages_by_50(self, ctx, read_json):
+        ids = [f"UC_{i:05d}" for i in range(75)]
+        mock_client = _batch_client()
+        with patch("youtube.get_youtube_client", return_value=mock_client):
+            result = Channel.update_many(ids)
+
+        calls = mock_client.channels.return_value.list.call_args_list
+        assert [len(c.kwargs["id"].split(",")) for c in calls] == [50, 25]
+        assert list(result) == ids
+        assert read_json("youtube/channels/active/UC_00074/channel.json")["title"] == "API UC_00074"
+
+    def test_get_many_fetches_missing_and_old_schema(self, ctx, write_json):
+        for cid, version in (("UC_current", SCHEMA_VERSION), ("UC_old", 1)):
+            write_json(f"youtube/channels/active/{cid}/channel.json",
+                       dict(_sample_channel_data(channel_id=cid, schema_version=version),
+                            first_seen=BATCH_TIME.isoformat(),
+                            last_updated=BATCH_TIME.isoformat()))
+        mock_client = _batch_client()
+
+        with patch("youtube.get_youtube_client", return_value=mock_client):
+            channels = Channel.get_many(["UC_new", "UC_current", "UC_old"])
+
+        assert list(channels) == ["UC_new", "UC_current", "UC_old"]
+        assert channels["UC_current"].title == "Test Channel"
+        assert channels["UC_old"].title == "API UC_old"
+        mock_client.channels.return_value.list.assert_called_once()
+        assert mock_client.channels.return_value.list.call_args.kwargs["id"] == "UC_new,UC_old"
+
+    def test_get_many_leaves_out_terminated(self, ctx):
+        with patch("youtube.get_youtube_client", return_value=_batch_client(unavailable={"UC_gone"})):
+            channels = Channel.get_many(["UC_gone", "UC_here"])
+        assert list(channels) == ["UC_here"]
+
+    def test_failed_page_fails_only_its_bad_channel(self, ctx):
+        mock_client = _batch_client(unavailable={"UC_gone"}, failing={"UC_bad"})
+        with patch("youtube.get_youtube_client", return_value=mock_client):
+            channels = Channel.get_many(["UC_bad", "UC_gone", "UC_here"])
+        assert list(channels) == ["UC_here"]
+
+
 # ---------------------------------------------------------------------------
 # Channel.update  — corruption edge cases
 # ---------------------------------------------------------------------------
@@ -305,7 +530,7 @@ class TestChannelRetrieve:
 class TestChannelUpdateCorruption:
     def test_update_corrupted_json_raises(self, ctx, write_raw):
         write_raw("youtube/channels/active/UC_test123/channel.json", "NOT JSON{{{")
-        with patch.object(Channel, "retrieve", return_value=_sample_channel_data()):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", _sample_channel_data())):
             with pytest.raises(json.JSONDecodeError):
                 Channel.update("UC_test123")
 
@@ -318,7 +543,7 @@ class TestChannelUpdateCorruption:
         active_dir.mkdir(parents=True, exist_ok=True)
         dump_json(active_dir / "channel.json", {})
 
-        with patch.object(Channel, "retrieve", return_value=_sample_channel_data()):
+        with patch.object(Channel, "retrieve_if_changed", return_value=("etag_1", _sample_channel_data())):
             with pytest.raises(KeyError):
                 Channel.update("UC_test123")
 
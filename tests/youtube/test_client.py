@@ -0,0 +1,179 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from conftest import FakeBatch
+
+from youtube import client
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry():
+    client.reset_youtube_client()
+    yield
+    client.reset_youtube_client()
+
+
+class TestClientRegistry:
+    def test_same_thread_reuses_client(self):
+        with patch.object(client, '_build_client', side_effect=lambda: MagicMock()) as build:
+            first = client.get_youtube_client()
+            second = client.get_youtube_client()
+        assert first is second
+        assert build.call_count == 1
+
+    def test_each_thread_gets_own_client(self):
+        results = []
+        with patch.object(client, '_build_client', side_effect=lambda: MagicMock()):
+            main = client.get_youtube_client()
+            thread = threading.Thread(target=lambda: results.append(client.get_youtube_client()))
+            thread.start()
+            thread.join()
+        assert results[0] is not main
+
+    def test_reset_forces_rebuild(self):
+        with patch.object(client, '_build_client', side_effect=lambda: MagicMock()) as build:
+            client.get_youtube_client()
+            client.reset_youtube_client()
+            client.get_youtube_client()
+        assert build.call_count == 2
+
+    def test_reset_rebuilds_in_every_thread(self):
+        built = threading.Event()
+        reset = threading.Event()
+        results = []
+
+        def worker():
+            results.append(client.get_youtube_client())
+            built.set()
+            reset.wait(5)
+            results.append(client.get_youtube_client())
+
+        with patch.object(client, '_build_client', side_effect=lambda: MagicMock()):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            built.wait(5)
+            client.reset_youtube_client()
+            reset.set()
+            thread.join()
+        assert results[0] is not results[1]
+
+    def test_refreshed_token_saved(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(client, 'TOKEN_FILE', str(tmp_path / 'token.json'))
+        credentials = MagicMock(token='old')
+        credentials.to_json.return_value = '{"token": "new"}'
+        inner = MagicMock()
+
+        def refresh(*args, **kwargs):
+            credentials.token = 'new'
+            return 'resp', b'content'
+        inner.request.side_effect = refresh
+        http = client._TokenSavingHttp(inner, credentials)
+        assert http.request('https://example.invalid') == ('resp', b'content')
+        assert (tmp_path / 'token.json').read_text() == '{"token": "new"}'
+        (tmp_path / 'token.json').unlink()
+        http.request('https://example.invalid')
+        assert not (tmp_path / 'token.json').exists()
+
+    def test_credentials_loaded_once_across_threads(self):
+        with patch.object(client, '_load_credentials', return_value=MagicMock()) as load, \
+             patch('googleapiclient.discovery.build', return_value=MagicMock()) as build:
+            client.get_youtube_client()
+            thread = threading.Thread(target=client.get_youtube_client)
+            thread.start()
+            thread.join()
+        assert load.call_count == 1
+        assert build.call_count == 2
+        assert build.call_args.kwargs['static_discovery'] is True
+
+
+def _request(response=None, error_status=None):
+    request = MagicMock()
+    if error_status:
+        from googleapiclient.errors import HttpError
+        resp = MagicMock()
+        resp.status = error_status
+        request.execute.side_effect = HttpError(resp, b'error')
+    else:
+        request.execute.return_value = response
+    return request
+
+
+def _logged_costs():
+    import sqlite3
+
+    from rate_limiter import RateLimiter
+    conn = sqlite3.connect(str(RateLimiter.get().db_path))
+    try:
+        return [r[0] for r in conn.execute('SELECT cost FROM request_log ORDER BY id')]
+    finally:
+        conn.close()
+
+
+class TestApiBatch:
+    def _client(self):
+        mock_client = MagicMock()
+        mock_client.new_batch_http_request.side_effect = FakeBatch
+        return mock_client
+
+    def test_one_ticket_for_summed_cost(self):
+        with patch('youtube.get_youtube_client', return_value=self._client()):
+            with client.ApiBatch() as batch:
+                batch.add(_request({'items': []}), 'videos.list')
+                batch.add(_request({'items': []}), 'search.list')
+                batch.add(_request({'items': []}), 'channels.list')
+        assert _logged_costs() == [102]
+
+    def test_routes_results_to_futures_and_callbacks(self):
+        from googleapiclient.errors import HttpError
+        seen = []
+        with patch('youtube.get_youtube_client', return_value=self._client()):
+            with client.ApiBatch() as batch:
+                ok = batch.add(_request({'items': [1]}), 'videos.list')
+                failed = batch.add(_request(error_status=403), 'commentThreads.list',
+                    callback=lambda response, exception: seen.append((response, exception)))
+        assert ok.result() == {'items': [1]}
+        with pytest.raises(HttpError):
+            failed.result()
+        assert seen[0][0] is None
+        assert isinstance(seen[0][1], HttpError)
+
+    def test_splits_into_chunks_of_max_batch_size(self):
+        mock_client = self._client()
+        with patch('youtube.get_youtube_client', return_value=mock_client):
+            with client.ApiBatch() as batch:
+                futures = [batch.add(_request({'n': i}), 'videos.list') for i in range(120)]
+        assert mock_client.new_batch_http_request.call_count == 3
+        assert _logged_costs() == [50, 50, 20]
+        assert [f.result()['n'] for f in futures] == list(range(120))
+
+    def test_transport_error_fails_pending_futures(self):
+        mock_client = MagicMock()
+        mock_client.new_batch_http_request.return_value.execute.side_effect = OSError('reset')
+        with patch('youtube.get_youtube_client', return_value=mock_client):
+            batch = client.ApiBatch()
+            future = batch.add(_request({}), 'videos.list')
+            with pytest.raises(OSError):
+                batch.execute()
+        with pytest.raises(OSError):
+            future.result()
+
+    def test_execute_api_many_returns_exceptions(self):
+        from googleapiclient.errors import HttpError
+        with patch('youtube.get_youtube_client', return_value=self._client()):
+            requests = [_request({'n': 1}), _request(error_status=404), _request({'n': 3})]
+            with pytest.raises(HttpError):
+                client.execute_api_many(requests, 'videos.list')
+            responses = client.execute_api_many(requests, 'videos.list', return_exceptions=True)
+            single = client.execute_api_many([_request(error_status=404)], 'videos.list',
+                                             return_exceptions=True)
+        assert responses[0] == {'n': 1} and responses[2] == {'n': 3}
+        assert isinstance(responses[1], HttpError)
+        assert isinstance(single[0], HttpError)
+
+    def test_execute_api_many_single_request_skips_batch(self):
+        mock_client = self._client()
+        with patch('youtube.get_youtube_client', return_value=mock_client):
+            responses = client.execute_api_many([_request({'items': [1]})], 'videos.list')
+        assert responses == [{'items': [1]}]
+        mock_client.new_batch_http_request.assert_not_called()
@@ -5,6 +5,7 @@ import pytest
 from conftest import BATCH_TIME
 
 from youtube.comment import Comment, CommentsDisabledError
+from youtube.fields import FIELD_MASKS
 from youtube.video import Video
 
 
@@ -318,7 +319,8 @@ class TestPartialFetch:
             _video().mirror_comments()
 
         client2.commentThreads.return_value.list.assert_called_with(
-            videoId='vid_TEST', part='snippet,replies', maxResults=100,
+            videoId='vid_TEST', part='snippet,replies',
+            fields=FIELD_MASKS['commentThreads.list'], maxResults=100,
             textFormat='plainText', pageToken='tok2',
         )
 
@@ -351,7 +353,8 @@ class TestPartialFetch:
 
         # No pageToken — fresh start despite the previous incomplete state
         client2.commentThreads.return_value.list.assert_called_with(
-            videoId='vid_TEST', part='snippet,replies', maxResults=100,
+            videoId='vid_TEST', part='snippet,replies',
+            fields=FIELD_MASKS['commentThreads.list'], maxResults=100,
             textFormat='plainText',
         )
 
@@ -0,0 +1,166 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from conftest import BATCH_TIME
+
+from youtube.channel import CHANNEL_PARTS, Channel
+from youtube.etags import EtagStore
+from youtube.subscription import Subscription
+from youtube.video import Video
+
+EARLIER = datetime(2025, 3, 1, tzinfo=timezone.utc).isoformat()
+
+
+def _not_modified():
+    from googleapiclient.errors import HttpError
+    resp = MagicMock()
+    resp.status = 304
+    return HttpError(resp, b'')
+
+
+def _request(response=None, error=None):
+    request = MagicMock()
+    request.headers = {}
+    if error is not None:
+        request.execute.side_effect = error
+    else:
+        request.execute.return_value = response
+    return request
+
+
+class TestEtagStore:
+    def test_roundtrip_with_data(self, ctx):
+        store = EtagStore.get()
+        store.save('subscriptions.list', 'page', 'snippet', 'e1', {'channel_ids': ['UC_a']})
+        stored = store.lookup('subscriptions.list', 'page', 'snippet')
+        assert stored.etag == 'e1'
+        assert stored.data == {'channel_ids': ['UC_a']}
+
+    def test_keyed_by_part(self, ctx):
+        store = EtagStore.get()
+        store.save('videos.list', 'vid', 'snippet', 'e1')
+        assert store.lookup('videos.list', 'vid', 'snippet,statistics') is None
+
+    def test_persists_across_instances(self, ctx):
+        EtagStore.get().save('videos.list', 'vid', 'snippet', 'e1')
+        EtagStore.reset()
+        assert EtagStore.get().lookup('videos.list', 'vid', 'snippet').etag == 'e1'
+
+    def test_missing_etag_not_saved(self, ctx):
+        EtagStore.get().save('videos.list', 'vid', 'snippet', None)
+        assert EtagStore.get().lookup('videos.list', 'vid', 'snippet') is None
+
+
+class TestConditionalExecute:
+    def test_sends_if_none_match_and_returns_none_on_304(self):
+        from youtube.client import execute_api
+        request = _request(error=_not_modified())
+        assert execute_api(request, 'videos.list', etag='e1') is None
+        assert request.headers['If-None-Match'] == 'e1'
+
+    def test_304_without_etag_raises(self):
+        from googleapiclient.errors import HttpError
+
+        from youtube.client import execute_api
+        with pytest.raises(HttpError):
+            execute_api(_request(error=_not_modified()), 'videos.list')
+
+
+def _video_response(title='Title'):
+    return {'etag': 'e_video', 'items': [{
+        'id': 'vid_ABCDEF',
+        'snippet': {'title': title, 'channelId': 'UC_chan',
+                    'publishedAt': '2024-06-01T00:00:00+00:00'},
+    }]}
+
+
+class TestVideoConditionalUpdate:
+    def _client(self, request):
+        client = MagicMock()
+        client.videos.return_value.list.return_value = request
+        return client
+
+    def test_304_only_bumps_last_updated(self, ctx, read_json, write_json):
+        with patch('youtube.get_youtube_client', return_value=self._client(_request(_video_response()))):
+            Video.update('vid_ABCDEF')
+        path = 'youtube/videos/active/vi/vid_ABCDEF/video.json'
+        write_json(path, dict(read_json(path), last_updated=EARLIER))
+
+        request = _request(error=_not_modified())
+        with patch('youtube.get_youtube_client', return_value=self._client(request)), \
+             patch.object(Video, 'update_from_data') as update_from_data:
+            data = Video.update('vid_ABCDEF')
+
+        assert request.headers['If-None-Match'] == 'e_video'
+        update_from_data.assert_not_called()
+        assert data['last_updated'] == BATCH_TIME.isoformat()
+        assert read_json(path)['title'] == 'Title'
+        assert not (ctx / 'youtube/videos/archive').exists()
+
+    def test_no_etag_without_local_file(self, ctx):
+        EtagStore.get().save('videos.list', 'vid_ABCDEF', 'ignored', 'e_video')
+        request = _request(_video_response())
+        with patch('youtube.get_youtube_client', return_value=self._client(request)):
+            Video.update('vid_ABCDEF')
+        assert 'If-None-Match' not in request.headers
+
+
+class TestChannelConditionalUpdate:
+    def test_old_schema_fetched_unconditionally(self, ctx, write_json):
+        write_json('youtube/channels/active/UC_chan/channel.json', {
+            'channel_id': 'UC_chan', 'schema_version': 1,
+        })
+        EtagStore.get().save('channels.list', 'UC_chan', CHANNEL_PARTS, 'e_chan')
+        with patch.object(Channel, 'retrieve_if_changed', return_value=None) as retrieve, \
+             patch.object(Channel, 'touch'):
+            Channel.update('UC_chan')
+        assert retrieve.call_args.kwargs['etag'] is None
+
+
+def _subscription_item(channel_id):
+    return {
+        'id': f'sub_{channel_id}',
+        'snippet': {'title': channel_id, 'resourceId': {'channelId': channel_id}},
+        'contentDetails': {'activityType': 'all', 'newItemCount': 0, 'totalItemCount': 1},
+    }
+
+
+class TestSubscriptionConditionalPages:
+    def _client(self, *requests):
+        client = MagicMock()
+        client.subscriptions.return_value.list.side_effect = list(requests)
+        return client
+
+    def test_unchanged_pages_are_touched(self, ctx, read_json, write_json):
+        first = self._client(
+            _request({'etag': 'p1', 'nextPageToken': 'tok2', 'items': [_subscription_item('UC_a')]}),
+            _request({'etag': 'p2', 'items': [_subscription_item('UC_b')]}),
+        )
+        with patch('youtube.get_youtube_client', return_value=first):
+            Subscription.update_all()
+        write_json('youtube/subscriptions/active/UC_a.json',
+                   dict(read_json('youtube/subscriptions/active/UC_a.json'), last_updated=EARLIER))
+
+        page1, page2 = _request(error=_not_modified()), _request(error=_not_modified())
+        second = self._client(page1, page2)
+        with patch('youtube.get_youtube_client', return_value=second):
+            Subscription.update_all()
+
+        assert page1.headers['If-None-Match'] == 'p1'
+        assert page2.headers['If-None-Match'] == 'p2'
+        assert second.subscriptions.return_value.list.call_args.kwargs['pageToken'] == 'tok2'
+        assert read_json('youtube/subscriptions/active/UC_a.json')['last_updated'] == BATCH_TIME.isoformat()
+        assert (ctx / 'youtube/subscriptions/active/UC_b.json').exists()
+
+    def test_missing_file_forces_full_page(self, ctx):
+        with patch('youtube.get_youtube_client', return_value=self._client(
+                _request({'etag': 'p1', 'items': [_subscription_item('UC_a')]}))):
+            Subscription.update_all()
+        (ctx / 'youtube/subscriptions/active/UC_a.json').unlink()
+
+        request = _request({'etag': 'p1', 'items': [_subscription_item('UC_a')]})
+        with patch('youtube.get_youtube_client', return_value=self._client(request)):
+            Subscription.update_all()
+        assert 'If-None-Match' not in request.headers
+        assert (ctx / 'youtube/subscriptions/active/UC_a.json').exists()
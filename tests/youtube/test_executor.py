@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from youtube.executor import ApiExecutor
+
+
+@pytest.fixture(autouse=True)
+def _fresh_executor():
+    ApiExecutor.reset()
+    yield
+    ApiExecutor.reset()
+
+
+class TestApiExecutor:
+    def test_map_preserves_order(self):
+        executor = ApiExecutor()
+        assert executor.map(lambda n: n * 2, range(10)) == [n * 2 for n in range(10)]
+
+    def test_pool_capped_by_max_in_flight(self, monkeypatch):
+        from rate_limiter import RateLimiter
+        monkeypatch.setattr(RateLimiter, 'max_in_flight', lambda self, bucket: 3)
+        assert ApiExecutor(max_workers=8).max_workers == 3
+        assert ApiExecutor(max_workers=2).max_workers == 2
+
+    def test_runs_off_the_calling_thread(self):
+        executor = ApiExecutor()
+        names = executor.map(lambda _: threading.current_thread().name, [1])
+        assert names[0].startswith('api')
+
+    def test_nested_map_runs_inline(self):
+        executor = ApiExecutor()
+
+        def outer(n):
+            return executor.map(lambda m: (n, m, threading.current_thread().name), range(2))
+
+        results = executor.map(outer, range(3))
+        for n, inner in enumerate(results):
+            assert [(a, b) for a, b, _ in inner] == [(n, 0), (n, 1)]
+            assert len({name for _, _, name in inner}) == 1
+
+    def test_map_raises_first_error(self):
+        executor = ApiExecutor()
+
+        def fail_on_two(n):
+            if n == 2:
+                raise ValueError(n)
+            return n
+
+        with pytest.raises(ValueError):
+            executor.map(fail_on_two, range(4))
+
+    def test_map_output_keeps_each_items_output_together(self, capsys):
+        executor = ApiExecutor(max_workers=4)
+        barrier = threading.Barrier(4, timeout=5)
+
+        def chatty(n):
+            print(f'{n} start')
+            barrier.wait()
+            print(f'{n} end')
+            return n
+
+        assert executor.map_output(chatty, range(4)) == list(range(4))
+        lines = capsys.readouterr().out.splitlines()
+        assert sorted(lines) == sorted(f'{n} {word}' for n in range(4) for word in ('start', 'end'))
+        for start, end in zip(lines[::2], lines[1::2]):
+            assert start.split()[0] == end.split()[0]
+
+
+class TestMirrorMany:
+    def test_duplicate_videos_mirrored_once(self):
+        from youtube import Video
+        calls = []
+
+        class Stub:
+            def __init__(self, video_id):
+                self.video_id = video_id
+
+            def mirror_comments(self, comment_limit=None, force=False):
+                calls.append(self.video_id)
+
+        Video.mirror_comments_many([Stub('a'), Stub('b'), Stub('a')])
+        assert sorted(calls) == ['a', 'b']
+
+    def test_failed_video_does_not_stop_the_batch(self):
+        from youtube import Video
+        calls = []
+
+        class Stub:
+            def __init__(self, video_id):
+                self.video_id = video_id
+
+            def mirror_comments(self, comment_limit=None, force=False):
+                calls.append(self.video_id)
+                if self.video_id != 'b':
+                    raise ValueError(self.video_id)
+
+        failed = Video.mirror_comments_many([Stub('a'), Stub('b'), Stub('c')])
+        assert sorted(calls) == ['a', 'b', 'c']
+        assert {video_id: str(e) for video_id, e in failed.items()} == {'a': 'a', 'c': 'c'}
+
+
+class TestMaxInFlight:
+    def test_read_from_bucket_spec(self):
+        from rate_limiter import RateLimiter
+        from rate_limits import BUCKETS, YOUTUBE_DATA_API, YOUTUBE_TIMEDTEXT
+        limiter = RateLimiter.get()
+        assert limiter.max_in_flight(YOUTUBE_DATA_API) == BUCKETS[YOUTUBE_DATA_API]['max_in_flight']
+        assert limiter.max_in_flight(YOUTUBE_TIMEDTEXT) == 1
+
+    def test_unknown_bucket_raises(self):
+        from rate_limiter import RateLimiter, UnknownBucket
+        with pytest.raises(UnknownBucket):
+            RateLimiter.get().max_in_flight('youtube.nonexistent')
@@ -0,0 +1,157 @@
+import json
+
+import pytest
+
+from util import to_obj
+from youtube.fields import FIELD_MASKS, apply_field_mask, parse_field_mask
+
+THUMBNAILS = {
+    size: {'url': f'https://i.ytimg.com/vi/x/{size}.jpg', 'width': 120, 'height': 90}
+    for size in ('default', 'medium', 'high', 'standard', 'maxres')
+}
+DESCRIPTION = 'A long description with links and chapters.\n' * 40
+
+
+def _full_video_item():
+    """A videos.list item with every part, shaped like a real response."""
+    return {
+        'kind': 'youtube#video',
+        'etag': 'etag_vid',
+        'id': 'vid_FULL',
+        'snippet': {
+            'publishedAt': '2024-06-01T00:00:00Z',
+            'channelId': 'UC_chan',
+            'title': 'Title',
+            'description': DESCRIPTION,
+            'thumbnails': THUMBNAILS,
+            'channelTitle': 'Channel',
+            'tags': ['a', 'b'],
+            'categoryId': '20',
+            'liveBroadcastContent': 'none',
+            'defaultLanguage': 'en',
+            'localized': {'title': 'Title', 'description': DESCRIPTION},
+            'defaultAudioLanguage': 'en',
+        },
+        'contentDetails': {
+            'duration': 'PT5M', 'dimension': '2d', 'definition': 'hd',
+            'caption': 'false', 'licensedContent': True, 'contentRating': {},
+            'projection': 'rectangular',
+            'regionRestriction': {'blocked': ['DE', 'FR']},
+        },
+        'status': {
+            'uploadStatus': 'processed', 'privacyStatus': 'public',
+            'license': 'youtube', 'embeddable': True,
+            'publicStatsViewable': True, 'madeForKids': False,
+        },
+        'statistics': {
+            'viewCount': '42', 'likeCount': '7', 'favoriteCount': '0',
+            'commentCount': '3',
+        },
+        'paidProductPlacementDetails': {'hasPaidProductPlacement': False},
+        'recordingDetails': {'recordingDate': '2024-05-30T00:00:00Z',
+                             'location': {'latitude': 1.0, 'longitude': 2.0}},
+        'topicDetails': {'topicCategories': ['https://en.wikipedia.org/wiki/Video_game']},
+        'localizations': {
+            lang: {'title': 'Title', 'description': DESCRIPTION}
+            for lang in ('de', 'fr', 'es', 'sv')
+        },
+    }
+
+
+def _full_channel_item():
+    return {
+        'kind': 'youtube#channel',
+        'etag': 'etag_chan',
+        'id': 'UC_chan',
+        'snippet': {
+            'title': 'Channel', 'description': DESCRIPTION,
+            'customUrl': '@channel', 'publishedAt': '2015-01-01T00:00:00Z',
+            'thumbnails': THUMBNAILS, 'country': 'SE',
+            'localized': {'title': 'Channel', 'description': DESCRIPTION},
+        },
+        'contentDetails': {'relatedPlaylists': {'likes': '', 'uploads': 'UU_chan'}},
+        'statistics': {'viewCount': '100', 'subscriberCount': '10',
+                       'hiddenSubscriberCount': False, 'videoCount': '5'},
+        'topicDetails': {'topicIds': ['/m/0bzvm2']},
+        'status': {'privacyStatus': 'public', 'isLinked': True,
+                   'longUploadsStatus': 'allowed', 'madeForKids': False},
+        'brandingSettings': {
+            'channel': {'title': 'Channel', 'description': DESCRIPTION,
+                        'keywords': 'many keywords ' * 20},
+            'image': {'bannerExternalUrl': 'https://yt3.googleusercontent.com/banner'},
+        },
+    }
+
+
+class TestParseFieldMask:
+    def test_nested(self):
+        assert parse_field_mask('etag,items(id,snippet(title))') == {
+            'etag': None, 'items': {'id': None, 'snippet': {'title': None}},
+        }
+
+    def test_unbalanced_raises(self):
+        with pytest.raises(ValueError):
+            parse_field_mask('items(id')
+        with pytest.raises(ValueError):
+            parse_field_mask('items)')
+
+    def test_every_registered_mask_parses(self):
+        for mask in FIELD_MASKS.values():
+            assert parse_field_mask(mask)
+
+
+class TestApplyFieldMask:
+    def test_prunes_lists_of_items(self):
+        data = {'etag': 'e', 'kind': 'k', 'items': [{'id': 1, 'x': 2}, {'id': 3}]}
+        assert apply_field_mask(data, 'etag,items(id)') == {
+            'etag': 'e', 'items': [{'id': 1}, {'id': 3}],
+        }
+
+    def test_missing_fields_are_left_out(self):
+        assert apply_field_mask({'a': 1}, 'a,b(c)') == {'a': 1}
+
+
+class TestMasksCoverMappers:
+    """The masked response must map to exactly what the full one does."""
+
+    def test_video_mask(self):
+        from youtube.video import Video
+        item = _full_video_item()
+        masked = apply_field_mask({'items': [item]}, FIELD_MASKS['videos.list'])['items'][0]
+        assert Video.data_from_item('vid_FULL', to_obj(masked)) == \
+            Video.data_from_item('vid_FULL', to_obj(item))
+        assert len(json.dumps(masked)) < len(json.dumps(item)) / 2
+
+    def test_channel_mask(self):
+        from youtube.channel import Channel
+        item = _full_channel_item()
+        masked = apply_field_mask({'items': [item]}, FIELD_MASKS['channels.list'])['items'][0]
+        assert Channel.data_from_item(to_obj(masked)) == Channel.data_from_item(to_obj(item))
+        assert len(json.dumps(masked)) < len(json.dumps(item)) / 2
+
+    def test_comment_thread_mask(self):
+        from youtube.video import _thread_to_comment_dicts
+        comment = {
+            'kind': 'youtube#comment', 'etag': 'e', 'id': 'c1',
+            'snippet': {
+                'channelId': 'UC_chan', 'videoId': 'vid_FULL',
+                'authorDisplayName': 'alice', 'authorProfileImageUrl': 'https://x',
+                'authorChannelUrl': 'https://y', 'authorChannelId': {'value': 'UC_a'},
+                'textDisplay': 'hi', 'textOriginal': 'hi', 'canRate': True,
+                'viewerRating': 'none', 'likeCount': 2,
+                'publishedAt': '2024-06-01T00:00:00Z', 'updatedAt': '2024-06-01T00:00:00Z',
+            },
+        }
+        reply = json.loads(json.dumps(comment))
+        reply['id'] = 'c1.r1'
+        reply['snippet']['parentId'] = 'c1'
+        thread = {
+            'kind': 'youtube#commentThread', 'etag': 'e', 'id': 'c1',
+            'snippet': {'channelId': 'UC_chan', 'videoId': 'vid_FULL',
+                        'topLevelComment': comment, 'canReply': True,
+                        'totalReplyCount': 1, 'isPublic': True},
+            'replies': {'comments': [reply]},
+        }
+        masked = apply_field_mask({'items': [thread]}, FIELD_MASKS['commentThreads.list'])['items'][0]
+        assert list(_thread_to_comment_dicts(masked, 'vid_FULL')) == \
+            list(_thread_to_comment_dicts(thread, 'vid_FULL'))
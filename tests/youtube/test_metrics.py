@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import socket
+import sqlite3
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    import rate_limits
+    monkeypatch.setattr(rate_limits, 'BUCKETS', {
+        'test.metrics': {'windows': [(60, 10)], 'reset_timezone': None},
+    })
+
+
+def _series(text):
+    """{series with labels: value} from an exposition, comments dropped."""
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if not line.startswith('#'))
+
+
+class TestRender:
+    def test_limiter_series(self, buckets):
+        from rate_limiter import RateLimiter
+        limiter = RateLimiter.get()
+        limiter.acquire('test.metrics', cost=2).ok()
+        limiter.acquire('test.metrics').blocked()
+        held = limiter.acquire('test.metrics')
+
+        text = metrics.render()
+        assert text.endswith('# EOF\n')
+        series = _series(text)
+        assert series['ytarchive_rate_limit_window_used{bucket="test.metrics",window="60"}'] == '4'
+        assert series['ytarchive_rate_limit_window_limit{bucket="test.metrics",window="60"}'] == '10'
+        assert series['ytarchive_rate_limit_in_flight{bucket="test.metrics"}'] == '1'
+        assert series['ytarchive_rate_limit_requests_total{bucket="test.metrics",outcome="ok"}'] == '1'
+        assert series['ytarchive_rate_limit_cost_total{bucket="test.metrics",outcome="ok"}'] == '2'
+        labels = 'bucket="test.metrics",outcome="blocked"'
+        assert series[f'ytarchive_rate_limit_latency_seconds_count{{{labels}}}'] == '1'
+        assert series[f'ytarchive_rate_limit_wait_seconds_bucket{{{labels},le="0.1"}}'] == '1'
+        assert series[f'ytarchive_rate_limit_wait_seconds_bucket{{{labels},le="+Inf"}}'] == '1'
+        held.ok()
+
+    def test_adaptive_scale(self, monkeypatch):
+        import rate_limits
+        from rate_limiter import RateLimiter
+        monkeypatch.setattr(rate_limits, 'BUCKETS', {
+            'test.metrics': {'windows': [(60, 10)], 'reset_timezone': None,
+                             'adaptive': {'floor': 0.2, 'decrease': 0.5, 'increase': 0.1, 'successes': 3}},
+        })
+        RateLimiter.get().acquire('test.metrics').blocked()
+        series = _series(metrics.render())
+        assert series['ytarchive_rate_limit_adaptive_scale{bucket="test.metrics"}'] == '0.5'
+
+    def test_rolled_up_rows_still_count(self, buckets):
+        from rate_limiter import RateLimiter
+        limiter = RateLimiter.get()
+        hour = 1_700_000_000 // 3600 * 3600
+        conn = sqlite3.connect(str(limiter.db_path))
+        conn.executemany(
+            'INSERT INTO request_log (bucket, cost, requested_at, released_at, outcome, pid, host, '
+            'wait_sec) VALUES (?, 1, ?, ?, ?, 1, ?, ?)',
+            [('test.metrics', hour + i, hour + i + 0.3, 'ok', socket.gethostname(), 4.0)
+             for i in range(3)],
+        )
+        conn.commit()
+        conn.close()
+        limiter.rollup(before=hour + 3600)
+        limiter.acquire('test.metrics').ok()
+
+        series = _series(metrics.render())
+        labels = 'bucket="test.metrics",outcome="ok"'
+        assert series[f'ytarchive_rate_limit_requests_total{{{labels}}}'] == '4'
+        assert series[f'ytarchive_rate_limit_latency_seconds_bucket{{{labels},le="0.5"}}'] == '4'
+        assert series[f'ytarchive_rate_limit_wait_seconds_bucket{{{labels},le="2.5"}}'] == '1'
+        assert series[f'ytarchive_rate_limit_wait_seconds_bucket{{{labels},le="5.0"}}'] == '4'
+        assert float(series[f'ytarchive_rate_limit_wait_seconds_sum{{{labels}}}']) >= 12.0
+
+
+class TestCounters:
+    def test_counts_accumulate_by_label(self, buckets):
+        metrics.count('transcripts_processed')
+        metrics.count('transcripts_processed', 2)
+        metrics.count('llm_tokens', 100, profile='default', kind='input')
+        metrics.count('llm_tokens', 0, profile='default', kind='output')
+        text = metrics.render()
+        assert '# TYPE ytarchive_transcripts_processed counter' in text
+        series = _series(text)
+        assert series['ytarchive_transcripts_processed_total'] == '3'
+        assert series['ytarchive_llm_tokens_total{kind="input",profile="default"}'] == '100'
+        assert 'ytarchive_llm_tokens_total{kind="output",profile="default"}' not in series
+
+    def test_shared_between_instances(self, buckets):
+        metrics.count('videos_mirrored', 5)
+        metrics.Counters.reset()
+        metrics.count('videos_mirrored', 5)
+        assert metrics.Counters.get().values() == [('videos_mirrored', '', 10.0)]
+
+    def test_label_escaping(self):
+        assert metrics._format_labels({'title': 'a "b"\\c\nd'}) == '{title="a \\"b\\"\\\\c\\nd"}'
+
+
+def test_write_textfile(buckets, tmp_path):
+    metrics.count('transcripts_processed')
+    path = tmp_path / 'ytarchive.prom'
+    metrics.write_textfile(path)
+    assert 'ytarchive_transcripts_processed_total 1' in path.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ['ytarchive.prom']
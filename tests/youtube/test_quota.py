@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from conftest import BATCH_TIME
+
+from youtube.quota import (
+    Job,
+    comments_job,
+    mirror_job,
+    plan,
+    remaining_quota,
+    subscriptions_cost,
+)
+
+
+def _subscription(channel_id='UC_q', uploads=120):
+    return SimpleNamespace(channel_id=channel_id, title='Quota Channel', total_item_count=uploads)
+
+
+def _video(comment_count):
+    return SimpleNamespace(video_id='vid_q', title='Quota Video', comment_count=comment_count)
+
+
+class TestPlan:
+    def test_orders_by_value_per_unit_within_budget(self):
+        jobs = [Job('a', cost=10, value=1), Job('b', cost=2, value=4), Job('c', cost=5, value=5)]
+        result = plan(jobs, budget=8)
+        assert [job.name for job in result.jobs] == ['b', 'c']
+        assert [job.name for job in result.deferred] == ['a']
+        assert result.cost == 7
+
+    def test_cheaper_job_fills_gap(self):
+        result = plan([Job('big', cost=6, value=60), Job('huge', cost=5, value=10),
+                       Job('small', cost=2, value=1)], budget=8)
+        assert [job.name for job in result.jobs] == ['big', 'small']
+
+    def test_unranked_keeps_input_order(self):
+        jobs = [Job('a', cost=5, value=1), Job('b', cost=4, value=40), Job('c', cost=2, value=20)]
+        result = plan(jobs, budget=8, rank=False)
+        assert [job.name for job in result.jobs] == ['a', 'c']
+        assert [job.name for job in result.deferred] == ['b']
+
+    def test_default_budget_is_remaining_quota(self):
+        from rate_limiter import RateLimiter
+        from rate_limits import YOUTUBE_DATA_API
+        limiter = RateLimiter.get()
+        limiter.acquire(YOUTUBE_DATA_API, cost=100).ok()
+        left, _ = remaining_quota()
+        assert left == 9000 - 100  # 10% held back for interactive use
+        assert plan([]).budget == left
+
+    def test_interactive_sees_reserve(self):
+        from rate_limiter import priority
+        with priority('interactive'):
+            assert remaining_quota()[0] == 10000
+
+
+class TestEstimates:
+    def test_first_mirror_reads_every_page(self, ctx):
+        job = mirror_job(_subscription(uploads=120))
+        assert job.cost == 3 * 2 + 1  # playlistItems + videos per page, plus channels.list
+        assert job.value == 121
+
+    def test_synced_mirror_reads_new_uploads(self, ctx, write_json):
+        write_json('youtube/channels/active/UC_q/uploads.json', {
+            'first_updated': BATCH_TIME.isoformat(),
+            'last_uploads_sync': BATCH_TIME.isoformat(),
+        })
+        write_json('youtube/channels/active/UC_q/uploads/2025.json',
+                   [[f'v{i}', datetime(2025, 1, 1).isoformat()] for i in range(118)])
+        job = mirror_job(_subscription(uploads=120))
+        assert job.cost == 2
+        assert job.value == 3
+
+    def test_comments_resume_after_fetched_pages(self, ctx, write_json):
+        assert comments_job(_video(450)).cost == 5
+        write_json('youtube/videos/active/vi/vid_q/comments.json', {
+            'fetch_complete': False, 'pages_fetched': 2, 'comments': {},
+        })
+        assert comments_job(_video(450)).cost == 3
+        assert comments_job(_video(450), comment_limit=100).cost == 1
+
+    def test_complete_comments_cost_nothing(self, ctx, write_json):
+        write_json('youtube/videos/active/vi/vid_q/comments.json', {'fetch_complete': True})
+        assert comments_job(_video(450)).cost == 0
+        assert comments_job(_video(450), force=True).cost == 5
+
+    def test_subscriptions_cost(self, ctx):
+        assert subscriptions_cost(count=120) == 3
+        assert subscriptions_cost() == 1
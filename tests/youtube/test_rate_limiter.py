@@ -37,6 +37,36 @@ def tiny_buckets(monkeypatch):
             'windows': [(3600, 3)],
             'reset_timezone': None,
         },
+        'test.wide': {
+            'windows': [(60, 100)],
+            'reset_timezone': None,
+            'max_in_flight': 2,
+        },
+        'test.lease': {
+            'windows': [(1, 5), (60, 12)],
+            'reset_timezone': None,
+            'lease': {'tokens': 5, 'ttl': 10.0},
+        },
+        'test.lease_wide': {
+            'windows': [(60, 100)],
+            'reset_timezone': None,
+            'lease': {'tokens': 5, 'ttl': 10.0},
+        },
+        'test.fair': {
+            'windows': [(60, 100)],
+            'reset_timezone': None,
+        },
+        'test.reserve': {
+            'windows': [(3600, 4)],
+            'reset_timezone': None,
+            'interactive_reserve': 0.5,
+        },
+        'test.adaptive': {
+            'windows': [(60, 100)],
+            'reset_timezone': None,
+            'max_in_flight': 4,
+            'adaptive': {'floor': 0.2, 'decrease': 0.5, 'increase': 0.1, 'successes': 3},
+        },
     }
     monkeypatch.setattr(rate_limits, 'BUCKETS', buckets)
     yield buckets
@@ -234,6 +264,45 @@ class TestLockSerialization:
         ticket.ok()
 
 
+class TestMaxInFlight:
+    def test_holds_up_to_max_in_flight(self, limiter):
+        first = limiter.acquire('test.wide')
+        second = limiter.acquire('test.wide')
+        assert limiter.try_acquire('test.wide') is None
+        first.ok()
+        third = limiter.try_acquire('test.wide')
+        assert third is not None
+        second.ok()
+        third.ok()
+
+    def test_dead_holders_reclaimed_alongside_live_ones(self, limiter, monkeypatch):
+        import rate_limiter
+        monkeypatch.setattr(rate_limiter, '_pid_alive', lambda pid: pid == os.getpid())
+        conn = sqlite3.connect(str(limiter.db_path))
+        conn.executemany(
+            'INSERT INTO request_log (bucket, cost, requested_at, pid, host) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [('test.wide', 1, time.time(), pid, socket.gethostname())
+             for pid in (os.getpid(), 999_998, 999_999)],
+        )
+        conn.commit()
+        conn.close()
+
+        ticket = limiter.try_acquire('test.wide')
+        assert ticket is not None
+        assert [r[3] for r in _rows(limiter, 'test.wide')].count('abandoned') == 2
+        assert limiter.try_acquire('test.wide') is None
+        ticket.ok()
+
+    def test_leased_spends_capped_in_process(self, limiter):
+        first = limiter.acquire('test.lease')
+        assert limiter.try_acquire('test.lease') is None
+        first.ok()
+        second = limiter.try_acquire('test.lease')
+        assert second is not None
+        second.ok()
+
+
 class TestAbsoluteResetWindow:
     def test_window_resets_at_midnight_pacific(self, limiter, monkeypatch):
         pacific = ZoneInfo('America/Los_Angeles')
@@ -272,3 +341,362 @@ class TestConcurrency:
             t.join()
 
         assert sorted(acquired_order) == [0, 1, 2]
+
+
+class TestLeasing:
+    def test_one_row_per_lease_until_closed(self, limiter):
+        for _ in range(3):
+            limiter.acquire('test.lease').ok()
+        assert _rows(limiter) == [(1, 'test.lease', 5, 'leased')]
+
+        limiter.close_leases()
+        rows = _rows(limiter)
+        assert [r[2:] for r in rows] == [(1, 'ok')] * 3
+
+    def test_exhausted_lease_is_written_back(self, limiter):
+        for _ in range(5):
+            limiter.acquire('test.lease').ok()
+        ticket = limiter.acquire('test.lease')
+        outcomes = [r[3] for r in _rows(limiter)]
+        assert outcomes.count('ok') == 5
+        assert outcomes.count('leased') == 1
+        ticket.ok()
+
+    def test_other_process_sees_reserved_tokens(self, limiter, fake_clock):
+        from rate_limiter import RateLimiter
+        limiter.acquire('test.lease').ok()
+        other = RateLimiter()
+        assert other.try_acquire('test.lease') is None
+
+        limiter.close_leases()
+        ticket = other.try_acquire('test.lease')
+        assert ticket is not None
+        ticket.ok()
+
+    def test_windows_hold_across_leases(self, limiter, fake_clock):
+        granted = 0
+        while (ticket := limiter.try_acquire('test.lease')) is not None:
+            ticket.ok()
+            granted += 1
+            fake_clock[0] += 1.1
+        assert granted == 12
+
+    def test_in_flight_spend_keeps_its_reservation(self, limiter):
+        ticket = limiter.acquire('test.lease')
+        limiter.close_leases()
+        assert [r[2:] for r in _rows(limiter)] == [(1, 'leased')]
+        ticket.error(ValueError())
+        assert [r[2:] for r in _rows(limiter)] == [(1, 'error:ValueError')]
+
+    def test_lease_holds_in_flight_share_across_processes(self, limiter):
+        from rate_limiter import RateLimiter
+        limiter.acquire('test.lease_wide').ok()
+        other = RateLimiter()
+        assert other.in_flight('test.lease_wide') == 1
+        assert other.try_acquire('test.lease_wide') is None
+        limiter.close_leases()
+        ticket = other.try_acquire('test.lease_wide')
+        assert ticket is not None
+        assert limiter.try_acquire('test.lease_wide') is None
+        ticket.ok()
+
+    def test_spends_write_nothing_until_flushed(self, limiter):
+        first = limiter.acquire('test.lease_wide')
+        assert limiter.try_acquire('test.lease_wide') is None
+        first.ok()
+        changes = limiter._conn.total_changes
+        for _ in range(3):
+            limiter.acquire('test.lease_wide').ok()
+        assert limiter._conn.total_changes == changes
+
+    def test_expired_lease_share_taken_back(self, limiter, fake_clock):
+        from rate_limiter import RateLimiter
+        limiter.acquire('test.lease_wide').ok()
+        other = RateLimiter()
+        assert other.try_acquire('test.lease_wide') is None
+        fake_clock[0] += 21
+        ticket = other.try_acquire('test.lease_wide')
+        assert ticket is not None
+        ticket.ok()
+
+    def test_dead_lease_spends_reclaimed(self, limiter, monkeypatch):
+        import rate_limiter
+        monkeypatch.setattr(rate_limiter, '_pid_alive', lambda pid: pid == os.getpid())
+        conn = sqlite3.connect(str(limiter.db_path))
+        conn.execute(
+            'INSERT INTO request_log (bucket, cost, requested_at, outcome, pid, host, slots) '
+            "VALUES ('test.lease_wide', 5, ?, 'leased', 999999, ?, 1)",
+            (time.time() + 10, socket.gethostname()),
+        )
+        conn.commit()
+        conn.close()
+        ticket = limiter.try_acquire('test.lease_wide')
+        assert ticket is not None
+        assert limiter.in_flight('test.lease_wide') == 1
+        ticket.ok()
+
+    def test_expired_lease_is_replaced(self, limiter, fake_clock):
+        limiter.acquire('test.lease').ok()
+        fake_clock[0] += 11
+        limiter.acquire('test.lease').ok()
+        outcomes = [r[3] for r in _rows(limiter)]
+        assert outcomes == ['ok', 'leased']
+
+
+class TestWindowCounters:
+    def test_usage_matches_request_log(self, limiter):
+        for _ in range(3):
+            limiter.acquire('test.cost', cost=100).ok()
+        assert limiter.window_usage('test.cost')[0][:3] == (86400, 1000, 300)
+
+    def test_acquire_reads_counters_not_request_log(self, limiter):
+        for _ in range(3):
+            limiter.acquire('test.unit').ok()
+        conn = sqlite3.connect(str(limiter.db_path))
+        conn.execute('DELETE FROM request_log')
+        conn.commit()
+        conn.close()
+        assert limiter.try_acquire('test.unit') is None
+
+    def test_abandoned_cost_is_given_back(self, limiter, monkeypatch):
+        import rate_limiter
+        monkeypatch.setattr(rate_limiter, '_pid_alive', lambda pid: False)
+        limiter.acquire('test.unit', cost=2)
+        limiter.acquire('test.unit').ok()
+        assert limiter.window_usage('test.unit')[0][2] == 1
+
+    def test_new_window_rebuilt_from_request_log(self, limiter, tiny_buckets):
+        from rate_limiter import RateLimiter
+        for _ in range(2):
+            limiter.acquire('test.unit').ok()
+        tiny_buckets['test.unit']['windows'].append((3600, 10))
+        used = {w: u for w, _, u, _ in RateLimiter().window_usage('test.unit')}
+        assert used == {60: 2, 3600: 2}
+
+    def test_frees_when_oldest_slot_leaves_window(self, limiter, fake_clock):
+        for _ in range(3):
+            limiter.acquire('test.unit').ok()
+        _, _, used, frees_at = limiter.window_usage('test.unit')[0]
+        assert used == 3
+        assert fake_clock[0] + 60 <= frees_at <= fake_clock[0] + 61
+
+
+class TestWakeups:
+    def _time_to_acquire_after_release(self, limiter, hold=0.2):
+        ticket = limiter.acquire('test.unit')
+        waited = []
+
+        def waiter():
+            start = time.monotonic()
+            limiter.acquire('test.unit').ok()
+            waited.append(time.monotonic() - start)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(hold)
+        ticket.ok()
+        thread.join()
+        return waited[0] - hold
+
+    def test_release_wakes_waiter(self, limiter):
+        assert self._time_to_acquire_after_release(limiter) < 0.5
+
+    def test_falls_back_to_polling(self, limiter):
+        limiter._wakeups.enabled = False
+        assert self._time_to_acquire_after_release(limiter) >= 0.5
+
+    def test_notify_without_waiters_is_harmless(self, tmp_path):
+        from wakeups import Wakeups
+        wakeups = Wakeups(tmp_path / 'wakeups')
+        wakeups.notify('test.unit')
+        waiter = wakeups.listen('test.unit')
+        wakeups.notify('test.unit')
+        start = time.monotonic()
+        waiter.wait(5)
+        assert time.monotonic() - start < 1
+        waiter.close()
+
+    def test_later_wait_blocks_with_other_waiters(self, tmp_path):
+        from wakeups import Wakeups
+        wakeups = Wakeups(tmp_path / 'wakeups')
+        waiters = [wakeups.listen('test.unit') for _ in range(2)]
+        wakeups.notify('test.unit')
+        for waiter in waiters:
+            start = time.monotonic()
+            waiter.wait(5)
+            assert time.monotonic() - start < 1
+        for waiter in waiters:
+            start = time.monotonic()
+            waiter.wait(0.3)
+            assert time.monotonic() - start >= 0.25
+        for waiter in waiters:
+            waiter.close()
+
+
+class TestPriority:
+    def _queue_bulk_waiter(self, limiter):
+        """A bulk acquire queued behind a held ticket, then the ticket released."""
+        import rate_limits
+        from rate_limiter import _Queued
+        holder = limiter.acquire('test.fair')
+        queued = _Queued()
+        wait = limiter._check_and_insert(
+            'test.fair', 1, rate_limits.BUCKETS['test.fair'],
+            priority=rate_limits.PRIORITY_BULK, queued=queued)
+        assert wait.on_release and queued.id is not None
+        holder.ok()
+        return queued
+
+    def test_unknown_priority(self, limiter):
+        from rate_limiter import UnknownPriority
+        with pytest.raises(UnknownPriority):
+            limiter.acquire('test.unit', priority='urgent')
+
+    def test_priority_resolution(self, monkeypatch):
+        import rate_limiter
+        from rate_limiter import current_priority, priority, set_default_priority
+
+        import config
+        monkeypatch.setattr(rate_limiter, '_default_priority', 'normal')
+        set_default_priority('bulk')
+        assert current_priority() == 'bulk'
+        with priority('interactive'):
+            assert current_priority() == 'interactive'
+        monkeypatch.setattr(config, 'RATE_LIMIT_PRIORITY', 'normal')
+        assert current_priority() == 'normal'
+
+    def test_waiter_served_before_newcomer_of_same_priority(self, limiter):
+        import rate_limits
+        queued = self._queue_bulk_waiter(limiter)
+        assert limiter.try_acquire('test.fair', priority='bulk') is None
+        ticket = limiter._check_and_insert(
+            'test.fair', 1, rate_limits.BUCKETS['test.fair'],
+            priority=rate_limits.PRIORITY_BULK, queued=queued)
+        assert ticket.bucket == 'test.fair' and queued.id is None
+        ticket.ok()
+
+    def test_weighted_share(self, limiter):
+        self._queue_bulk_waiter(limiter)
+        granted = 0
+        while (ticket := limiter.try_acquire('test.fair', priority='interactive')) is not None:
+            ticket.ok()
+            granted += 1
+        # Weights 8:1, so interactive gets the next 7 before the bulk waiter
+        # is due, and the 8th ties behind it.
+        assert granted == 7
+
+    def test_dead_waiters_dropped(self, limiter, monkeypatch):
+        import rate_limiter
+        self._queue_bulk_waiter(limiter)
+        monkeypatch.setattr(rate_limiter, '_pid_alive', lambda pid: False)
+        ticket = limiter.try_acquire('test.fair', priority='bulk')
+        assert ticket is not None
+        ticket.ok()
+
+    def test_blocking_acquire_leaves_no_waiter(self, limiter):
+        holder = limiter.acquire('test.fair')
+        thread = threading.Thread(target=lambda: limiter.acquire('test.fair').ok())
+        thread.start()
+        time.sleep(0.2)
+        holder.ok()
+        thread.join()
+        conn = sqlite3.connect(str(limiter.db_path))
+        assert conn.execute('SELECT COUNT(*) FROM waiters').fetchone()[0] == 0
+        conn.close()
+
+    def test_interactive_reserve(self, limiter):
+        for _ in range(2):
+            limiter.acquire('test.reserve', priority='bulk').ok()
+        assert limiter.try_acquire('test.reserve', priority='bulk') is None
+        for _ in range(2):
+            limiter.acquire('test.reserve', priority='interactive').ok()
+        assert limiter.try_acquire('test.reserve', priority='interactive') is None
+
+    def test_remaining_holds_back_reserve(self, limiter):
+        limiter.acquire('test.reserve', priority='bulk').ok()
+        assert limiter.remaining('test.reserve', priority='bulk')[0] == 1
+        assert limiter.remaining('test.reserve', priority='interactive')[0] == 3
+        limiter.acquire('test.reserve', priority='interactive').ok()
+        assert limiter.remaining('test.reserve', priority='bulk')[0] == 0
+
+
+class TestAdaptive:
+    def _limit(self, limiter):
+        return limiter.window_usage('test.adaptive')[0][1]
+
+    def test_blocked_cuts_limits(self, limiter):
+        limiter.acquire('test.adaptive').blocked()
+        assert limiter.adaptive_scale('test.adaptive') == 0.5
+        assert self._limit(limiter) == 50
+        granted = 0
+        while (ticket := limiter.try_acquire('test.adaptive')) is not None:
+            ticket.error()  # ok would raise the limit again
+            granted += 1
+        assert granted == 49  # the blocked call counts too
+
+    def test_in_flight_blocks_cut_once(self, limiter):
+        tickets = [limiter.acquire('test.adaptive') for _ in range(3)]
+        for ticket in tickets:
+            ticket.blocked()
+        assert limiter.adaptive_scale('test.adaptive') == 0.5
+        limiter.acquire('test.adaptive').blocked()
+        assert limiter.adaptive_scale('test.adaptive') == 0.25
+
+    def test_floor(self, limiter):
+        for _ in range(5):
+            limiter.acquire('test.adaptive').blocked()
+        assert limiter.adaptive_scale('test.adaptive') == 0.2
+
+    def test_successes_raise_towards_ceiling(self, limiter):
+        limiter.acquire('test.adaptive').blocked()
+        for _ in range(3):
+            limiter.acquire('test.adaptive').ok()
+        assert limiter.adaptive_scale('test.adaptive') == 0.6
+        assert self._limit(limiter) == 60
+
+    def test_errors_and_static_buckets_unaffected(self, limiter):
+        limiter.acquire('test.adaptive').error(ValueError())
+        limiter.acquire('test.unit').blocked()
+        assert limiter.adaptive_scale('test.adaptive') == 1.0
+        assert limiter.adaptive_scale('test.unit') == 1.0
+
+
+class TestRollup:
+    HOUR = 1_700_000_000 // 3600 * 3600
+
+    def _insert(self, limiter, rows):
+        conn = sqlite3.connect(str(limiter.db_path))
+        conn.executemany(
+            'INSERT INTO request_log (bucket, cost, requested_at, released_at, outcome, pid, host) '
+            'VALUES (?, ?, ?, ?, ?, 1, ?)',
+            [(bucket, cost, at, at + latency, outcome, socket.gethostname())
+             for bucket, cost, at, latency, outcome in rows],
+        )
+        conn.commit()
+        conn.close()
+
+    def test_folds_whole_hours_into_aggregates(self, limiter):
+        self._insert(limiter, [('test.unit', 2, self.HOUR + i, float(i), 'ok') for i in range(1, 11)]
+                     + [('test.unit', 1, self.HOUR + 5, 0.5, 'blocked'),
+                        ('test.unit', 1, self.HOUR + 3600, 1.0, 'ok')])
+        limiter.rollup(before=self.HOUR + 3600 + 1800)
+        assert limiter.history(self.HOUR) == [
+            ('test.unit', self.HOUR, 'blocked', 1, 1, 0.5, 0.5, 0.5),
+            ('test.unit', self.HOUR, 'ok', 10, 20, 5.0, 9.0, 10.0),
+            ('test.unit', self.HOUR + 3600, 'ok', 1, 1, 1.0, 1.0, 1.0),
+        ]
+        # Only the whole hour left request_log.
+        assert len(_rows(limiter, 'test.unit')) == 1
+
+    def test_late_rows_merge(self, limiter):
+        self._insert(limiter, [('test.unit', 1, self.HOUR, 1.0, 'ok')])
+        limiter.rollup(before=self.HOUR + 3600)
+        self._insert(limiter, [('test.unit', 1, self.HOUR + 10, 3.0, 'ok')])
+        limiter.rollup(before=self.HOUR + 3600)
+        assert limiter.history(self.HOUR) == [('test.unit', self.HOUR, 'ok', 2, 2, 2.0, 2.0, 2.0)]
+
+    def test_in_flight_rows_stay(self, limiter):
+        ticket = limiter.acquire('test.unit')
+        limiter.rollup(before=time.time() + 7200)
+        assert len(_rows(limiter, 'test.unit')) == 1
+        ticket.ok()
@@ -0,0 +1,129 @@
+import hashlib
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+import pytest
+
+from util import dump_json
+from youtube import client
+from youtube.replay import RecordingHttp, ReplayServer, StandInHttp
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _record(fixture_dir, resource, params, response):
+    key = hashlib.sha1(urlencode(sorted(params.items())).encode()).hexdigest()[:16]
+    dump_json(fixture_dir / resource / f'{key}.json',
+              {'resource': resource, 'params': params, 'response': response})
+
+
+def _video_item(video_id):
+    return {
+        'id': video_id,
+        'snippet': {'title': f'Title {video_id} ö', 'channelId': 'UC_chan',
+                    'publishedAt': '2024-06-01T00:00:00+00:00', 'description': 'd'},
+        'contentDetails': {'duration': 'PT5M'},
+        'statistics': {'viewCount': '42'},
+        'status': {'privacyStatus': 'public'},
+    }
+
+
+def _channel_item():
+    return {
+        'id': 'UC_chan',
+        'snippet': {'title': 'Channel', 'publishedAt': '2015-01-01T00:00:00Z'},
+        'contentDetails': {'relatedPlaylists': {'uploads': 'UU_chan'}},
+        'statistics': {'videoCount': '5'},
+    }
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    """A recorded channel with five uploads, recorded in pages of three."""
+    fixture_dir = tmp_path / 'fixtures'
+    video_ids = [f'vid{i:08d}' for i in range(5)]
+    _record(fixture_dir, 'channels', {'id': 'UC_chan', 'part': 'snippet'},
+            {'items': [_channel_item()]})
+    _record(fixture_dir, 'videos', {'id': ','.join(video_ids), 'part': 'snippet'},
+            {'items': [_video_item(v) for v in video_ids]})
+    uploads = [{'contentDetails': {'videoId': v,
+                                   'videoPublishedAt': f'2024-06-0{5 - i}T00:00:00Z'}}
+               for i, v in enumerate(video_ids)]
+    _record(fixture_dir, 'playlistItems', {'playlistId': 'UU_chan', 'part': 'contentDetails'},
+            {'nextPageToken': 'next', 'items': uploads[:3]})
+    _record(fixture_dir, 'playlistItems',
+            {'playlistId': 'UU_chan', 'part': 'contentDetails', 'pageToken': 'next'},
+            {'items': uploads[3:]})
+    return fixture_dir
+
+
+@pytest.fixture
+def stand_in(fixtures, monkeypatch):
+    """Real googleapiclient clients pointed at a ReplayServer."""
+    import config
+    server = ReplayServer(fixtures, page_size=2).start()
+    monkeypatch.setattr(config, 'YOUTUBE_API_ENDPOINT', server.url)
+    client.reset_youtube_client()
+    yield server
+    client.reset_youtube_client()
+    server.stop()
+
+
+# ---------------------------------------------------------------------------
+# Sweeps through the real client
+# ---------------------------------------------------------------------------
+
+class TestReplaySweep:
+    def test_mirror_channel_uploads(self, ctx, stand_in):
+        from youtube.channel import Channel
+        channel = Channel.get('UC_chan')
+        videos = list(channel.remote_uploads())
+        assert [v.video_id for v in videos] == [f'vid{i:08d}' for i in range(5)]
+        assert videos[0].title == 'Title vid00000000 ö'
+        # channels.list, three playlistItems pages of two, one videos.list per page
+        assert stand_in.request_count == 1 + 3 + 3
+
+    def test_batched_lookup(self, ctx, stand_in, monkeypatch):
+        import youtube.video
+        from youtube.video import Video
+        monkeypatch.setattr(youtube.video, 'MAX_IDS_PER_REQUEST', 2)
+        result = Video.update_many([f'vid{i:08d}' for i in range(5)] + ['vid_missing'])
+        assert len(result) == 5
+        assert stand_in.request_count == 1
+
+    def test_unchanged_video_is_not_modified(self, ctx, stand_in):
+        from youtube.video import Video
+        Video.update('vid00000001')
+        with patch.object(Video, 'update_from_data') as update_from_data:
+            data = Video.update('vid00000001')
+        update_from_data.assert_not_called()
+        assert data['title'] == 'Title vid00000001 ö'
+
+    def test_unknown_collection_is_404(self, stand_in):
+        from googleapiclient.errors import HttpError
+        youtube = client.get_youtube_client()
+        request = youtube.playlistItems().list(playlistId='UU_other', part='contentDetails')
+        with pytest.raises(HttpError) as exc:
+            client.execute_api(request, 'playlistItems.list')
+        assert exc.value.resp.status == 404
+
+
+class TestRecording:
+    def test_recorded_batch_replays(self, fixtures, tmp_path):
+        from googleapiclient.discovery import build
+        recorded = tmp_path / 'recorded'
+        with ReplayServer(fixtures) as source:
+            http = RecordingHttp(StandInHttp(source.url), recorded)
+            youtube = build('youtube', 'v3', http=http, static_discovery=True, cache_discovery=False)
+            batch = youtube.new_batch_http_request()
+            batch.add(youtube.videos().list(id='vid00000000', part='snippet'))
+            batch.add(youtube.channels().list(id='UC_chan', part='snippet'))
+            batch.execute()
+
+        assert sorted(p.parent.name for p in recorded.glob('*/*.json')) == ['channels', 'videos']
+        with ReplayServer(recorded) as replay:
+            youtube = build('youtube', 'v3', http=StandInHttp(replay.url),
+                            static_discovery=True, cache_discovery=False)
+            response = youtube.videos().list(id='vid00000000', part='snippet').execute()
+        assert response['items'][0]['snippet']['title'] == 'Title vid00000000 ö'
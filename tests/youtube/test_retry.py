@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import sqlite3
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture
+def policies(monkeypatch):
+    """Small retry policy on a test bucket, with sleeps recorded instead of slept."""
+    import rate_limits
+    import retry
+
+    monkeypatch.setitem(rate_limits.BUCKETS, 'test.retry', {
+        'windows': [(60, 100)],
+        'reset_timezone': None,
+    })
+    monkeypatch.setitem(rate_limits.RETRY_POLICIES, 'test.retry', {
+        'max_attempts': 3,
+        'base_delay': 1.0,
+        'max_delay': 10.0,
+        'budget': (3600, 5),
+    })
+    sleeps = []
+    monkeypatch.setattr(retry.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def _log(bucket):
+    from rate_limiter import RateLimiter
+    conn = sqlite3.connect(str(RateLimiter.get().db_path))
+    try:
+        return conn.execute(
+            'SELECT attempt, outcome FROM request_log WHERE bucket = ? ORDER BY id', (bucket,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def _flaky(failures, result='ok'):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError('reset')
+        return result
+    return fn, calls
+
+
+def _transient(e):
+    from retry import Transient
+    return Transient() if isinstance(e, ConnectionError) else None
+
+
+class TestCallWithRetry:
+    def test_retries_then_succeeds_logging_each_attempt(self, policies):
+        from retry import call_with_retry
+        fn, calls = _flaky(2)
+        assert call_with_retry('test.retry', fn, _transient) == 'ok'
+        assert len(calls) == 3
+        assert len(policies) == 2
+        assert _log('test.retry') == [
+            (1, 'error:ConnectionError'), (2, 'error:ConnectionError'), (3, 'ok'),
+        ]
+
+    def test_non_transient_raises_immediately(self, policies):
+        from retry import call_with_retry
+
+        def fn():
+            raise ValueError('bad')
+        with pytest.raises(ValueError):
+            call_with_retry('test.retry', fn, _transient)
+        assert policies == []
+        assert _log('test.retry') == [(1, 'error:ValueError')]
+
+    def test_gives_up_after_max_attempts(self, policies):
+        from retry import call_with_retry
+        fn, calls = _flaky(10)
+        with pytest.raises(ConnectionError):
+            call_with_retry('test.retry', fn, _transient)
+        assert len(calls) == 3
+
+    def test_blocked_outcome(self, policies):
+        from retry import Transient, call_with_retry
+        fn, _ = _flaky(1)
+        call_with_retry('test.retry', fn, lambda e: Transient(blocked=True))
+        assert _log('test.retry') == [(1, 'blocked'), (2, 'ok')]
+
+    def test_budget_stops_retries(self, policies, monkeypatch):
+        import rate_limits
+        from retry import call_with_retry
+        monkeypatch.setitem(rate_limits.RETRY_POLICIES['test.retry'], 'budget', (3600, 1))
+        fn, _ = _flaky(1)
+        call_with_retry('test.retry', fn, _transient)
+        fn, calls = _flaky(1)
+        with pytest.raises(ConnectionError):
+            call_with_retry('test.retry', fn, _transient)
+        assert len(calls) == 1
+
+    def test_retry_after_beyond_max_delay_gives_up(self, policies):
+        from retry import Transient, call_with_retry
+        fn, calls = _flaky(1)
+        with pytest.raises(ConnectionError):
+            call_with_retry('test.retry', fn, lambda e: Transient(retry_after=600))
+        assert len(calls) == 1
+
+    def test_waits_at_least_retry_after(self, policies):
+        from retry import Transient, call_with_retry
+        fn, _ = _flaky(1)
+        call_with_retry('test.retry', fn, lambda e: Transient(retry_after=5))
+        assert policies[0] >= 5
+
+
+class TestBackoff:
+    def test_full_jitter_within_capped_ceiling(self):
+        from retry import backoff_delay
+        policy = {'base_delay': 1.0, 'max_delay': 10.0}
+        for attempt, ceiling in [(1, 1.0), (3, 4.0), (10, 10.0)]:
+            assert all(0 <= backoff_delay(policy, attempt) <= ceiling for _ in range(50))
+
+    def test_parse_retry_after(self):
+        from retry import parse_retry_after
+        assert parse_retry_after('30') == 30.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('garbage') is None
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+class TestExecuteApiRetries:
+    def _error(self, status, headers=None, reason=None):
+        import httplib2
+        from googleapiclient.errors import HttpError
+        resp = httplib2.Response({'status': status, **(headers or {})})
+        content = b'{}'
+        if reason:
+            content = ('{"error": {"message": "denied", "errors": [{"reason": "%s"}]}}'
+                       % reason).encode()
+        return HttpError(resp, content)
+
+    def test_retries_503(self, monkeypatch):
+        import retry
+
+        from youtube.client import execute_api
+        monkeypatch.setattr(retry.time, 'sleep', lambda s: None)
+        request = MagicMock()
+        request.execute.side_effect = [self._error(503), {'items': []}]
+        assert execute_api(request, 'videos.list') == {'items': []}
+        assert request.execute.call_count == 2
+
+    def test_user_rate_limit_is_transient(self):
+        from youtube.client import classify_api_error
+        assert classify_api_error(self._error(403, reason='userRateLimitExceeded')) is not None
+        assert classify_api_error(self._error(403, reason='quotaExceeded')) is None
+
+    def test_retry_after_header(self):
+        from youtube.client import classify_api_error
+        transient = classify_api_error(self._error(429, {'retry-after': '7'}))
+        assert transient.retry_after == 7.0
+
+    def test_404_not_retried(self):
+        from googleapiclient.errors import HttpError
+
+        from youtube.client import execute_api
+        request = MagicMock()
+        request.execute.side_effect = self._error(404)
+        with pytest.raises(HttpError):
+            execute_api(request, 'videos.list')
+        assert request.execute.call_count == 1
@@ -3,7 +3,7 @@ from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
-from conftest import BATCH_TIME
+from conftest import BATCH_TIME, FakeBatch
 
 from youtube.video import Video
 
@@ -130,7 +130,7 @@ class TestDurationFormatted:
 class TestVideoUpdate:
     def test_first_update_creates_file_with_first_seen(self, ctx, read_json):
         retrieve_data = _sample_video_data()
-        with patch.object(Video, "retrieve", return_value=retrieve_data):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Video.update("vid_ABCDEF")
 
         data = read_json("youtube/videos/active/vi/vid_ABCDEF/video.json")
@@ -145,7 +145,7 @@ class TestVideoUpdate:
                         last_updated=BATCH_TIME.isoformat())
         write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", existing)
 
-        with patch.object(Video, "retrieve", return_value=retrieve_data):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Video.update("vid_ABCDEF")
 
         archive_dir = ctx / "youtube/videos/archive/vi/vid_ABCDEF"
@@ -158,7 +158,7 @@ class TestVideoUpdate:
                         last_updated=BATCH_TIME.isoformat())
         write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", existing)
 
-        with patch.object(Video, "retrieve", return_value=retrieve_data):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Video.update("vid_ABCDEF")
 
         archive = read_json("youtube/videos/archive/vi/vid_ABCDEF/v1.json")
@@ -174,7 +174,7 @@ class TestVideoUpdate:
                         last_updated=BATCH_TIME.isoformat())
         write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", existing)
 
-        with patch.object(Video, "retrieve", return_value=retrieve_data):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Video.update("vid_ABCDEF")
 
         archive_dir = ctx / "youtube/videos/archive/vi/vid_ABCDEF"
@@ -190,7 +190,7 @@ class TestVideoUpdate:
         write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", existing)
 
         retrieve_data = _sample_video_data(title="V3 Title")
-        with patch.object(Video, "retrieve", return_value=retrieve_data):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Video.update("vid_ABCDEF")
 
         v2 = read_json("youtube/videos/archive/vi/vid_ABCDEF/v2.json")
@@ -217,11 +217,61 @@ class TestVideoGet:
 
     def test_get_missing_file_calls_update(self, ctx):
         retrieve_data = _sample_video_data()
-        with patch.object(Video, "retrieve", return_value=retrieve_data):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             video = Video.get("vid_ABCDEF")
 
         assert video.title == "Sample Video"
 
+    def test_get_reuses_object_until_file_changes(self, ctx):
+        retrieve_data = _sample_video_data()
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
+            video = Video.get("vid_ABCDEF")
+        assert Video.get("vid_ABCDEF") is video
+        assert Video.get_many(["vid_ABCDEF"])["vid_ABCDEF"] is video
+
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_2", dict(retrieve_data, title="Renamed"))):
+            Video.update("vid_ABCDEF")
+        assert Video.get("vid_ABCDEF").title == "Renamed"
+
+    def test_large_fields_decoded_on_first_use(self, ctx, write_json):
+        data = dict(_sample_video_data(),
+                     first_seen=BATCH_TIME.isoformat(),
+                     last_updated=BATCH_TIME.isoformat())
+        write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", data)
+
+        video = Video.get("vid_ABCDEF")
+        assert video.duration_seconds == 600
+        assert set(video._raw) == {"description", "thumbnails_data", "topic_details"}
+        assert video.thumbnails_data == {"default": {"url": "http://img"}}
+        assert set(video._raw) == {"description", "topic_details"}
+        assert video.description == "A description"
+        assert video.topic_details is None
+
+    def test_catalogued_duration_needs_no_file(self, ctx):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", _sample_video_data())):
+            Video.update("vid_ABCDEF")
+        (Video.get_active_dir("vid_ABCDEF") / "video.json").unlink()
+        from youtube.catalog import Catalog
+        video = Video.from_catalog(Catalog.get().find("vid_ABCDEF"))
+        assert video.duration_formatted == "10:00"
+
+
+class TestJsonMembers:
+    def test_matches_json_loads(self):
+        from youtube.video import _json_members
+        text = json.dumps({"a": 1, "b": {"c": [1, "x"]}, "d": "q\"uote"}, indent=2)
+        assert _json_members(text) == json.loads(text)
+        members = _json_members(text, raw=("b", "d"))
+        assert members["b"] == '{\n    "c": [\n      1,\n      "x"\n    ]\n  }'
+        assert json.loads(members["d"]) == 'q"uote'
+        assert _json_members(" { } ") == {}
+
+    def test_malformed_raises(self):
+        from youtube.video import _json_members
+        for text in ('[1]', '{"a" 1}', '{"a": 1 "b": 2}', '{"a": }'):
+            with pytest.raises(json.JSONDecodeError):
+                _json_members(text)
+
 
 # ---------------------------------------------------------------------------
 # Video.retrieve  — API response transformation
@@ -318,7 +368,7 @@ class TestVideoRetrieve:
 class TestVideoUpdateCorruption:
     def test_update_corrupted_json_raises(self, ctx, write_raw):
         write_raw("youtube/videos/active/vi/vid_ABCDEF/video.json", "NOT JSON{{{")
-        with patch.object(Video, "retrieve", return_value=_sample_video_data()):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", _sample_video_data())):
             with pytest.raises(json.JSONDecodeError):
                 Video.update("vid_ABCDEF")
 
@@ -326,7 +376,7 @@ class TestVideoUpdateCorruption:
         # BUG: {} takes the exists-branch, diff detects changes, but archive() fails
         # because data['video_id'] is missing
         write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", {})
-        with patch.object(Video, "retrieve", return_value=_sample_video_data()):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", _sample_video_data())):
             with pytest.raises(KeyError):
                 Video.update("vid_ABCDEF")
 
@@ -338,7 +388,7 @@ class TestVideoUpdateCorruption:
         retrieve_data = _sample_video_data()
         existing = dict(retrieve_data)  # same as retrieve, so no diff
         write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", existing)
-        with patch.object(Video, "retrieve", return_value=retrieve_data):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", retrieve_data)):
             Video.update("vid_ABCDEF")
 
         active = read_json("youtube/videos/active/vi/vid_ABCDEF/video.json")
@@ -390,7 +440,7 @@ class TestVideoArchiveEdgeCases:
                         last_updated=BATCH_TIME.isoformat())
         write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", existing)
 
-        with patch.object(Video, "retrieve", return_value=_sample_video_data(title="New Title")):
+        with patch.object(Video, "retrieve_if_changed", return_value=("etag_1", _sample_video_data(title="New Title"))):
             Video.update("vid_ABCDEF")
 
         # v4 created (max was 3, +1)
@@ -427,6 +477,107 @@ class TestVideoRetrieveErrors:
                 Video.retrieve("vid_deleted")
 
 
+# ---------------------------------------------------------------------------
+# Video.get_many / update_many  — batched videos.list
+# ---------------------------------------------------------------------------
+
+def _api_item(video_id, title="API Title"):
+    return {
+        "id": video_id,
+        "snippet": {"title": title, "channelId": "UC_chan",
+                    "publishedAt": "2024-06-01T00:00:00+00:00"},
+        "contentDetails": {"duration": "PT5M"},
+        "statistics": {"viewCount": "42"},
+        "status": {"privacyStatus": "public"},
+    }
+
+
+def _batch_client(unavailable=(), failing=()):
+    """Fake client answering videos.list for whatever ids it is asked.
+    A request that includes a failing id is refused with a 403."""
+    mock_client = MagicMock()
+
+    def list_(id, part, **kwargs):
+        request = MagicMock()
+        if set(id.split(",")) & set(failing):
+            from googleapiclient.errors import HttpError
+            resp = MagicMock()
+            resp.status = 403
+            request.execute.side_effect = HttpError(resp, b"forbidden")
+            return request
+        request.execute.return_value = {"items": [
+            _api_item(vid) for vid in id.split(",") if vid not in unavailable
+        ]}
+        return request
+
+    mock_client.videos.return_value.list.side_effect = list_
+    mock_client.new_batch_http_request.side_effect = FakeBatch
+    return mock_client
+
+
+class TestVideoBatch:
+    def test_update_many_pages_by_50(self, ctx):
+        ids = [f"vid{i:08d}" for i in range(120)]
+        mock_client = _batch_client()
+        with patch("youtube.get_youtube_client", return_value=mock_client):
+            result = Video.update_many(ids)
+
+        calls = mock_client.videos.return_value.list.call_args_list
+        assert [len(c.kwargs["id"].split(",")) for c in calls] == [50, 50, 20]
+        assert list(result) == ids
+        assert (ctx / "youtube/videos/active/vi/vid00000119/video.json").exists()
+
+    def test_update_many_archives_changed_video(self, ctx, write_json, read_json):
+        existing = dict(_sample_video_data(video_id="vid_ABCDEF", title="Old Title"),
+                        first_seen=BATCH_TIME.isoformat(),
+                        last_updated=BATCH_TIME.isoformat())
+        write_json("youtube/videos/active/vi/vid_ABCDEF/video.json", existing)
+
+        with patch("youtube.get_youtube_client", return_value=_batch_client()):
+            Video.update_many(["vid_ABCDEF"])
+
+        assert read_json("youtube/videos/archive/vi/vid_ABCDEF/v1.json")["title"] == "Old Title"
+        assert read_json("youtube/videos/active/vi/vid_ABCDEF/video.json")["title"] == "API Title"
+
+    def test_get_many_only_fetches_uncached(self, ctx, write_json):
+        cached = dict(_sample_video_data(video_id="cached_vid1"),
+                      first_seen=BATCH_TIME.isoformat(),
+                      last_updated=BATCH_TIME.isoformat())
+        write_json("youtube/videos/active/ca/cached_vid1/video.json", cached)
+        mock_client = _batch_client()
+
+        with patch("youtube.get_youtube_client", return_value=mock_client):
+            videos = Video.get_many(["remote_vid1", "cached_vid1", "remote_vid2"])
+
+        assert list(videos) == ["remote_vid1", "cached_vid1", "remote_vid2"]
+        assert videos["cached_vid1"].title == "Sample Video"
+        assert videos["remote_vid2"].title == "API Title"
+        mock_client.videos.return_value.list.assert_called_once()
+        assert mock_client.videos.return_value.list.call_args.kwargs["id"] == "remote_vid1,remote_vid2"
+
+    def test_get_many_leaves_out_unavailable(self, ctx):
+        with patch("youtube.get_youtube_client", return_value=_batch_client(unavailable={"gone_vid"})):
+            videos = Video.get_many(["gone_vid", "here_vid"])
+        assert list(videos) == ["here_vid"]
+
+    def test_failed_page_fails_only_its_bad_video(self, ctx):
+        ids = [f"vid{i:08d}" for i in range(60)]
+        mock_client = _batch_client(failing={"vid00000007"})
+        with patch("youtube.get_youtube_client", return_value=mock_client):
+            videos = Video.get_many(ids)
+        assert list(videos) == [vid for vid in ids if vid != "vid00000007"]
+
+    def test_get_many_all_cached_skips_api(self, ctx, write_json):
+        cached = dict(_sample_video_data(video_id="cached_vid1"),
+                      first_seen=BATCH_TIME.isoformat(),
+                      last_updated=BATCH_TIME.isoformat())
+        write_json("youtube/videos/active/ca/cached_vid1/video.json", cached)
+        mock_client = MagicMock()
+        with patch("youtube.get_youtube_client", return_value=mock_client):
+            Video.get_many(["cached_vid1"])
+        mock_client.videos.assert_not_called()
+
+
 # ---------------------------------------------------------------------------
 # Video.transcript  — edge cases
 # ---------------------------------------------------------------------------